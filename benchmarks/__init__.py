@@ -0,0 +1,9 @@
+"""
+Offline benchmarks, run as modules from the repository root.
+
+- suite: end-to-end load time, latency, batched, loader and HTTP throughput
+  with JSON output and baseline comparison; start here for before/after numbers.
+- batching_benchmark, engine_report, resolution_report, loader_benchmark,
+  padding_report, ddp_scaling, worker_memory, tiling_report, gating_report:
+  focused studies of a single optimization.
+"""
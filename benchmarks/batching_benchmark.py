@@ -0,0 +1,92 @@
+"""
+Load test comparing the micro-batching scheduler with the per-request path.
+
+Simulates `--clients` concurrent uploaders, each sending `--requests` images,
+against (a) the original synchronous per-request inference inside the event
+loop and (b) the `BatchScheduler` used by the /predict/ endpoint.
+
+    python -m benchmarks.batching_benchmark --clients 8 --requests 4 --max-batch-size 4
+"""
+import time
+import asyncio
+import argparse
+import torch
+from src.batch_scheduler import BatchScheduler
+from benchmarks.common import load_model, synthetic_images, make_predict_batch, latency_summary, write_json
+
+
+async def run_clients(handler, images, clients, requests_per_client):
+    latencies = []
+
+    async def client(client_id):
+        for i in range(requests_per_client):
+            image = images[(client_id * requests_per_client + i) % len(images)]
+            start = time.perf_counter()
+            await handler(image)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+async def benchmark_per_request(predict_batch, images, clients, requests_per_client):
+    async def handler(image):
+        # Mirrors the original endpoint: inference runs inline on the event loop
+        return predict_batch([image])[0]
+
+    return await run_clients(handler, images, clients, requests_per_client)
+
+
+async def benchmark_batched(predict_batch, images, clients, requests_per_client, max_batch_size, max_wait_ms):
+    scheduler = BatchScheduler(predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    await scheduler.start()
+    try:
+        result = await run_clients(scheduler.submit, images, clients, requests_per_client)
+    finally:
+        await scheduler.stop()
+    return result, scheduler.items_run / max(1, scheduler.batches_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs per-request inference load test")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4, help="Requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=4)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads value")
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = load_model("cpu")
+    predict_batch = make_predict_batch(model, "cpu")
+    images = synthetic_images(16, size=(args.width, args.height))
+    predict_batch(images[:1])  # warmup
+
+    total = args.clients * args.requests
+    results = {"config": vars(args), "torch_threads": torch.get_num_threads()}
+
+    elapsed, latencies = asyncio.run(benchmark_per_request(predict_batch, images, args.clients, args.requests))
+    results["per_request"] = {"throughput_rps": total / elapsed, **latency_summary(latencies)}
+
+    (elapsed, latencies), mean_batch = asyncio.run(benchmark_batched(
+        predict_batch, images, args.clients, args.requests, args.max_batch_size, args.max_wait_ms
+    ))
+    results["batched"] = {"throughput_rps": total / elapsed, "mean_batch_size": mean_batch, **latency_summary(latencies)}
+
+    for mode in ("per_request", "batched"):
+        r = results[mode]
+        print(f"{mode:12s} {r['throughput_rps']:7.2f} img/s  p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  p99 {r['p99_ms']:8.1f} ms")
+    print(f"Mean batch size: {mean_batch:.2f}")
+
+    write_json(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import json
+import numpy as np
+from PIL import Image
+from src.model_architecture import FasterRCNNModel, load_weights
+from src.predictor import Predictor
+from config.inference_config import MODEL_PATH, NUM_CLASSES
+
+
+def load_model(device="cpu", model_path=MODEL_PATH, num_classes=NUM_CLASSES):
+    """
+    Build the detector in eval mode, loading trained weights when they are available.
+    """
+    has_weights = bool(model_path) and os.path.exists(model_path)
+    model = FasterRCNNModel(num_classes=num_classes, device=device, pretrained=not has_weights).model
+    if has_weights:
+        model.load_state_dict(load_weights(model_path, map_location=device))
+    else:
+        print(f"Weights not found at {model_path}, benchmarking untrained weights")
+    model.eval()
+    return model
+
+
+def synthetic_images(count, size=(640, 480), seed=0):
+    """
+    Generate reproducible random RGB images of the given (width, height).
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    return [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def make_predict_batch(model, device="cpu"):
+    """
+    Return the `predict_batch(images)` of a Predictor wrapping `model`, the path served by main.py.
+    """
+    return Predictor(None, NUM_CLASSES, device=device, model=model).predict_batch
+
+
+def latency_summary(latencies):
+    """
+    Summarize a list of latencies in seconds as milliseconds percentiles.
+    """
+    values = np.asarray(latencies, dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {}
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def write_json(results, path):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MiB (Linux /proc, ru_maxrss elsewhere).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
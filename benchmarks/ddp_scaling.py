@@ -0,0 +1,113 @@
+"""
+Weak-scaling throughput of DistributedDataParallel training on one CPU host.
+
+For every process count the host's cores are split evenly between the ranks,
+each rank trains on its own synthetic batches and gradients are all-reduced
+over gloo, exactly as `torchrun ... -m src.model_training` does. Reports
+images/sec, speedup over one process and scaling efficiency; the one-process
+run is always measured, even when `--processes` leaves it out.
+
+    python -m benchmarks.ddp_scaling --processes 1,2,4,8 --steps 10 --output artifacts/benchmarks/ddp.json
+"""
+import os
+import time
+import socket
+import argparse
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+from src.model_architecture import FasterRCNNModel
+from benchmarks.common import write_json
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synthetic_batch(batch_size, size, seed):
+    generator = torch.Generator().manual_seed(seed)
+    width, height = size
+    images = [torch.rand(3, height, width, generator=generator) for _ in range(batch_size)]
+    targets = []
+    for _ in range(batch_size):
+        xy = torch.rand(2, generator=generator) * torch.tensor([width / 2, height / 2])
+        boxes = torch.cat([xy, xy + torch.tensor([width / 4, height / 4])]).unsqueeze(0)
+        targets.append({"boxes": boxes, "labels": torch.ones(1, dtype=torch.int64)})
+    return images, targets
+
+
+def worker(rank, world_size, port, args, results):
+    os.environ.update(MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+
+    model = FasterRCNNModel(num_classes=2, device="cpu", backbone=args.backbone).model
+    model.train()
+    ddp_model = DistributedDataParallel(model)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    images, targets = synthetic_batch(args.batch_size, (args.width, args.height), seed=rank)
+
+    def step():
+        loss = sum(ddp_model(images, targets).values())
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+    for _ in range(args.warmup):
+        step()
+    dist.barrier()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    dist.barrier()
+    elapsed = time.perf_counter() - start
+
+    if rank == 0:
+        results.put(elapsed)
+    dist.destroy_process_group()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DDP (gloo) training scaling benchmark")
+    parser.add_argument("--processes", default="1,2,4,8")
+    parser.add_argument("--backbone", default="resnet50_fpn")
+    parser.add_argument("--batch-size", type=int, default=2, help="Per-process batch size")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    context = mp.get_context("spawn")
+    results, baseline = [], None
+    # Speedup and efficiency are relative to one process, so that run always comes first
+    world_sizes = sorted(set(map(int, args.processes.split(","))) | {1})
+    for world_size in world_sizes:
+        queue = context.SimpleQueue()
+        mp.start_processes(worker, args=(world_size, free_port(), args, queue), nprocs=world_size,
+                           start_method="spawn")
+        elapsed = queue.get()
+
+        images_per_s = world_size * args.batch_size * args.steps / elapsed
+        baseline = baseline or images_per_s
+        result = {
+            "processes": world_size,
+            "threads_per_process": max(1, (os.cpu_count() or 1) // world_size),
+            "images_per_s": images_per_s,
+            "speedup": images_per_s / baseline,
+            "efficiency": images_per_s / (baseline * world_size),
+        }
+        results.append(result)
+        print(f"processes={world_size:2d}  {images_per_s:6.2f} img/s  "
+              f"speedup {result['speedup']:4.2f}x  efficiency {result['efficiency']:5.1%}")
+
+    write_json({"backbone": args.backbone, "batch_size": args.batch_size,
+                "image_size": [args.width, args.height], "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
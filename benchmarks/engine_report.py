@@ -0,0 +1,138 @@
+"""
+Accuracy-vs-latency report for the exported inference engines.
+
+Every engine is measured in its own subprocess so RSS numbers are not polluted
+by the others. Accuracy is scored on the held-out split of GunDataset
+(`train_val_split`) and reported as a delta against the eager model. Each
+engine is also wrapped in a TiledPredictor and run on an image larger than a
+tile, to check tiled inference works with it.
+
+    python -m src.model_export                      # export the variants first
+    python -m benchmarks.engine_report --images 60 --output reports/engines.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import torch
+from src.data_processing import GunDataset, train_val_split
+from PIL import Image
+from src.model_export import ENGINES, load_inference_model
+from src.predictor import Predictor
+from src.tiling import TiledPredictor
+from src.metrics import evaluate
+from config.inference_config import MODEL_PATH, NUM_CLASSES, EXPORT_DIR, SCORE_THRESHOLD, TILE_SIZE
+from benchmarks.common import latency_summary, current_rss_mb, peak_rss_mb, write_json
+
+
+def check_tiling(engine):
+    """
+    Build a TiledPredictor over `engine` and run one image larger than a tile through it.
+
+    Reports whether tiles run at native resolution, or the engine keeps its exported resize.
+    """
+    try:
+        predictor = Predictor(MODEL_PATH, NUM_CLASSES, device="cpu", engine=engine, export_dir=EXPORT_DIR)
+        tiled = TiledPredictor(predictor, tile_size=TILE_SIZE, skip_uniform=False)
+        start = time.perf_counter()
+        tiled.predict(Image.new("RGB", (TILE_SIZE * 2, TILE_SIZE), (96, 96, 96)))
+        return {"tiled_native": tiled.tile_predictor is not predictor, "tiled_ms": (time.perf_counter() - start) * 1000}
+    except Exception as e:
+        return {"tiled_error": f"{type(e).__name__}: {e}"}
+
+
+def measure_engine(engine, dataset_path, num_images, threads):
+    torch.set_num_threads(threads)
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    model = load_inference_model(engine, MODEL_PATH, NUM_CLASSES, "cpu", EXPORT_DIR)
+    load_time = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    _, val_dataset = train_val_split(GunDataset(dataset_path))
+    num_images = min(num_images, len(val_dataset))
+
+    predictions, targets, latencies = [], [], []
+    with torch.no_grad():
+        model([val_dataset[0][0]])  # warmup
+        for i in range(num_images):
+            image, target = val_dataset[i]
+            start = time.perf_counter()
+            output = model([image])[0]
+            latencies.append(time.perf_counter() - start)
+            predictions.append({key: value.cpu().numpy() for key, value in output.items()})
+            targets.append({key: value.numpy() for key, value in target.items()})
+
+    summary = evaluate(predictions, targets, score_threshold=SCORE_THRESHOLD).summary()
+
+    return {
+        "engine": engine,
+        "images": num_images,
+        "load_time_s": load_time,
+        "model_rss_mb": rss_loaded - rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        **{key: summary[key] for key in ("mAP", "AP50", "AP75", "precision", "recall")},
+        **latency_summary(latencies),
+        **check_tiling(engine),
+    }
+
+
+def tiling_status(result):
+    if "tiled_error" in result:
+        return f"failed: {result['tiled_error']}"
+    return "native tiles" if result["tiled_native"] else "exported resize"
+
+
+def run_isolated(engine, args):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    command = [sys.executable, "-m", "benchmarks.engine_report", "--single", engine,
+               "--dataset", args.dataset, "--images", str(args.images), "--threads", str(args.threads),
+               "--output", result_path]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"engine": engine, "error": completed.stderr.strip().splitlines()[-1:]}
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy vs latency report for inference engines")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--images", type=int, default=50, help="Held-out images to score")
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    parser.add_argument("--single", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    if args.single:
+        write_json(measure_engine(args.single, args.dataset, args.images, args.threads), args.output)
+        return
+
+    results = [run_isolated(engine, args) for engine in args.engines.split(",")]
+    baseline = next((r for r in results if r["engine"] == "eager" and "error" not in r), None)
+
+    print(f"{'engine':14s} {'mAP':>7s} {'dmAP':>7s} {'AP50':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'RSS MB':>8s}  tiling")
+    for r in results:
+        if "error" in r:
+            print(f"{r['engine']:14s} failed: {r['error']}")
+            continue
+        if baseline is not None:
+            r["mAP_delta"] = r["mAP"] - baseline["mAP"]
+            r["AP50_delta"] = r["AP50"] - baseline["AP50"]
+        print(f"{r['engine']:14s} {r['mAP']:7.4f} {r.get('mAP_delta', float('nan')):+7.4f} {r['AP50']:7.4f} "
+              f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['model_rss_mb']:8.1f}  {tiling_status(r)}")
+
+    write_json({"threads": args.threads, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
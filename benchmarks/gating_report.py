@@ -0,0 +1,143 @@
+"""
+Recall vs throughput of the gating cascade against running the detector on every frame.
+
+Held-out images are split randomly in two: gate thresholds are calibrated
+on one half for each drop budget, then the other half measures how many
+ground-truth boxes and served detector detections (score > threshold) fall on
+skipped frames, and the throughput of gate + detector on the frames that
+pass. `within_budget` is only true when both stay under the budget on the
+half the threshold never saw. `--negatives` adds frames without a weapon
+(background crops of the held-out images, or gray frames), since the
+dataset itself has few.
+
+    python -m benchmarks.gating_report --gates rpn,classifier --budgets 0.01,0.02,0.05
+"""
+import time
+import argparse
+import numpy as np
+import torch
+from PIL import Image
+from src.predictor import Predictor
+from src.gating import create_gate, gate_input, calibrate_threshold, background_crop, tensor_to_image
+from src.image_decode import image_to_tensor
+from config.inference_config import (MODEL_PATH, NUM_CLASSES, BACKBONE, SCORE_THRESHOLD, GATE_RPN_MIN_SIZE,
+                                     GATE_RPN_MAX_SIZE, GATE_CLASSIFIER_PATH, GATE_CLASSIFIER_SIZE)
+from benchmarks.common import write_json
+from benchmarks.resolution_report import held_out_images
+
+
+def negative_frames(samples, count):
+    """
+    Frames without a weapon: background strips of the held-out images, padded with gray frames.
+    """
+    frames = []
+    for image, boxes in samples:
+        if len(frames) >= count:
+            break
+        crop = background_crop(image_to_tensor(image), torch.as_tensor(boxes))
+        if crop is not None:
+            frames.append(tensor_to_image(crop))
+    while len(frames) < count:
+        frames.append(Image.new("RGB", (640, 480), (128, 128, 128)))
+    return [(frame, np.zeros((0, 4), dtype=np.float32)) for frame in frames]
+
+
+def run_detector(predictor, samples):
+    """
+    Per-frame detector seconds and count of detections above SCORE_THRESHOLD, as filter_detections serves them.
+    """
+    predictor.predict_batch([samples[0][0]])  # warmup
+    seconds, detections = [], []
+    for image, _ in samples:
+        start = time.perf_counter()
+        result = predictor.predict_batch([image])[0]
+        seconds.append(time.perf_counter() - start)
+        detections.append(int((result["scores"] > SCORE_THRESHOLD).sum()))
+    return np.asarray(seconds), np.asarray(detections)
+
+
+def run_gate(gate, samples):
+    gate.score([gate_input(samples[0][0], gate.input_size)])  # warmup
+    seconds, scores = [], []
+    for image, _ in samples:
+        start = time.perf_counter()
+        scores.append(float(gate.score([gate_input(image, gate.input_size)])[0]))
+        seconds.append(time.perf_counter() - start)
+    return np.asarray(seconds), np.asarray(scores)
+
+
+def fraction(values, mask):
+    total = values.sum()
+    return float(values[mask].sum() / total) if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gating cascade recall vs throughput report")
+    parser.add_argument("--gates", default="rpn,classifier")
+    parser.add_argument("--budgets", default="0.01,0.02,0.05", help="Max fraction of dropped boxes / detections")
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--negatives", type=int, default=100, help="Frames without a weapon added to the set")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    positives = held_out_images(args.dataset, args.images)
+    samples = positives + negative_frames(positives, args.negatives)
+    rng = np.random.default_rng(0)
+    calibration = rng.permutation(len(samples)) < len(samples) // 2
+    held_out = ~calibration
+    gt_boxes = np.asarray([len(boxes) for _, boxes in samples])
+
+    predictor = Predictor(MODEL_PATH, NUM_CLASSES, device="cpu", backbone=BACKBONE)
+    detector_seconds, detections = run_detector(predictor, samples)
+    baseline_fps = held_out.sum() / detector_seconds[held_out].sum()
+
+    results = []
+    for kind in args.gates.split(","):
+        try:
+            gate = create_gate(kind, predictor.model, rpn_min_size=GATE_RPN_MIN_SIZE, rpn_max_size=GATE_RPN_MAX_SIZE,
+                               classifier_path=GATE_CLASSIFIER_PATH, classifier_size=GATE_CLASSIFIER_SIZE)
+        except Exception as e:
+            results.append({"gate": kind, "error": str(e)})
+            continue
+        gate_seconds, scores = run_gate(gate, samples)
+
+        for budget in map(float, args.budgets.split(",")):
+            threshold = calibrate_threshold(scores[calibration], gt_boxes[calibration], budget)
+            skipped = (scores < threshold) & held_out
+            cost = gate_seconds[held_out].sum() + detector_seconds[held_out & ~skipped].sum()
+            result = {
+                "gate": kind,
+                "budget": budget,
+                "threshold": threshold,
+                "dropped_boxes": fraction(gt_boxes * held_out, skipped),
+                "dropped_detections": fraction(detections * held_out, skipped),
+                "skip_rate": float(skipped.sum() / held_out.sum()),
+                "gate_ms": float(gate_seconds.mean() * 1000),
+                "throughput_fps": float(held_out.sum() / cost),
+                "speedup": float(held_out.sum() / cost / baseline_fps),
+            }
+            result["within_budget"] = result["dropped_boxes"] <= budget and result["dropped_detections"] <= budget
+            results.append(result)
+
+    print(f"detector only: {baseline_fps:.2f} frames/s on {int(held_out.sum())} held-out frames")
+    print(f"{'gate':11s} {'budget':>6s} {'thresh':>7s} {'drop box':>8s} {'drop det':>8s} {'skip':>6s} "
+          f"{'gate ms':>8s} {'fps':>7s} {'speedup':>7s}  ok")
+    for r in results:
+        if "error" in r:
+            print(f"{r['gate']:11s} failed: {r['error']}")
+            continue
+        print(f"{r['gate']:11s} {r['budget']:6.3f} {r['threshold']:7.4f} {r['dropped_boxes']:8.3%} "
+              f"{r['dropped_detections']:8.3%} {r['skip_rate']:6.1%} {r['gate_ms']:8.1f} {r['throughput_fps']:7.2f} "
+              f"{r['speedup']:6.2f}x  {'yes' if r['within_budget'] else 'NO'}")
+
+    write_json({"frames": len(samples), "held_out_frames": int(held_out.sum()), "score_threshold": SCORE_THRESHOLD,
+                "baseline_fps": float(baseline_fps), "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Throughput of the GunDataset DataLoader pipeline, with and without the model.
+
+For every worker count the loader is first drained on its own (images/sec the
+input pipeline can deliver), then again feeding training steps of the
+detector. If the loader-only rate is not well above the with-model rate, data
+loading is the bottleneck.
+
+    python -m benchmarks.loader_benchmark --workers 0,2,4 --packed-dir artifacts/packed --with-model
+"""
+import time
+import argparse
+import torch
+from torch.utils.data import DataLoader, Subset
+from src.data_processing import GunDataset, collate_batch, to_float_images
+from src.model_architecture import FasterRCNNModel
+from benchmarks.common import write_json
+
+
+def make_loader(dataset, batch_size, num_workers, pin_memory, prefetch_factor):
+    options = dict(batch_size=batch_size, shuffle=True, num_workers=num_workers,
+                   pin_memory=pin_memory, collate_fn=collate_batch)
+    if num_workers > 0:
+        options.update(persistent_workers=False, prefetch_factor=prefetch_factor)
+    return DataLoader(dataset, **options)
+
+
+def run(loader, max_batches, step=None):
+    images_seen = 0
+    start = time.perf_counter()
+    for i, (images, targets) in enumerate(loader):
+        if i >= max_batches:
+            break
+        images = to_float_images(images)
+        if step is not None:
+            step(images, targets)
+        images_seen += len(images)
+    elapsed = time.perf_counter() - start
+    return images_seen / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GunDataset loader throughput benchmark")
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--packed-dir", default=None)
+    parser.add_argument("--workers", default="0,2,4")
+    parser.add_argument("--batch-size", type=int, default=3)
+    parser.add_argument("--batches", type=int, default=30)
+    parser.add_argument("--prefetch-factor", type=int, default=2)
+    parser.add_argument("--with-model", action="store_true", help="Also measure with a training step per batch")
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    dataset = GunDataset(args.dataset, packed_dir=args.packed_dir)
+    dataset = Subset(dataset, range(min(len(dataset), args.batches * args.batch_size)))
+    pin_memory = torch.cuda.is_available()
+    device = torch.device("cuda" if pin_memory else "cpu")
+
+    step = None
+    if args.with_model:
+        model = FasterRCNNModel(num_classes=2, device=device).model
+        model.train()
+        optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+
+        def step(images, targets):
+            images = [img.to(device, non_blocking=True) for img in images]
+            targets = [{k: v.to(device, non_blocking=True) for k, v in t.items()} for t in targets]
+            loss = sum(model(images, targets).values())
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+    results = []
+    for workers in map(int, args.workers.split(",")):
+        loader = make_loader(dataset, args.batch_size, workers, pin_memory, args.prefetch_factor)
+        result = {"workers": workers, "loader_images_per_s": run(loader, args.batches)}
+        if step is not None:
+            result["with_model_images_per_s"] = run(loader, args.batches, step)
+            result["loader_bound"] = result["loader_images_per_s"] < 1.5 * result["with_model_images_per_s"]
+        results.append(result)
+
+        line = f"workers={workers:2d}  loader {result['loader_images_per_s']:8.1f} img/s"
+        if step is not None:
+            line += f"  with model {result['with_model_images_per_s']:6.2f} img/s"
+            line += "  (loader-bound)" if result["loader_bound"] else "  (model-bound)"
+        print(line)
+
+    write_json({"packed": dataset.dataset.packed is not None, "batch_size": args.batch_size, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
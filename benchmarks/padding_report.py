@@ -0,0 +1,99 @@
+"""
+Padding waste and step time of random vs aspect-ratio bucketed batches.
+
+Padding is computed from the image size index alone, following
+GeneralizedRCNNTransform: every image is resized to min_size/max_size and the
+batch is padded to its largest height and width rounded up to 32. With
+`--step-time`, a few training steps are timed for each batching strategy.
+
+    python -m benchmarks.padding_report --batch-size 4 --step-time 10
+"""
+import math
+import time
+import argparse
+import numpy as np
+import torch
+from src.data_processing import GunDataset, to_float_images
+from src.samplers import AspectRatioBatchSampler
+from src.model_architecture import FasterRCNNModel
+from benchmarks.common import write_json
+
+
+def resized(width, height, min_size, max_size):
+    scale = min(min_size / min(width, height), max_size / max(width, height))
+    return int(math.floor(width * scale)), int(math.floor(height * scale))
+
+
+def padding_fraction(batches, sizes, min_size, max_size, size_divisible=32):
+    used, padded = 0, 0
+    for batch in batches:
+        dims = [resized(*sizes[i], min_size, max_size) for i in batch]
+        pad_w = int(math.ceil(max(w for w, _ in dims) / size_divisible) * size_divisible)
+        pad_h = int(math.ceil(max(h for _, h in dims) / size_divisible) * size_divisible)
+        used += sum(w * h for w, h in dims)
+        padded += len(dims) * pad_w * pad_h
+    return 1 - used / padded
+
+
+def random_batches(num_items, batch_size, seed=0):
+    order = np.random.default_rng(seed).permutation(num_items)
+    return [order[i:i + batch_size].tolist() for i in range(0, num_items, batch_size)]
+
+
+def time_steps(dataset, batches, steps):
+    model = FasterRCNNModel(num_classes=2, device="cpu").model
+    model.train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+
+    durations = []
+    for batch in batches[:steps]:
+        images, targets = zip(*(dataset[i] for i in batch))
+        start = time.perf_counter()
+        loss = sum(model(to_float_images(images), list(targets)).values())
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        durations.append(time.perf_counter() - start)
+    # The first step pays for allocator warmup
+    return float(np.mean(durations[1:] or durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Padding waste of random vs bucketed batching")
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--packed-dir", default=None)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--min-size", type=int, default=800)
+    parser.add_argument("--max-size", type=int, default=1333)
+    parser.add_argument("--step-time", type=int, default=0, help="Training steps to time per strategy (0 = skip)")
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    dataset = GunDataset(args.dataset, packed_dir=args.packed_dir)
+    sizes = dataset.image_sizes()
+
+    strategies = {
+        "random": random_batches(len(sizes), args.batch_size),
+        "aspect_ratio": AspectRatioBatchSampler(sizes, args.batch_size, shuffle=True).batches(),
+    }
+
+    results = {}
+    for name, batches in strategies.items():
+        results[name] = {
+            "batches": len(batches),
+            "padding_fraction": padding_fraction(batches, sizes, args.min_size, args.max_size),
+        }
+        if args.step_time:
+            results[name]["step_time_s"] = time_steps(dataset, batches, args.step_time + 1)
+
+    for name, r in results.items():
+        line = f"{name:13s} padding {r['padding_fraction'] * 100:5.1f}%  ({r['batches']} batches)"
+        if "step_time_s" in r:
+            line += f"  step {r['step_time_s']:.3f}s"
+        print(line)
+
+    write_json({"batch_size": args.batch_size, "images": len(sizes), "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
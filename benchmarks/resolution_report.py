@@ -0,0 +1,102 @@
+"""
+Latency vs recall trade-off across backbones and input resolutions.
+
+Each configuration is `backbone:min_size:max_size` (sizes may be left empty
+for the backbone default) and is scored on the held-out split with the weights
+trained for that backbone (`model_filename`). Images go through the same
+`Predictor` path as the server, including pre-downscaling of large inputs.
+
+    python -m benchmarks.resolution_report \
+        --configs resnet50_fpn::,resnet50_fpn:512:853,mobilenet_v3_large_fpn::,mobilenet_v3_large_320_fpn::
+"""
+import os
+import time
+import argparse
+import torch
+from PIL import Image
+from src.predictor import Predictor
+from src.model_architecture import model_filename
+from src.data_processing import GunDataset, train_val_split
+from src.metrics import average_precision, recall_at
+from config.inference_config import NUM_CLASSES, SCORE_THRESHOLD
+from benchmarks.common import latency_summary, write_json
+
+
+def parse_config(text):
+    backbone, _, sizes = text.partition(":")
+    min_size, _, max_size = sizes.partition(":")
+    return backbone, int(min_size) if min_size else None, int(max_size) if max_size else None
+
+
+def held_out_images(dataset_path, num_images):
+    """
+    Held-out (PIL image, ground-truth boxes) pairs, decoded from the original files.
+    """
+    dataset = GunDataset(dataset_path)
+    _, val_dataset = train_val_split(dataset)
+    samples = []
+    for idx in val_dataset.indices[:num_images]:
+        image = Image.open(os.path.join(dataset.image_path, dataset.img_name[idx])).convert("RGB")
+        _, target = dataset[idx]
+        samples.append((image, target["boxes"].numpy().reshape(-1, 4)))
+    return samples
+
+
+def measure(config, samples, models_dir, score_threshold):
+    backbone, min_size, max_size = config
+    model_path = os.path.join(models_dir, model_filename(backbone))
+    predictor = Predictor(model_path, NUM_CLASSES, device="cpu", backbone=backbone, min_size=min_size, max_size=max_size)
+
+    predictor.predict_batch([samples[0][0]])  # warmup
+    predictions, latencies = [], []
+    for image, _ in samples:
+        start = time.perf_counter()
+        predictions.append(predictor.predict_batch([image])[0])
+        latencies.append(time.perf_counter() - start)
+
+    targets = [{"boxes": boxes} for _, boxes in samples]
+    return {
+        "backbone": backbone,
+        "min_size": predictor.min_size,
+        "max_size": predictor.max_size,
+        "recall": recall_at(predictions, targets, score_threshold),
+        "AP50": average_precision(predictions, targets, 0.5),
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backbone / input resolution latency vs recall report")
+    parser.add_argument("--configs", default="resnet50_fpn::,resnet50_fpn:640:1066,resnet50_fpn:512:853,mobilenet_v3_large_fpn::")
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--models-dir", default="artifacts/models")
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--score-threshold", type=float, default=SCORE_THRESHOLD)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    samples = held_out_images(args.dataset, args.images)
+    results = []
+    for text in args.configs.split(","):
+        try:
+            results.append(measure(parse_config(text), samples, args.models_dir, args.score_threshold))
+        except Exception as e:
+            results.append({"config": text, "error": str(e)})
+
+    print(f"{'backbone':28s} {'min':>5s} {'max':>5s} {'recall':>7s} {'AP50':>7s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['config']:28s} failed: {r['error']}")
+            continue
+        print(f"{r['backbone']:28s} {r['min_size']:5d} {r['max_size']:5d} {r['recall']:7.3f} {r['AP50']:7.3f} "
+              f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f}")
+
+    write_json({"images": len(samples), "score_threshold": args.score_threshold, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+End-to-end offline benchmark suite with baseline comparison.
+
+Measures, on a fixed image set (the first `--images` files of `artifacts/raw`
+or reproducible synthetic images):
+
+- model load time of the configured inference pipeline,
+- single-image latency percentiles,
+- batched throughput at several batch sizes,
+- GunDataset loader throughput for several worker counts,
+- HTTP throughput and latency of the FastAPI app under concurrent clients,
+  through an in-process TestClient (no network needed).
+
+Every run writes a flat `metrics` dict to JSON. `--baseline` compares against
+a stored run and flags metrics that got worse by more than `--tolerance`.
+
+    python -m benchmarks.suite --output artifacts/benchmarks/baseline.json
+    python -m benchmarks.suite --baseline artifacts/benchmarks/baseline.json --fail-on-regression
+"""
+import io
+import os
+import sys
+import time
+import json
+import platform
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from PIL import Image
+from benchmarks.common import load_model, synthetic_images, make_predict_batch, latency_summary, write_json
+from config.inference_config import MODEL_PATH, NUM_CLASSES, BACKBONE, MODEL_MIN_SIZE, MODEL_MAX_SIZE
+
+## Metric name suffixes where a larger value is better; everything else is a cost
+HIGHER_IS_BETTER = ("_per_s", "_rps")
+
+
+def benchmark_images(dataset_path, count, size):
+    image_dir = os.path.join(dataset_path, "Images")
+    if dataset_path and os.path.isdir(image_dir):
+        names = sorted(os.listdir(image_dir))[:count]
+        return [Image.open(os.path.join(image_dir, name)).convert("RGB") for name in names], "dataset"
+    return synthetic_images(count, size=size), "synthetic"
+
+
+def load_pipeline():
+    """
+    The server's Predictor when trained weights exist, otherwise the untrained detector.
+    """
+    start = time.perf_counter()
+    if os.path.exists(MODEL_PATH):
+        from src.predictor import Predictor
+        predictor = Predictor(MODEL_PATH, NUM_CLASSES, device="cpu", backbone=BACKBONE,
+                              min_size=MODEL_MIN_SIZE, max_size=MODEL_MAX_SIZE)
+        predict_batch, source = predictor.predict_batch, "predictor"
+    else:
+        predict_batch, source = make_predict_batch(load_model("cpu")), "untrained"
+    return predict_batch, time.perf_counter() - start, source
+
+
+def single_image_latency(predict_batch, images, repeats):
+    predict_batch(images[:1])  # warmup
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        predict_batch([images[i % len(images)]])
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def batched_throughput(predict_batch, images, batch_sizes, batches):
+    results = {}
+    for batch_size in batch_sizes:
+        batch = [images[i % len(images)] for i in range(batch_size)]
+        predict_batch(batch)  # warmup at this shape
+        start = time.perf_counter()
+        for _ in range(batches):
+            predict_batch(batch)
+        results[f"bs{batch_size}"] = {"images_per_s": batch_size * batches / (time.perf_counter() - start)}
+    return results
+
+
+def loader_throughput(dataset_path, worker_counts, batch_size, batches):
+    from torch.utils.data import Subset
+    from src.data_processing import GunDataset
+    from benchmarks.loader_benchmark import make_loader, run
+
+    dataset = GunDataset(dataset_path)
+    dataset = Subset(dataset, range(min(len(dataset), batch_size * batches)))
+    return {
+        f"workers{workers}": {"images_per_s": run(make_loader(dataset, batch_size, workers, False, 2), batches)}
+        for workers in worker_counts
+    }
+
+
+def http_throughput(images, clients, requests_per_client):
+    """
+    Concurrent POST /detect calls against the app through an in-process TestClient.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    payloads = []
+    for i in range(clients * requests_per_client):
+        # Distinct bytes per request, so the result cache never short-circuits inference
+        image = images[i % len(images)].copy()
+        image.putpixel((0, 0), (i % 256, i // 256 % 256, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        payloads.append(buffer.getvalue())
+
+    with TestClient(main.app) as client:
+        # The model loads in the background at startup; wait until the app reports ready
+        while client.get("/health/ready").status_code != 200:
+            if main.readiness["error"]:
+                raise RuntimeError(main.readiness["error"])
+            time.sleep(0.1)
+        client.post("/detect", files={"file": ("warmup.jpg", payloads[0], "image/jpeg")})
+
+        def send(payload):
+            start = time.perf_counter()
+            response = client.post("/detect", files={"file": ("image.jpg", payload, "image/jpeg")})
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            outcomes = list(pool.map(send, payloads))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, status in outcomes if status == 200]
+    return {
+        "clients": clients,
+        "throughput_rps": len(latencies) / elapsed,
+        "errors": len(outcomes) - len(latencies),
+        **latency_summary(latencies),
+    }
+
+
+def flatten(results, prefix=""):
+    """
+    Flatten nested numeric results into dotted metric names.
+    """
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    """
+    Relative change of every shared metric; a change worse than `tolerance` is a regression.
+    """
+    rows = []
+    for name in sorted(set(metrics) & set(baseline)):
+        before, after = baseline[name], metrics[name]
+        if not before or name.endswith((".count", ".clients", ".errors")):
+            continue
+        change = (after - before) / abs(before)
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        rows.append({"metric": name, "baseline": before, "current": after, "change": change,
+                     "regression": worse > tolerance})
+    return rows
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end detection pipeline benchmark suite")
+    parser.add_argument("--dataset", default="artifacts/raw", help="Images are taken from here if it exists")
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--width", type=int, default=640, help="Synthetic image width")
+    parser.add_argument("--height", type=int, default=480, help="Synthetic image height")
+    parser.add_argument("--repeats", type=int, default=20, help="Single-image latency samples")
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    parser.add_argument("--batches", type=int, default=5, help="Batches per batch size / loader run")
+    parser.add_argument("--loader-workers", default="0,2,4")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=4, help="HTTP requests per client")
+    parser.add_argument("--skip", default="", help="Comma-separated sections to skip: load,single,batched,loader,http")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads value")
+    parser.add_argument("--output", default=None, help="JSON output path")
+    parser.add_argument("--baseline", default=None, help="Earlier suite JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed relative regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    skip = set(filter(None, args.skip.split(",")))
+    images, image_source = benchmark_images(args.dataset, args.images, (args.width, args.height))
+    results, errors = {}, {}
+
+    predict_batch, load_seconds, pipeline = load_pipeline()
+    if "load" not in skip:
+        results["load"] = {"seconds": load_seconds}
+    if "single" not in skip:
+        results["single_image"] = single_image_latency(predict_batch, images, args.repeats)
+    if "batched" not in skip:
+        batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+        results["batched"] = batched_throughput(predict_batch, images, batch_sizes, args.batches)
+
+    sections = {
+        "loader": lambda: loader_throughput(args.dataset, [int(w) for w in args.loader_workers.split(",")],
+                                            3, args.batches),
+        "http": lambda: http_throughput(images, args.clients, args.requests),
+    }
+    for name, section in sections.items():
+        if name in skip:
+            continue
+        try:
+            results[name] = section()
+        except Exception as e:
+            # Missing dataset or weights should not sink the other measurements
+            errors[name] = f"{type(e).__name__}: {e}"
+
+    metrics = flatten(results)
+    report = {
+        "environment": environment(),
+        "images": {"source": image_source, "count": len(images)},
+        "pipeline": pipeline,
+        "results": results,
+        "skipped": errors,
+        "metrics": metrics,
+    }
+    for name, value in metrics.items():
+        print(f"{name:40s} {value:12.3f}")
+    for name, error in errors.items():
+        print(f"{name:40s} skipped ({error})")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+        report["comparison"] = compare(metrics, baseline, args.tolerance)
+        print(f"\n{'metric':40s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+        for row in report["comparison"]:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:40s} {row['baseline']:12.3f} {row['current']:12.3f} {row['change']:+8.1%}{flag}")
+        regressions = [row["metric"] for row in report["comparison"] if row["regression"]]
+
+    write_json(report, args.output)
+    if regressions and args.fail_on_regression:
+        print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
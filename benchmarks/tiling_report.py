@@ -0,0 +1,125 @@
+"""
+Recall vs latency of tiled inference against the single-pass path on high resolution images.
+
+The held-out images are small, so they are pasted into `--mosaic` x `--mosaic`
+grids (with their ground-truth boxes shifted along) to build large scenes
+with small objects, the case tiling is meant for. Empty grid cells are left
+uniform gray, so skipping uniform tiles has something to skip. Each
+configuration is `single` or `tile_size:overlap:merge`, all on the same
+Predictor.
+
+    python -m benchmarks.tiling_report --configs single,1024:0.2:nms,1024:0.2:wbf,640:0.25:nms --mosaic 4
+"""
+import time
+import argparse
+import numpy as np
+import torch
+from PIL import Image
+from src.predictor import Predictor
+from src.tiling import TiledPredictor, tiles_total
+from src.metrics import evaluate
+from config.inference_config import MODEL_PATH, NUM_CLASSES, BACKBONE, SCORE_THRESHOLD
+from benchmarks.common import latency_summary, write_json
+from benchmarks.resolution_report import held_out_images
+
+
+def mosaics(samples, grid:int, cell:int, fill_ratio:float, seed:int=0):
+    """
+    (image, boxes) scenes of grid x grid cells, each cell holding a held-out image with probability `fill_ratio`.
+    """
+    rng = np.random.default_rng(seed)
+    scenes, next_sample = [], 0
+    while next_sample < len(samples):
+        canvas = Image.new("RGB", (grid * cell, grid * cell), (128, 128, 128))
+        boxes = []
+        for row in range(grid):
+            for col in range(grid):
+                if next_sample >= len(samples) or rng.random() > fill_ratio:
+                    continue
+                image, image_boxes = samples[next_sample]
+                next_sample += 1
+                scale = cell / max(image.size)
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                canvas.paste(image.resize(size, Image.BILINEAR), (col * cell, row * cell))
+                offset = np.array([col * cell, row * cell] * 2, dtype=np.float32)
+                boxes.append(image_boxes * scale + offset)
+        scenes.append((canvas, np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32)))
+    return scenes
+
+
+def parse_config(text):
+    if text == "single":
+        return None
+    tile_size, overlap, merge = text.split(":")
+    return {"tile_size": int(tile_size), "overlap": float(overlap), "merge": merge}
+
+
+def tile_counts():
+    return {labels[0]: int(value) for labels, value in tiles_total.values.items()}
+
+
+def measure(name, predict, scenes, score_threshold):
+    predict(scenes[0][0])  # warmup
+    before = tile_counts()
+    predictions, latencies = [], []
+    for image, _ in scenes:
+        start = time.perf_counter()
+        predictions.append(predict(image))
+        latencies.append(time.perf_counter() - start)
+    after = tile_counts()
+
+    summary = evaluate(predictions, [{"boxes": boxes} for _, boxes in scenes], score_threshold=score_threshold).summary()
+    return {
+        "config": name,
+        "recall": summary["recall"],
+        "AP50": summary["AP50"],
+        "mAP": summary["mAP"],
+        "tiles": {outcome: after.get(outcome, 0) - before.get(outcome, 0) for outcome in after},
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled vs single-pass inference recall and latency")
+    parser.add_argument("--configs", default="single,1024:0.2:nms,1024:0.2:wbf,640:0.25:nms")
+    parser.add_argument("--dataset", default="artifacts/raw")
+    parser.add_argument("--images", type=int, default=48, help="Held-out images pasted into the scenes")
+    parser.add_argument("--mosaic", type=int, default=4, help="Scene grid side, in images")
+    parser.add_argument("--cell", type=int, default=800, help="Grid cell side in pixels")
+    parser.add_argument("--fill", type=float, default=0.75, help="Fraction of cells holding an image")
+    parser.add_argument("--no-full-image", action="store_true", help="Tiles only, without the downscaled global pass")
+    parser.add_argument("--keep-uniform", action="store_true", help="Also infer uniform tiles")
+    parser.add_argument("--score-threshold", type=float, default=SCORE_THRESHOLD)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    scenes = mosaics(held_out_images(args.dataset, args.images), args.mosaic, args.cell, args.fill)
+    predictor = Predictor(MODEL_PATH, NUM_CLASSES, device="cpu", backbone=BACKBONE)
+
+    results = []
+    for text in args.configs.split(","):
+        options = parse_config(text)
+        if options is None:
+            predict = lambda image: predictor.predict_batch([image])[0]
+        else:
+            tiled = TiledPredictor(predictor, include_full_image=not args.no_full_image,
+                                   skip_uniform=not args.keep_uniform, **options)
+            predict = tiled.predict
+        results.append(measure(text, predict, scenes, args.score_threshold))
+
+    print(f"{'config':20s} {'recall':>7s} {'AP50':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'tiles run':>10s} {'skipped':>8s}")
+    for r in results:
+        skipped = r["tiles"].get("uniform", 0) + r["tiles"].get("unchanged", 0)
+        print(f"{r['config']:20s} {r['recall']:7.3f} {r['AP50']:7.3f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} "
+              f"{r['tiles'].get('inferred', 0):10d} {skipped:8d}")
+
+    write_json({"scenes": len(scenes), "scene_size": args.mosaic * args.cell,
+                "score_threshold": args.score_threshold, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
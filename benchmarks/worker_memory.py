@@ -0,0 +1,86 @@
+"""
+Total memory of N inference worker processes, with private vs shared (memory-mapped) weights.
+
+Each worker builds the server's Predictor, as a uvicorn or process-pool worker
+would, runs a warmup forward pass and then idles while the parent reads its
+memory from /proc/<pid>/smaps_rollup. RSS counts shared pages in every
+process; PSS splits them between the processes sharing them, so the PSS sum
+is the real footprint of the fleet.
+
+    python -m benchmarks.worker_memory --workers 1,4,8 --output artifacts/benchmarks/worker_memory.json
+"""
+import argparse
+import multiprocessing
+import torch
+from config.inference_config import MODEL_PATH, NUM_CLASSES, BACKBONE
+from benchmarks.common import write_json
+
+
+def process_memory_mb(pid):
+    """
+    (RSS, PSS) of a process in MiB, from smaps_rollup (Linux 4.14+).
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0]) / 1024.0
+    return values["Rss"], values["Pss"]
+
+
+def worker(shared_weights, ready, stop):
+    from PIL import Image
+    from src.predictor import Predictor
+
+    torch.set_num_threads(1)
+    predictor = Predictor(MODEL_PATH, NUM_CLASSES, device="cpu", backbone=BACKBONE, shared_weights=shared_weights)
+    predictor.predict_batch([Image.new("RGB", (640, 480))])
+    ready.release()
+    stop.wait()
+
+
+def measure(num_workers, shared_weights):
+    context = multiprocessing.get_context("spawn")
+    ready, stop = context.Semaphore(0), context.Event()
+    processes = [context.Process(target=worker, args=(shared_weights, ready, stop)) for _ in range(num_workers)]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            ready.acquire()
+        memory = [process_memory_mb(process.pid) for process in processes]
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+
+    return {
+        "workers": num_workers,
+        "shared_weights": shared_weights,
+        "total_rss_mb": sum(rss for rss, _ in memory),
+        "total_pss_mb": sum(pss for _, pss in memory),
+        "per_worker_pss_mb": sum(pss for _, pss in memory) / num_workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of N inference workers with private vs shared weights")
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--output", default=None, help="Optional JSON output path")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'workers':>7s} {'weights':>8s} {'RSS MB':>9s} {'PSS MB':>9s} {'PSS/worker':>11s}")
+    for num_workers in map(int, args.workers.split(",")):
+        for shared_weights in (False, True):
+            result = measure(num_workers, shared_weights)
+            results.append(result)
+            print(f"{num_workers:7d} {'shared' if shared_weights else 'private':>8s} {result['total_rss_mb']:9.1f} "
+                  f"{result['total_pss_mb']:9.1f} {result['per_worker_pss_mb']:11.1f}")
+
+    write_json({"model_path": MODEL_PATH, "backbone": BACKBONE, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
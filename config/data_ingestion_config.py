@@ -1,2 +1,16 @@
 DATASET_NAME = "issaisasank/guns-object-detection"
-TARGET_DIR = "artifacts/"
\ No newline at end of file
+TARGET_DIR = "artifacts/"
+
+## Offline source: a local zip or extracted folder with Images/ and Labels/; None downloads DATASET_NAME from Kaggle
+LOCAL_ARCHIVE = None
+
+## Incremental, parallel ingestion
+INGESTION_WORKERS = 8  # threads extracting, hashing and validating files
+MANIFEST_FILE = "ingestion_manifest.json"  # per-file hashes and validation results, kept in the raw directory
+QUARANTINE_DIR = "quarantine"  # unpaired or invalid image/label files are moved here, under TARGET_DIR
+CONFLICTS_DIR = "conflicts"  # differing source files with the same Images/ or Labels/ name, under QUARANTINE_DIR
+IMAGE_FORMATS = ("JPEG", "PNG", "BMP", "WEBP")  # image headers of any other format are rejected
+
+## Training-ready packed store written after ingestion (same store as training_config.PACKED_DIR)
+BUILD_PACKED = False
+PACKED_DIR = "artifacts/packed"
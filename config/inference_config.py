@@ -0,0 +1,101 @@
+MODEL_PATH = "artifacts/models/fasterrcnn.pth"  # fasterrcnn_<backbone>.pth for the other backbones
+NUM_CLASSES = 2
+
+## Architecture and input resolution (see BACKBONES in src/model_architecture.py)
+BACKBONE = "resnet50_fpn"
+MODEL_MIN_SIZE = None  # None keeps the backbone default (800, or 320 for mobilenet_v3_large_320_fpn)
+MODEL_MAX_SIZE = None  # None keeps the backbone default (1333, or 640)
+PREDOWNSCALE_INPUTS = True  # shrink large uploads to the model's resize target before tensor conversion
+SCORE_THRESHOLD = 0.7
+
+## Inference engine: eager, torchscript, onnx, dynamic_int8 or static_int8 (see src/model_export.py)
+INFERENCE_ENGINE = "eager"
+EXPORT_DIR = "artifacts/models/exported"
+
+## Dynamic micro-batching for the /predict/ endpoint
+BATCHING_ENABLED = True
+MAX_BATCH_SIZE = 4
+MAX_BATCH_WAIT_MS = 10
+BATCH_GROUP_BY_ASPECT_RATIO = True  # only batch images of similar shape, to avoid padding waste
+
+## Inference executor: "thread" shares the server's model, "process" loads one model copy per worker
+EXECUTOR_KIND = "thread"
+EXECUTOR_WORKERS = 1
+TORCH_NUM_THREADS = 0  # 0 splits the available cores evenly between workers
+MAX_PENDING_REQUESTS = 32
+RETRY_AFTER_SECONDS = 2
+
+## Legacy image output of /predict/
+DEFAULT_IMAGE_FORMAT = "png"  # png, jpeg or webp
+DEFAULT_IMAGE_QUALITY = 85
+
+## Multi-file / archive batch detection
+UPLOAD_CHUNK_SIZE = 16  # images decoded and inferred per streamed chunk
+
+## Video / stream detection
+VIDEO_DETECT_EVERY = 15  # run the detector at least every N frames
+VIDEO_MIN_DETECT_INTERVAL = 3  # and at most every N frames, even when the scene keeps changing
+VIDEO_SCENE_CHANGE_THRESHOLD = 12.0  # mean gray-level difference that forces a detector run
+TRACKER_IOU_THRESHOLD = 0.3
+TRACKER_MAX_MISSES = 2
+VIDEO_FRAME_QUEUE = 8
+# Named capture sources clients may open over the WebSocket, e.g. {"lobby": "rtsp://..."}
+VIDEO_SOURCES = {}
+
+## Result cache for repeated uploads
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_BACKEND = "memory"  # "memory" per process, or "sqlite" shared by all workers on the host
+RESULT_CACHE_PATH = "artifacts/cache/results.sqlite3"  # a /dev/shm path keeps the shared cache in RAM
+RESULT_CACHE_MAX_ENTRIES = 2048
+RESULT_CACHE_TTL_SECONDS = 600
+# Also match re-encoded/resized copies by perceptual hash. This trades recall for hit rate: a frame where a small
+# weapon has just appeared can match the cached empty frame, so leave it off where every frame must be detected
+RESULT_CACHE_PERCEPTUAL = False
+RESULT_CACHE_PERCEPTUAL_TOLERANCE = 8.0  # max gray-level change of any 16x16 thumbnail cell for a perceptual hit
+
+## Telemetry
+METRICS_ENABLED = True  # Prometheus text format on /metrics
+SERVER_TIMING_HEADER = False  # per-request Server-Timing header with stage durations
+INSTRUMENT_MODEL_STAGES = True  # hooks timing transform/backbone/rpn/roi_heads (eager engine only)
+PROFILER_ENABLED = False  # POST /debug/profile runs torch.profiler on the next N batches (thread executor)
+PROFILER_SAMPLE_EVERY = 0  # also profile one batch in every N, 0 = on demand only
+PROFILER_TRACE_DIR = "artifacts/profiles"
+
+## Startup and readiness
+LAZY_MODEL_LOADING = True  # bind the port first and load the model in the background; /health/ready flips when done
+WARMUP_SIZES = [(640, 480), (480, 640)]  # (width, height) of the warmup forward passes, typical upload shapes
+
+## Production launch profile (`python run_server.py --production`)
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
+SERVER_WORKERS = 2  # uvicorn worker processes; torch threads are split between them
+SHARED_WEIGHTS = True  # keep eager weights memory-mapped read-only so all workers share one copy
+
+## Upload limits and decoding
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024  # single image uploads, and every image inside a batch archive
+MAX_ARCHIVE_UPLOAD_BYTES = 1024 * 1024 * 1024  # request body of /detect/batch and /detect/video
+MAX_IMAGE_PIXELS = 50_000_000  # checked from the image header, before any pixel is decoded
+DRAFT_DECODE = True  # decode large JPEGs at a reduced scale when only detections are returned
+
+## Tiled (sliding-window) inference for very high resolution images, see src/tiling.py
+TILED_INFERENCE = False  # images larger than TILE_SIZE are detected tile by tile instead of downscaled
+TILE_SIZE = 1024  # tile side in pixels, at native resolution
+TILE_OVERLAP = 0.2  # fraction of a tile shared with its neighbours, so objects on a border appear whole in one
+TILE_MERGE = "nms"  # "nms" or "wbf" (weighted box fusion) to merge boxes across tiles
+TILE_MERGE_IOU = 0.5
+TILE_INCLUDE_FULL_IMAGE = True  # also run the downscaled whole image, for objects larger than a tile
+TILE_SKIP_UNIFORM = True  # skip tiles with a gray-level std under TILE_UNIFORM_STD (sky, walls, borders)
+TILE_UNIFORM_STD = 4.0
+TILE_UNCHANGED_THRESHOLD = 2.0  # video: reuse a tile's detections when its mean gray-level change is under this
+MAX_TILES_PER_FORWARD = None  # None runs every tile of a batch in a single forward pass
+
+## Gating cascade: a cheap "any weapon?" stage that skips the full detector on empty frames, see src/gating.py
+GATE_ENABLED = False
+GATE_KIND = "rpn"  # "rpn": the detector's own RPN objectness at reduced resolution; "classifier": a trained MobileNetV3 head
+GATE_RPN_MIN_SIZE = 320  # reduced input size of the RPN gate
+GATE_RPN_MAX_SIZE = 533
+GATE_CLASSIFIER_PATH = "artifacts/models/gate_mobilenet_v3_small.pth"  # trained by `python -m src.gating train`
+GATE_CLASSIFIER_SIZE = 224
+GATE_MAX_DROPPED = 0.02  # budget: at most this fraction of weapon boxes may fall on frames the gate skips
+GATE_THRESHOLD = None  # None uses the threshold tuned on the validation split (GATE_CALIBRATION_PATH)
+GATE_CALIBRATION_PATH = "artifacts/models/gate_calibration.json"  # written by `python -m src.gating calibrate`
@@ -0,0 +1,18 @@
+## Log files: one per day, shared by every process (uvicorn workers, DataLoader workers, torchrun ranks)
+LOGS_DIR = "logs"
+LOG_FORMAT = "text"  # "text", or "json" for one JSON object per line; the LOG_FORMAT env var overrides it
+
+## Levels: LOG_LEVEL for the root logger, and overrides per module prefix (longest match wins)
+LOG_LEVEL = "INFO"  # the LOG_LEVEL env var overrides it
+LOG_MODULE_LEVELS = {
+    "src.data_processing": "INFO",
+    "src.telemetry": "WARNING",
+    "uvicorn.access": "WARNING",
+}
+
+## Background writer
+LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread; further records are dropped and counted, never block
+
+## Hot-path sampling defaults for log_every_n / log_every_seconds
+LOG_SAMPLE_EVERY = 1000  # e.g. one dataset item in every 1000
+LOG_THROTTLE_SECONDS = 10.0  # e.g. at most one rejected-upload warning every 10 s per message
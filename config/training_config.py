@@ -0,0 +1,36 @@
+DATASET_PATH = "artifacts/raw/"
+PACKED_DIR = "artifacts/packed"  # built by `python -m src.dataset_cache`, falls back to decoding if missing
+NUM_CLASSES = 2
+LEARNING_RATE = 0.001
+EPOCHS = 1
+
+## DataLoader pipeline
+BATCH_SIZE = 3
+NUM_WORKERS = 4
+PIN_MEMORY = True  # only takes effect when training on CUDA
+PERSISTENT_WORKERS = True
+PREFETCH_FACTOR = 2
+GROUP_BY_ASPECT_RATIO = True  # bucket batches by aspect ratio and size to cut padding
+
+## Mixed precision, gradient accumulation and checkpoint/resume
+AMP = False  # autocast: bfloat16 on CPU, float16 (with loss scaling) or bfloat16 on CUDA
+AMP_DTYPE = "bfloat16"
+GRAD_ACCUM_STEPS = 1  # effective batch size = BATCH_SIZE * GRAD_ACCUM_STEPS
+COMPILE_MODEL = False  # opt-in torch.compile of the training forward pass
+CHECKPOINT_DIR = "artifacts/checkpoints"
+CHECKPOINT_EVERY = 50  # batches between mid-epoch checkpoints (0 = end of epoch only)
+RESUME = True  # continue from CHECKPOINT_DIR/latest.pt when present
+
+## Distributed data parallel (enabled automatically when launched with torchrun)
+DIST_BACKEND = "gloo"  # CPU nodes; "nccl" for GPU nodes
+THREADS_PER_PROCESS = 0  # torch threads per rank, 0 = split the host's cores between local ranks
+
+## Validation metrics (COCO mAP@[.5:.95], precision/recall), JSON report per epoch
+EVAL_DIR = "artifacts/evaluation"
+EVAL_SCORE_THRESHOLD = 0.7  # operating point for precision/recall, matches inference SCORE_THRESHOLD
+
+## Gate classifier of the inference cascade (`python -m src.gating train`), trained through ModelTraining
+GATE_BACKBONE = "mobilenet_v3_small"
+GATE_EPOCHS = 5
+GATE_LEARNING_RATE = 0.0005
+GATE_BATCH_SIZE = 16
@@ -1,29 +1,62 @@
-import io
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import StreamingResponse, HTMLResponse
+import os
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import multiprocessing
+from typing import List
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, HTMLResponse, Response, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import torch
-from torchvision import transforms
-from PIL import Image, ImageDraw
-from src.model_architecture import FasterRCNNModel
+from PIL import Image
+from src.predictor import Predictor, init_worker, predict_in_worker, worker_ready, build_cascade
+from src.tiling import TiledPredictor, TileCache
+from src.batch_scheduler import BatchScheduler
+from src.inference_executor import InferenceExecutor, ServerBusyError
+from src.upload_batches import iter_uploads, next_chunk
+from src.video_stream import FrameReader, StreamDetector, frame_to_image
+from src.result_cache import create_result_cache
+from src.image_decode import ImageRejectedError, BodySizeLimitMiddleware, read_upload, rescale_detections
+from src.image_decode import decode_image as decode_upload
+from src.samplers import aspect_ratio_bucket
+from src.logger import logging_stats
+from src.telemetry import registry, timed, begin_request, server_timing_header, process_rss_bytes, BatchProfiler
+from src.detection_format import (
+    IMAGE_FORMATS, filter_detections, to_json, pack_detections, to_msgpack, draw_detections, render_image
+)
+from config.inference_config import *
 
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Initialize your custom model architecture
-model_instance = FasterRCNNModel(num_classes=2, device=device)
-model = model_instance.model
-
-# Load the trained weights from artifacts
-model_path = "artifacts/models/fasterrcnn.pth"
-model.load_state_dict(torch.load(model_path, map_location=device))
-model.eval()
-model.to(device)
+# The trained model is loaded and warmed up at startup (see load_model); until then the server is not ready
+model_path = MODEL_PATH
+model_options = dict(backbone=BACKBONE, min_size=MODEL_MIN_SIZE, max_size=MODEL_MAX_SIZE, predownscale=PREDOWNSCALE_INPUTS,
+                     instrument=INSTRUMENT_MODEL_STAGES, shared_weights=SHARED_WEIGHTS)
+# Tiled inference wraps the Predictor when enabled (see src/tiling.py)
+tiling_options = dict(tile_size=TILE_SIZE, overlap=TILE_OVERLAP, merge=TILE_MERGE, iou_threshold=TILE_MERGE_IOU,
+                      include_full_image=TILE_INCLUDE_FULL_IMAGE, skip_uniform=TILE_SKIP_UNIFORM,
+                      uniform_std=TILE_UNIFORM_STD, max_tiles_per_forward=MAX_TILES_PER_FORWARD) \
+    if TILED_INFERENCE else None
+# The optional gating cascade skips the detector on frames without a weapon (see src/gating.py)
+gating_options = dict(kind=GATE_KIND, threshold=GATE_THRESHOLD, calibration_path=GATE_CALIBRATION_PATH,
+                      rpn_min_size=GATE_RPN_MIN_SIZE, rpn_max_size=GATE_RPN_MAX_SIZE,
+                      classifier_path=GATE_CLASSIFIER_PATH, classifier_size=GATE_CLASSIFIER_SIZE) \
+    if GATE_ENABLED else None
+predictor = None
+tiled_predictor = None
+cascade = None
+result_cache = None
+model = None
+transform = None
+readiness = {"ready": False, "load_seconds": None, "warmup_seconds": None, "error": None}
 
-transform = transforms.Compose([
-    transforms.ToTensor(),
-])
+# uvicorn's WEB_CONCURRENCY worker processes share the cores with each other
+server_workers = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
 
 app = FastAPI(title="Guns Object Detection System", description="AI-powered weapon detection system")
 
@@ -36,28 +69,196 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cap request bodies while they stream in; archive and video uploads get their own, larger limit
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + 64 * 1024,  # room for the multipart framing
+    route_limits={"/detect/batch": MAX_ARCHIVE_UPLOAD_BYTES, "/detect/video": MAX_ARCHIVE_UPLOAD_BYTES},
+)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-def predict_and_draw(image: Image.Image):
-    image_tensor = transform(image).unsqueeze(0).to(device)
-    with torch.no_grad():
-        predictions = model(image_tensor)
+def predict_batch(images):
+    """
+    Run the detector on a list of PIL images in a single forward pass.
+    """
+    return (cascade or tiled_predictor or predictor).predict_batch(images)
+
+def predict_and_draw(image: Image.Image, threshold=SCORE_THRESHOLD):
+    detections = predict_batch([image])[0]
+    return draw_detections(image, detections, threshold)
+
+def decode_image(image_data: bytes, reduce: bool = False):
+    """
+    Decode an upload within the pixel limit, returning (image, full-resolution size).
+
+    With `reduce`, large JPEGs are decoded at a reduced scale that still covers the model's input size.
+    """
+    reduce_to = None
+    # Tiling needs the full-resolution pixels
+    if reduce and DRAFT_DECODE and not TILED_INFERENCE:
+        reduce_to = (predictor.min_size, predictor.max_size) if predictor is not None \
+            else (MODEL_MIN_SIZE or 800, MODEL_MAX_SIZE or 1333)
+    return decode_upload(image_data, MAX_IMAGE_PIXELS, reduce_to=reduce_to)
+
+# Process workers warm up in the pool initializer, then meet here so readiness waits for every one of them
+ready_barrier = multiprocessing.get_context("spawn").Barrier(EXECUTOR_WORKERS) if EXECUTOR_KIND == "process" else None
+
+executor = InferenceExecutor(
+    kind=EXECUTOR_KIND,
+    max_workers=EXECUTOR_WORKERS,
+    torch_threads=TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // (EXECUTOR_WORKERS * server_workers)),
+    max_pending=MAX_PENDING_REQUESTS,
+    retry_after=RETRY_AFTER_SECONDS,
+    initializer=init_worker,
+    initargs=(model_path, NUM_CLASSES, INFERENCE_ENGINE, EXPORT_DIR, model_options, tiling_options, gating_options,
+              WARMUP_SIZES, ready_barrier),
+)
+
+# Profiling runs in-process, so it is only available with the thread executor
+profiler = BatchProfiler(PROFILER_TRACE_DIR, PROFILER_SAMPLE_EVERY) \
+    if PROFILER_ENABLED and EXECUTOR_KIND == "thread" else None
+
+scheduler = BatchScheduler(
+    (profiler.wrap(predict_batch) if profiler else predict_batch) if EXECUTOR_KIND == "thread" else predict_in_worker,
+    max_batch_size=MAX_BATCH_SIZE if BATCHING_ENABLED else 1,
+    max_wait_ms=MAX_BATCH_WAIT_MS if BATCHING_ENABLED else 0,
+    max_concurrency=EXECUTOR_WORKERS,
+    group_key=(lambda image: aspect_ratio_bucket(*image.size)) if BATCH_GROUP_BY_ASPECT_RATIO else None,
+)
+
+def model_version(path:str):
+    """
+    Modification time of the model file, or "missing" when it is not there (yet).
+    """
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return "missing"
+
+def build_result_cache():
+    """
+    Result cache for the loaded model, or None when caching is disabled.
 
-    prediction = predictions[0]
-    boxes = prediction['boxes'].cpu().numpy()
-    labels = prediction['labels'].cpu().numpy()
-    scores = prediction['scores'].cpu().numpy()
-    
-    img_rgb = image.convert("RGB")
-    draw = ImageDraw.Draw(img_rgb)
+    Detections are cached per model file, so retrained weights never serve
+    stale results; the namespace is read once the weights have loaded.
+    """
+    if not RESULT_CACHE_ENABLED:
+        return None
+    return create_result_cache(
+        RESULT_CACHE_BACKEND,
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        ttl=RESULT_CACHE_TTL_SECONDS,
+        path=RESULT_CACHE_PATH,
+        namespace=f"{INFERENCE_ENGINE}:{os.path.abspath(model_path)}:{model_version(model_path)}:{MODEL_MIN_SIZE}:{MODEL_MAX_SIZE}:{tiling_options}:{gating_options}",
+        perceptual=RESULT_CACHE_PERCEPTUAL,
+        perceptual_tolerance=RESULT_CACHE_PERCEPTUAL_TOLERANCE,
+    )
 
-    for box,score in zip(boxes, scores):
-        if score >0.7:
-            x_min, y_min, x_max, y_max = box
-            draw.rectangle([x_min, y_min, x_max, y_max], outline="red", width=3)
+async def load_model():
+    """
+    Load the inference model and run warmup passes at typical input sizes, off the event loop.
 
-    return img_rgb
+    With the thread executor the server's own Predictor is loaded; process workers
+    load and warm up theirs in the pool initializer, and one readiness task per
+    worker waits at a barrier, so the server is only ready once all of them are.
+    """
+    global predictor, tiled_predictor, cascade, model, transform, result_cache
+    loop = asyncio.get_running_loop()
+    try:
+        start = time.perf_counter()
+        if EXECUTOR_KIND == "thread":
+            predictor = await run_in_threadpool(
+                Predictor, model_path, num_classes=NUM_CLASSES, device=device, engine=INFERENCE_ENGINE,
+                export_dir=EXPORT_DIR, **model_options,
+            )
+            if tiling_options is not None:
+                tiled_predictor = TiledPredictor(predictor, **tiling_options)
+            if gating_options is not None:
+                cascade = await run_in_threadpool(build_cascade, predictor, tiled_predictor or predictor, gating_options)
+            model, transform = predictor.model, predictor.transform
+            readiness["load_seconds"] = predictor.load_seconds
+            readiness["warmup_seconds"] = await loop.run_in_executor(
+                scheduler.executor, (cascade or tiled_predictor or predictor).warmup, WARMUP_SIZES)
+        else:
+            warmups = await asyncio.gather(*(
+                loop.run_in_executor(scheduler.executor, worker_ready) for _ in range(EXECUTOR_WORKERS)
+            ))
+            readiness["warmup_seconds"] = max(warmups)
+            readiness["load_seconds"] = time.perf_counter() - start - readiness["warmup_seconds"]
+        # The cache stays off until the model can serve
+        result_cache = await run_in_threadpool(build_result_cache)
+        readiness["ready"] = True
+    except Exception as e:
+        # Reported by /health/ready and every rejected request
+        readiness["error"] = f"{type(e).__name__}: {e}"
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.executor = executor.start()
+    await scheduler.start()
+    if LAZY_MODEL_LOADING:
+        # The port is bound right away; /health/ready reports when the model can serve
+        app.state.model_loading = asyncio.create_task(load_model())
+    else:
+        await load_model()
+        if readiness["error"]:
+            raise RuntimeError(f"Model failed to load: {readiness['error']}")
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+    executor.shutdown()
+
+## Prometheus metrics; pipeline stage histograms are recorded by src.telemetry.timed
+http_requests = registry.counter("http_requests_total", "HTTP requests by route, method and status",
+                                 ("route", "method", "status"))
+http_request_seconds = registry.histogram("http_request_seconds", "Time to response headers by route", ("route",))
+registry.gauge("queue_depth", "Images waiting for a batch", lambda: scheduler.queue_depth)
+registry.gauge("in_flight_batches", "Batches currently running", lambda: scheduler.in_flight_batches)
+registry.gauge("pending_requests", "Admitted requests in progress", lambda: executor.pending)
+registry.gauge("rejected_requests", "Requests rejected with 503 since startup", lambda: executor.rejected)
+registry.gauge("model_load_seconds", "Time taken to load the inference model", lambda: readiness["load_seconds"] or 0.0)
+registry.gauge("ready", "1 once the model is loaded and warmed up", lambda: readiness["ready"])
+registry.gauge("process_resident_memory_bytes", "Resident set size of the server process", process_rss_bytes)
+registry.gauge("log_records_dropped", "Log records dropped because the log queue was full",
+               lambda: logging_stats()["log_records_dropped"])
+if RESULT_CACHE_ENABLED:
+    registry.gauge("result_cache_entries", "Entries in the result cache",
+                   lambda: len(result_cache.backend) if result_cache is not None else 0)
+    registry.gauge("result_cache_hit_ratio", "Result cache hit ratio",
+                   lambda: result_cache.stats()["cache_hit_ratio"] if result_cache is not None else 0.0)
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    timings = begin_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        http_requests.inc(getattr(request.scope.get("route"), "path", "unmatched"), request.method, 500)
+        raise
+
+    # Streaming responses are timed up to their headers
+    elapsed = time.perf_counter() - start
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    http_requests.inc(route, request.method, response.status_code)
+    http_request_seconds.observe(elapsed, route)
+    if SERVER_TIMING_HEADER and timings:
+        response.headers["Server-Timing"] = server_timing_header({**timings, "total": elapsed})
+    return response
+
+def server_busy(e: ServerBusyError):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def ensure_ready():
+    """
+    Reject work with 503 until the model is loaded and warmed up.
+    """
+    if not readiness["ready"]:
+        detail = f"Model failed to load: {readiness['error']}" if readiness["error"] else "Model is warming up"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
 
 @app.get("/", response_class=HTMLResponse)
 def read_root():
@@ -65,14 +266,333 @@ def read_root():
         html_content = f.read()
     return HTMLResponse(content=html_content)
 
+@app.get("/stats")
+def stats():
+    cache_stats = result_cache.stats() if result_cache is not None else {}
+    profiler_stats = profiler.stats() if profiler is not None else {}
+    tiling_stats = tiled_predictor.stats() if tiled_predictor is not None else {}
+    gating_stats = cascade.stats() if cascade is not None else {}
+    return {**executor.stats(), **scheduler.stats(), **cache_stats, **profiler_stats, **tiling_stats, **gating_stats,
+            **logging_stats()}
+
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def ready():
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/debug/profile")
+def arm_profiler(batches:int=Query(1, ge=1, le=100)):
+    """
+    Profile the next `batches` inference batches with torch.profiler.
+    """
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler is disabled or unavailable with this executor")
+    profiler.arm(batches)
+    return {"armed_batches": profiler.armed, "trace_dir": PROFILER_TRACE_DIR}
+
+async def detect_image_bytes(image_data: bytes, need_image: bool = True):
+    """
+    Detect guns in an encoded image, serving repeated images from the result cache.
+
+    Returns (image, (width, height), detections); `image` is None when the
+    detections came from the content cache and the caller did not need pixels.
+    Without `need_image` the image may be a reduced decode; boxes are always
+    in full-resolution (width, height) coordinates.
+    """
+    if image_data is None or len(image_data) > MAX_UPLOAD_BYTES:
+        raise ImageRejectedError(f"Image exceeds the {MAX_UPLOAD_BYTES} byte limit")
+
+    key = None
+    cache = result_cache
+    if cache is not None:
+        with timed("cache"):
+            key = cache.content_key(image_data)
+            cached = cache.get(key)
+        if cached is not None:
+            detections, size = cached
+            image = None
+            if need_image:
+                with timed("decode"):
+                    image, _ = await run_in_threadpool(decode_image, image_data)
+            return image, size, detections
+
+    with timed("decode"):
+        image, size = await run_in_threadpool(decode_image, image_data, not need_image)
+    if cache is not None:
+        with timed("cache"):
+            detections = await run_in_threadpool(cache.get_similar, image)
+        if detections is not None:
+            return image, size, rescale_detections(detections, image.size, size)
+
+    # Queue wait plus the batched forward; its inner stages are recorded by the Predictor
+    with timed("inference"):
+        detections = rescale_detections(await scheduler.submit(image), image.size, size)
+    if cache is not None:
+        with timed("cache"):
+            await run_in_threadpool(cache.put, key, image, detections, size)
+    return image, size, detections
+
+async def run_detection(file: UploadFile, need_image: bool = True):
+    """
+    Read an upload and run it through the batched detector.
+    """
+    ensure_ready()
+    try:
+        with executor.admit():
+            with timed("read"):
+                image_data = await read_upload(file, MAX_UPLOAD_BYTES)
+            return await detect_image_bytes(image_data, need_image)
+    except ServerBusyError as e:
+        raise server_busy(e)
+    except ImageRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post("/detect")
+async def detect(
+    file:UploadFile=File(...),
+    threshold:float=Query(SCORE_THRESHOLD, ge=0.0, le=1.0),
+    response_format:str=Query("json", alias="format"),
+):
+    if response_format not in ("json", "binary", "msgpack"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {response_format}")
+
+    _, (width, height), detections = await run_detection(file, need_image=False)
+    detections = filter_detections(detections, threshold)
+
+    with timed("encode"):
+        if response_format == "json":
+            return to_json(detections, width, height)
+
+        headers = {"X-Image-Width": str(width), "X-Image-Height": str(height)}
+        if response_format == "binary":
+            return Response(pack_detections(detections), media_type="application/octet-stream", headers=headers)
+
+        try:
+            content = to_msgpack(detections, width, height)
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        return Response(content, media_type="application/msgpack", headers=headers)
+
 @app.post("/predict/")
-async def predict(file:UploadFile=File(...)):
-    image_data = await file.read()
-    image = Image.open(io.BytesIO(image_data))
+async def predict(
+    file:UploadFile=File(...),
+    threshold:float=Query(SCORE_THRESHOLD, ge=0.0, le=1.0),
+    image_format:str=Query(DEFAULT_IMAGE_FORMAT, alias="format"),
+    quality:int=Query(DEFAULT_IMAGE_QUALITY, ge=1, le=100),
+):
+    image_format = image_format.lower()
+    if image_format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {image_format}")
+
+    image, _, detections = await run_detection(file)
+    with timed("encode"):
+        img_byte_arr, media_type = await run_in_threadpool(render_image, image, detections, threshold, image_format, quality)
+
+    return StreamingResponse(img_byte_arr, media_type=media_type)
+
+async def detect_chunk(entries, threshold: float):
+    """
+    Decode a chunk of (name, bytes) entries concurrently and run them through the batched detector.
+    """
+    results = await asyncio.gather(
+        *(detect_image_bytes(data, need_image=False) for _, data in entries), return_exceptions=True
+    )
+
+    lines = []
+    for (name, _), result in zip(entries, results):
+        if isinstance(result, Exception):
+            lines.append({"name": name, "error": str(result)})
+        else:
+            _, size, detections = result
+            lines.append({"name": name, **to_json(filter_detections(detections, threshold), *size)})
+    return lines
+
+@app.post("/detect/batch")
+async def detect_batch(
+    files:List[UploadFile]=File(...),
+    threshold:float=Query(SCORE_THRESHOLD, ge=0.0, le=1.0),
+    chunk_size:int=Query(UPLOAD_CHUNK_SIZE, ge=1, le=256),
+):
+    """
+    Detect guns in many images, or zip/tar archives of images, in one request.
+
+    Results are streamed back as NDJSON, one line per image, as soon as each
+    chunk finishes. Only the current and the next chunk are held in memory.
+    """
+    ensure_ready()
+    try:
+        executor.acquire()
+    except ServerBusyError as e:
+        raise server_busy(e)
+
+    # Upload files may be closed once the handler returns, so stream from our own copies
+    try:
+        spooled = []
+        for upload in files:
+            copy = tempfile.TemporaryFile()
+            await run_in_threadpool(shutil.copyfileobj, upload.file, copy)
+            spooled.append((copy, upload.filename or "upload"))
+    except Exception:
+        executor.release()
+        raise
+
+    async def stream_results():
+        index = 0
+        errors = 0
+        try:
+            entries = iter_uploads(spooled, max_entry_bytes=MAX_UPLOAD_BYTES)
+            chunk = await run_in_threadpool(next_chunk, entries, chunk_size)
+            while chunk:
+                # Read the next chunk while the current one is being inferred
+                upcoming = asyncio.ensure_future(run_in_threadpool(next_chunk, entries, chunk_size))
+                try:
+                    lines = await detect_chunk(chunk, threshold)
+                except BaseException:
+                    upcoming.cancel()
+                    raise
+                for line in lines:
+                    errors += "error" in line
+                    yield json.dumps({"index": index, **line}) + "\n"
+                    index += 1
+                chunk = await upcoming
+            yield json.dumps({"done": True, "images": index, "errors": errors}) + "\n"
+        finally:
+            executor.release()
+            for copy, _ in spooled:
+                copy.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+async def video_results(source, threshold: float, detect_every: int, drop_frames: bool):
+    """
+    Yield per-frame tracking results for a video source.
+
+    Frames are decoded on a background thread; the detector only runs on the
+    frames picked by `StreamDetector` and the tracker fills in the rest. With
+    tiled inference in-process, tiles unchanged since the last detected frame
+    reuse their detections.
+    """
+    loop = asyncio.get_running_loop()
+    tile_cache = TileCache(TILE_UNCHANGED_THRESHOLD) if tiled_predictor is not None else None
+    reader = await run_in_threadpool(FrameReader, source, VIDEO_FRAME_QUEUE, drop_frames)
+    reader.start()
+    stream = StreamDetector(
+        detect_every=detect_every,
+        min_interval=VIDEO_MIN_DETECT_INTERVAL,
+        scene_threshold=VIDEO_SCENE_CHANGE_THRESHOLD,
+        iou_threshold=TRACKER_IOU_THRESHOLD,
+        max_misses=TRACKER_MAX_MISSES,
+    )
+
+    def next_frame():
+        item = reader.get()
+        if item is None:
+            return None
+        index, timestamp_ms, frame = item
+        if not stream.needs_detection(index, frame):
+            return index, timestamp_ms, frame, None
+        return index, timestamp_ms, frame, frame_to_image(frame)
+
+    try:
+        while True:
+            item = await run_in_threadpool(next_frame)
+            if item is None:
+                break
+            index, timestamp_ms, frame, image = item
+
+            detections = None
+            if image is not None and tile_cache is not None:
+                # A tiled frame is already a batch of its own, so it bypasses the micro-batcher, not the gate
+                detections = await loop.run_in_executor(
+                    scheduler.executor, (cascade or tiled_predictor).predict, image, tile_cache)
+                detections = filter_detections(detections, threshold)
+            elif image is not None:
+                detections = filter_detections(await scheduler.submit(image), threshold)
+            tracks = stream.update(index, frame, detections)
+
+            yield {"frame": index, "timestamp_ms": round(timestamp_ms, 1), "detected": image is not None, "tracks": tracks}
+
+        yield {"done": True, **stream.stats(), "dropped_frames": reader.dropped, "fps": reader.fps}
+    finally:
+        reader.stop()
+
+@app.post("/detect/video")
+async def detect_video(
+    file:UploadFile=File(...),
+    threshold:float=Query(SCORE_THRESHOLD, ge=0.0, le=1.0),
+    detect_every:int=Query(VIDEO_DETECT_EVERY, ge=1, le=300),
+):
+    """
+    Track guns through an uploaded video file, streaming one NDJSON line per frame.
+    """
+    ensure_ready()
+    try:
+        executor.acquire()
+    except ServerBusyError as e:
+        raise server_busy(e)
+
+    try:
+        # VideoCapture needs a real path, so the upload is copied to a named temporary file
+        suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+        video_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        with video_file:
+            await run_in_threadpool(shutil.copyfileobj, file.file, video_file)
+    except Exception:
+        executor.release()
+        raise
+
+    async def stream_results():
+        try:
+            async for result in video_results(video_file.name, threshold, detect_every, drop_frames=False):
+                yield json.dumps(result) + "\n"
+        finally:
+            executor.release()
+            os.remove(video_file.name)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/video")
+async def video_websocket(
+    websocket: WebSocket,
+    source: str,
+    threshold: float = SCORE_THRESHOLD,
+    detect_every: int = VIDEO_DETECT_EVERY,
+):
+    """
+    Stream tracking results for one of the configured live VIDEO_SOURCES.
+    """
+    await websocket.accept()
+    if source not in VIDEO_SOURCES:
+        await websocket.close(code=1008, reason=f"Unknown video source: {source}")
+        return
+    if not readiness["ready"]:
+        await websocket.close(code=1013, reason="Model is warming up")
+        return
+
+    try:
+        executor.acquire()
+    except ServerBusyError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
 
-    output_image = predict_and_draw(image)
-    img_byte_arr = io.BytesIO()
-    output_image.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
+    try:
+        # Live sources drop stale frames rather than fall behind real time
+        async for result in video_results(VIDEO_SOURCES[source], threshold, max(1, detect_every), drop_frames=True):
+            await websocket.send_json(result)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        executor.release()
 
-    return StreamingResponse(img_byte_arr, media_type="image/png")
\ No newline at end of file
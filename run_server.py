@@ -1,27 +1,52 @@
 #!/usr/bin/env python3
 """
 Run the Guns Object Detection Web Application
+
+    python run_server.py                 # development: auto-reload, single worker
+    python run_server.py --production    # no reload, SERVER_WORKERS processes
 """
 
+import argparse
 import uvicorn
 import sys
 import os
+from config.inference_config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS
 
 def main():
     """Run the FastAPI application with uvicorn"""
+    parser = argparse.ArgumentParser(description="Run the Guns Object Detection server")
+    parser.add_argument("--production", action="store_true", help="Launch without reload and with multiple workers")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes in production")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+
     try:
         print("🚀 Starting Guns Object Detection Web Application...")
-        print("📡 Server will be available at: http://localhost:8000")
+        print(f"📡 Server will be available at: http://localhost:{args.port}")
         print("🔧 Press Ctrl+C to stop the server\n")
-        
-        uvicorn.run(
-            "main:app",
-            host="0.0.0.0",
-            port=8000,
-            reload=True,
-            reload_dirs=[".", "src", "static"],
-            log_level="info"
-        )
+
+        if args.production:
+            # Workers read WEB_CONCURRENCY to split the CPU cores between themselves
+            os.environ["WEB_CONCURRENCY"] = str(args.workers)
+            uvicorn.run(
+                "main:app",
+                host=args.host,
+                port=args.port,
+                workers=args.workers,
+                reload=False,
+                access_log=False,
+                log_level="warning"
+            )
+        else:
+            uvicorn.run(
+                "main:app",
+                host=args.host,
+                port=args.port,
+                reload=True,
+                reload_dirs=[".", "src", "static"],
+                log_level="info"
+            )
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
@@ -29,4 +54,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,181 @@
+import sys
+import time
+import asyncio
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+class BatchScheduler:
+    """
+    Collects concurrent inference requests into micro-batches.
+
+    Requests are queued by `submit` and a single background task groups them
+    into batches of at most `max_batch_size` items, waiting no longer than
+    `max_wait_ms` after the first item of a batch arrives. Each batch is passed
+    to `batch_fn` off the event loop and the results are fanned back to the
+    awaiting callers in order. Up to `max_concurrency` batches run at once,
+    which should match the number of workers in `executor`. With `group_key`,
+    a collected batch is split so only items with the same key (e.g. aspect
+    ratio bucket) share a forward pass and padding is kept small.
+    """
+
+    def __init__(self, batch_fn, max_batch_size:int=4, max_wait_ms:float=10, executor=None, max_concurrency:int=1,
+                 group_key=None):
+        self.batch_fn = batch_fn
+        self.group_key = group_key
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.executor = executor
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue = None
+        self.slots = None
+        self.worker_task = None
+        self.batch_tasks = set()
+        self.in_flight_batches = 0
+        self.in_flight_items = 0
+        self.batches_run = 0
+        self.items_run = 0
+
+    @property
+    def running(self):
+        return self.worker_task is not None and not self.worker_task.done()
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight_batches": self.in_flight_batches,
+            "in_flight_items": self.in_flight_items,
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+        }
+
+    async def start(self):
+        """
+        Start the background batching task on the running event loop.
+        """
+        if self.running:
+            return
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.worker_task = asyncio.create_task(self._run())
+        logger.info(f"Batch scheduler started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.1f})")
+
+    async def stop(self):
+        """
+        Stop the background task and fail any requests still waiting in the queue.
+        """
+        if not self.running:
+            return
+        tasks = [self.worker_task, *self.batch_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.worker_task = None
+
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batch scheduler stopped"))
+        logger.info("Batch scheduler stopped")
+
+    async def submit(self, item):
+        """
+        Queue a single item and wait for its result from the next batch.
+        """
+        if not self.running:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Whatever is already queued rides along without extra waiting
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            # Waiting for a free slot first lets requests pile up into bigger batches
+            await self.slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except asyncio.CancelledError:
+                self.slots.release()
+                raise
+
+            # Requests whose callers went away are dropped before inference
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                self.slots.release()
+                continue
+
+            groups = [batch]
+            if self.group_key is not None:
+                keyed = {}
+                for entry in batch:
+                    keyed.setdefault(self.group_key(entry[0]), []).append(entry)
+                groups = list(keyed.values())
+
+            for i, group in enumerate(groups):
+                if i > 0:
+                    # The first group runs on the slot acquired above, the others wait for theirs
+                    try:
+                        await self.slots.acquire()
+                    except asyncio.CancelledError:
+                        for _, future in (entry for rest in groups[i:] for entry in rest):
+                            if not future.done():
+                                future.cancel()
+                        raise
+                task = asyncio.create_task(self._run_batch(group))
+                self.batch_tasks.add(task)
+                task.add_done_callback(self.batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.in_flight_batches += 1
+        self.in_flight_items += len(items)
+        try:
+            results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+            if len(results) != len(items):
+                raise ValueError(f"Batch function returned {len(results)} results for {len(items)} items")
+        except asyncio.CancelledError:
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error running batch of {len(items)} items: {e}")
+            error = CustomException(f"Batch inference failed: {e}", sys)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        finally:
+            self.in_flight_batches -= 1
+            self.in_flight_items -= len(items)
+            self.slots.release()
+
+        self.batches_run += 1
+        self.items_run += len(items)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
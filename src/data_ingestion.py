@@ -1,8 +1,13 @@
 import os
 import sys
-import kagglehub
+import json
 import shutil
+import hashlib
 import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from src.dataset_cache import read_label_file, update_packed_dataset
 from src.logger import get_logger
 from src.custom_exception import CustomException
 from config.data_ingestion_config import *
@@ -10,86 +15,374 @@ from config.data_ingestion_config import *
 
 logger = get_logger(__name__)
 
+DATA_FOLDERS = ("Images", "Labels")
+
+
+def file_digest(path:str, chunk_size:int=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def relative_data_path(path:str):
+    """
+    `Images/<name>` or `Labels/<name>` for a file directly inside an Images or Labels folder, else None.
+    """
+    parts = path.replace("\\", "/").split("/")
+    if len(parts) < 2 or parts[-2] not in DATA_FOLDERS or not parts[-1] or parts[-1].startswith("."):
+        return None
+    return f"{parts[-2]}/{parts[-1]}"
+
+
+def stem_of(relative_path:str):
+    return relative_path.split("/", 1)[1].rsplit(".", 1)[0]
+
+
+def validate_pair(image_path:str, label_path:str):
+    """
+    Check an image/label pair: both exist, the image header is readable and the label parses
+    into boxes of positive size that overlap the image. Returns an error message, or None.
+    """
+    if image_path is None:
+        return "label has no image"
+    if label_path is None:
+        return "image has no label"
+    try:
+        with Image.open(image_path) as image:
+            if image.format not in IMAGE_FORMATS:
+                return f"unsupported image format {image.format}"
+            width, height = image.size
+    except Exception as e:
+        return f"unreadable image header: {e}"
+    if width <= 0 or height <= 0:
+        return "empty image"
+
+    try:
+        boxes = read_label_file(label_path)
+    except Exception as e:
+        return f"unreadable label file: {e}"
+    for box in boxes:
+        if len(box) != 4:
+            return f"malformed box {box}"
+        x_min, y_min, x_max, y_max = box
+        if x_min >= x_max or y_min >= y_max:
+            return f"box {box} has no area"
+        if x_max <= 0 or y_max <= 0 or x_min >= width or y_min >= height:
+            return f"box {box} lies outside the {width}x{height} image"
+    return None
+
+
 class DataIngestion():
+    """
+    Incremental, parallel ingestion of the gun dataset into `<target_dir>/raw`.
+
+    The source is a local zip or folder (`local_archive`), or the Kaggle
+    dataset when none is given. Every file under an Images/ or Labels/ folder
+    is fingerprinted: zip members by the CRC32 and size stored in the zip
+    directory, which costs no decompression, and folder files by a BLAKE2
+    hash that is only recomputed when their size or mtime changed. A manifest
+    in the raw directory records the fingerprints, so a re-run extracts,
+    copies and validates only new or changed files, deletes removed ones, and
+    scales with the delta rather than the dataset.
 
-    def __init__(self, dataset_name:str, target_dir:str):
+    Extraction and validation run on `workers` threads. Each affected
+    image/label pair is checked (pairing, image header, label boxes) and
+    invalid files are moved to the quarantine folder, so the raw directory
+    always holds only valid pairs for `GunDataset`. Differing files that
+    share an Images/ or Labels/ name are not ingested; copies are kept
+    under the quarantine folder. With `build_packed`, the packed store used
+    by training is updated in place for the delta.
+    """
+
+    def __init__(self, dataset_name:str, target_dir:str, local_archive:str=None, workers:int=INGESTION_WORKERS,
+                 build_packed:bool=BUILD_PACKED, packed_dir:str=PACKED_DIR):
         self.dataset_name = dataset_name
         self.target_dir = target_dir
+        self.local_archive = local_archive
+        self.workers = max(1, int(workers))
+        self.build_packed = build_packed
+        self.packed_dir = packed_dir
+        self.quarantine_dir = os.path.join(target_dir, QUARANTINE_DIR)
+        self._zip_handles = threading.local()
+        self._open_archives = []
+        self._archives_lock = threading.Lock()
 
     def create_raw_dir(self):
         """
         Create the raw directory if it does not exist.
         """
         raw_dir = os.path.join(self.target_dir, 'raw')
-        
+
         if not os.path.exists(raw_dir):
             try:
                 os.makedirs(raw_dir)
                 logger.info(f"Created raw directory at {raw_dir}")
-        
+
             except Exception as e:
                 logger.error(f"Error creating raw directory...")
-                raise CustomException("Failed to create raw directory", str(e))
-        
+                raise CustomException(f"Failed to create raw directory: {e}", sys)
+
         return raw_dir
-            
-    def extract_images_and_labels(self, path:str, raw_dir:str):
+
+    def load_manifest(self, raw_dir:str):
+        path = os.path.join(raw_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {"source": None, "files": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_manifest(self, raw_dir:str, manifest):
+        path = os.path.join(raw_dir, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def list_source(self, path:str, previous):
         """
-        Extract images and labels from the dataset.
+        (zip path or None, {relative path: entry}, conflicts) for every data file of a zip or folder source.
+        An entry holds the file's `fingerprint`, its `origin` inside the source, and its zip `member`
+        or its `source` path and `stat` (size, mtime).
+
+        Files are keyed by `Images/<name>` or `Labels/<name>`, so two subfolders holding the same
+        name would overwrite each other. Identical copies are kept once; differing ones are left
+        out and returned in `conflicts` rather than silently picking one.
         """
-        try:
-            if path.endswith('.zip'):
-                logger.info(f"Extracting zipfile")
-                with zipfile.ZipFile(path, 'r') as zip_ref:
-                    zip_ref.extractall(path)
-            
-            images_folder = os.path.join(path, 'Images')
-            labels_folder = os.path.join(path, 'Labels')
-
-            if os.path.exists(images_folder):
-                shutil.move(images_folder, os.path.join(raw_dir, 'Images'))
-                logger.info(f"Moved images to {os.path.join(raw_dir, 'Images')}")
+        candidates = {}
+        if os.path.isfile(path) and zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    relative = relative_data_path(info.filename)
+                    if not info.is_dir() and relative is not None:
+                        candidates.setdefault(relative, []).append({
+                            "fingerprint": f"crc32:{info.CRC:08x}:{info.file_size}",
+                            "member": info.filename, "origin": info.filename,
+                        })
+            return (path, *self.resolve_collisions(candidates))
+
+        for directory, _, names in os.walk(path):
+            for name in sorted(names):
+                source = os.path.join(directory, name)
+                relative = relative_data_path(source)
+                if relative is not None:
+                    candidates.setdefault(relative, []).append({"source": source, "origin": os.path.relpath(source, path)})
+        if not candidates:
+            # e.g. a Kaggle download holding the zip rather than the extracted folders
+            archives = sorted(name for name in os.listdir(path) if name.endswith(".zip"))
+            if archives:
+                return self.list_source(os.path.join(path, archives[0]), previous)
+            return None, {}, []
+
+        def fingerprint(item):
+            relative, entry = item
+            stat = os.stat(entry["source"])
+            entry["stat"] = [stat.st_size, stat.st_mtime_ns]
+            known = previous.get(relative)
+            if known is not None and known.get("stat") == entry["stat"] and known.get("origin") == entry["origin"]:
+                entry["fingerprint"] = known["fingerprint"]
             else:
-                logger.info(f"Images folder not found at {images_folder}")
+                entry["fingerprint"] = f"blake2b:{file_digest(entry['source'])}"
 
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(fingerprint, [(relative, entry) for relative, entries in candidates.items()
+                                        for entry in entries]))
+        return (None, *self.resolve_collisions(candidates))
 
-            if os.path.exists(labels_folder):
-                shutil.move(labels_folder, os.path.join(raw_dir, 'Labels'))
-                logger.info(f"Moved labels to {os.path.join(raw_dir, 'Labels')}")
+    @staticmethod
+    def resolve_collisions(candidates):
+        files, conflicts = {}, []
+        for relative, entries in candidates.items():
+            if len({entry["fingerprint"] for entry in entries}) == 1:
+                files[relative] = entries[0]
             else:
-                logger.info(f"labels folder not found at {labels_folder}")
+                conflicts.extend(entries)
+                logger.warning(f"{len(entries)} different files map to {relative}, none is ingested: "
+                               f"{', '.join(entry['origin'] for entry in entries)}")
+        return files, conflicts
+
+    def _zip(self, path:str):
+        # ZipFile handles are not shared between threads
+        handles = getattr(self._zip_handles, "handles", None)
+        if handles is None:
+            handles = self._zip_handles.handles = {}
+        if path not in handles:
+            handles[path] = zipfile.ZipFile(path)
+            with self._archives_lock:
+                self._open_archives.append(handles[path])
+        return handles[path]
+
+    def close_archives(self):
+        """
+        Close the zip handles opened by every extraction thread.
+        """
+        with self._archives_lock:
+            archives, self._open_archives = self._open_archives, []
+        for archive in archives:
+            archive.close()
+        self._zip_handles = threading.local()
+
+    def copy_file(self, archive:str, entry, destination:str):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_path = destination + ".part"
+        if "member" in entry:
+            with self._zip(archive).open(entry["member"]) as src, open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        else:
+            shutil.copyfile(entry["source"], tmp_path)
+        os.replace(tmp_path, destination)
+
+    def locate(self, raw_dir:str, relative:str):
+        for root in (raw_dir, self.quarantine_dir):
+            path = os.path.join(root, relative)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def place(self, raw_dir:str, relative:str, valid:bool):
+        """
+        Move a file into the raw directory if it belongs to a valid pair, else into quarantine.
+        """
+        current = self.locate(raw_dir, relative)
+        target = os.path.join(raw_dir if valid else self.quarantine_dir, relative)
+        if current is not None and current != target:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(current, target)
+
+    def remove(self, raw_dir:str, relative:str):
+        for root in (raw_dir, self.quarantine_dir):
+            path = os.path.join(root, relative)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def extract_images_and_labels(self, path:str, raw_dir:str):
+        """
+        Bring the raw directory up to date with the source at `path`, processing only the delta.
+
+        Returns a summary with the added, updated, removed, unchanged and quarantined
+        file counts and the names of the images whose pair changed.
+        """
+        try:
+            manifest = self.load_manifest(raw_dir)
+            previous = manifest["files"]
+            archive, files, conflicts = self.list_source(path, previous)
+            if not files:
+                raise FileNotFoundError(f"No Images/ or Labels/ files found in {path}")
+
+            delta = [relative for relative, entry in files.items()
+                     if previous.get(relative, {}).get("fingerprint") != entry["fingerprint"]
+                     or self.locate(raw_dir, relative) is None]
+            removed = [relative for relative in previous if relative not in files]
+            logger.info(f"Ingesting from {path}: {len(files)} files, {len(delta)} new or changed, {len(removed)} removed")
+
+            def fetch(relative):
+                # A changed file replaces any earlier copy, including one sitting in quarantine
+                self.remove(raw_dir, relative)
+                self.copy_file(archive, files[relative], os.path.join(raw_dir, relative))
+
+            def set_aside(entry):
+                # Every version of a conflicting name is kept under its source path for inspection
+                parts = [part for part in entry["origin"].replace("\\", "/").split("/") if part not in ("", ".", "..")]
+                self.copy_file(archive, entry, os.path.join(self.quarantine_dir, CONFLICTS_DIR, *parts))
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                try:
+                    list(pool.map(fetch, delta))
+                    list(pool.map(set_aside, conflicts))
+                finally:
+                    self.close_archives()
+                for relative in removed:
+                    self.remove(raw_dir, relative)
+
+                # Every pair with a new, changed or removed member is validated again
+                images, labels = {}, {}
+                for relative in files:
+                    (images if relative.startswith("Images/") else labels).setdefault(stem_of(relative), []).append(relative)
+                affected = {stem_of(relative) for relative in delta + removed}
+
+                def check(stem):
+                    label = labels.get(stem, [None])[0]
+                    label_path = self.locate(raw_dir, label) if label else None
+                    image_paths = [self.locate(raw_dir, image) for image in images.get(stem, [])] or [None]
+                    errors = [validate_pair(image_path, label_path) for image_path in image_paths]
+                    error = next((e for e in errors if e is not None), None)
+                    for relative in images.get(stem, []) + labels.get(stem, []):
+                        self.place(raw_dir, relative, error is None)
+                    return stem, error
+
+                results = dict(pool.map(check, affected))
+
+            quarantined = 0
+            for relative, entry in files.items():
+                stem = stem_of(relative)
+                if stem in results:
+                    entry["status"] = "ok" if results[stem] is None else "quarantined"
+                    entry["error"] = results[stem]
+                else:
+                    entry["status"] = previous[relative].get("status", "ok")
+                    entry["error"] = previous[relative].get("error")
+                entry.pop("source", None)
+                entry.pop("member", None)
+                quarantined += entry["status"] == "quarantined"
+
+            for stem, error in results.items():
+                if error is not None:
+                    logger.warning(f"Quarantined pair {stem}: {error}")
+
+            self.save_manifest(raw_dir, {"source": os.path.abspath(path), "files": files})
+            summary = {
+                "added": sum(relative not in previous for relative in delta),
+                "updated": sum(relative in previous for relative in delta),
+                "removed": len(removed),
+                "unchanged": len(files) - len(delta),
+                "quarantined": quarantined,
+                "conflicts": len({relative_data_path(entry["origin"]) for entry in conflicts}),
+                "changed_images": sorted(relative.split("/", 1)[1] for stem in results if results[stem] is None
+                                         for relative in images.get(stem, [])),
+            }
+            logger.info(f"Ingestion summary: added={summary['added']} updated={summary['updated']} "
+                        f"removed={summary['removed']} unchanged={summary['unchanged']} quarantined={quarantined} "
+                        f"conflicts={summary['conflicts']}")
+            return summary
 
         except Exception as e:
             logger.error(f"Error extracting images and labels: {str(e)}")
-            raise CustomException("Failed to extract images and labels", str(e))
-        
-    def download_dataset(self, raw_dir:str):
+            raise CustomException(f"Failed to extract images and labels: {e}", sys)
+
+    def download_dataset(self):
         """
-        Download the dataset from Kaggle.
+        Download the dataset from Kaggle, returning the local path of the download.
         """
         try:
+            import kagglehub  # only needed when no local archive is configured
+
             path = kagglehub.dataset_download(self.dataset_name)
             logger.info(f"Downloaded dataset from {path}")
-
-            self.extract_images_and_labels(path, raw_dir)
+            return path
 
         except Exception as e:
             logger.error(f"Error downloading dataset: {str(e)}")
-            raise CustomException("Failed to download dataset", str(e))
-        
+            raise CustomException(f"Failed to download dataset: {e}", sys)
+
     def run(self):
         """
         Run the data ingestion process.
         """
         try:
             raw_dir = self.create_raw_dir()
-            self.download_dataset(raw_dir)
+            source = self.local_archive or self.download_dataset()
+            summary = self.extract_images_and_labels(source, raw_dir)
+
+            if self.build_packed:
+                update_packed_dataset(raw_dir, self.packed_dir, changed=summary["changed_images"], workers=self.workers)
+
             logger.info("Data ingestion completed successfully.")
-        
+            return summary
+
         except Exception as e:
             logger.error(f"Error in data ingestion: {str(e)}")
-            raise CustomException("Data ingestion failed", str(e))
-        
+            raise CustomException(f"Data ingestion failed: {e}", sys)
+
 if __name__ == "__main__":
-    data_ingestion = DataIngestion(dataset_name=DATASET_NAME, target_dir=TARGET_DIR)
-    data_ingestion.run()
\ No newline at end of file
+    data_ingestion = DataIngestion(dataset_name=DATASET_NAME, target_dir=TARGET_DIR, local_archive=LOCAL_ARCHIVE)
+    data_ingestion.run()
@@ -1,41 +1,77 @@
 import os
+import logging
 import numpy as np
 import cv2
 import torch
-from torch.utils.data import Dataset
-from src.logger import get_logger
+from PIL import Image
+from torch.utils.data import Dataset, random_split
+from src.dataset_cache import PackedImageStore, read_label_file
+from src.logger import get_logger, log_every_n
+from config.logging_config import LOG_SAMPLE_EVERY
 from src.custom_exception import CustomException
 
 logger = get_logger(__name__)
 
 class GunDataset(Dataset):
+    """
+    Gun images and their boxes, returned as CPU tensors.
 
-    def __init__(self,root:str, device:str="cpu"):
+    The dataset is device-agnostic so it can be loaded by parallel DataLoader
+    workers; the training loop moves batches to the device. When `packed_dir`
+    points at a store built by `src.dataset_cache`, images are served as
+    zero-copy uint8 CHW views of the memory-mapped shards and boxes come from
+    the packed index; `to_float_images` converts them at batch time.
+    Otherwise every item is decoded from the JPEG and label files as float32.
+    """
+
+    def __init__(self,root:str, packed_dir:str=None):
         self.image_path = os.path.join(root,"Images")
         self.labels_path = os.path.join(root,"Labels")
-        self.device = device
         self.img_name = sorted(os.listdir(self.image_path))
         self.label_name = sorted(os.listdir(self.labels_path))
+        self.packed = None
+        self._sizes = None
+
+        if packed_dir is not None:
+            if os.path.exists(os.path.join(packed_dir, "manifest.json")):
+                store = PackedImageStore(packed_dir)
+                if store.is_current(self.image_path, self.labels_path):
+                    self.packed = store
+                    logger.info(f"Reading packed dataset from {packed_dir}")
+                else:
+                    logger.warning(f"Packed dataset at {packed_dir} is stale, decoding images instead")
+            else:
+                logger.warning(f"No packed dataset at {packed_dir}, decoding images instead")
 
         logger.info("Data Processing Started")
 
+    def _load_packed(self, idx):
+        img_res = torch.from_numpy(self.packed.image(idx)).permute(2,0,1)
+        return img_res, self.packed.target_boxes(idx).tolist()
+
     def __getitem__(self,idx):
         try:
-            logger.info(f"Loading Data for index: {idx} from {self.image_path}")
-            
-            # Loading the images
-            image_path = os.path.join(self.image_path, str(self.img_name[idx]))
-            image = cv2.imread(image_path)
-            img_rgb = cv2.cvtColor(image,cv2.COLOR_BGR2RGB).astype(np.float32)
-            img_res = img_rgb/255
-            img_res = torch.as_tensor(img_res).permute(2,0,1)
-
-            # Loading the labels
-            label_name = self.img_name[idx].rsplit('.',1)[0] + ".txt"
-            label_path = os.path.join(self.labels_path, str(label_name))
-            
-            if not os.path.exists(label_path):
-                raise FileNotFoundError(f"Label file {label_path} does not exist.")
+            # Called for every item of every epoch, so only a sample is logged
+            log_every_n(logger, logging.INFO, LOG_SAMPLE_EVERY, "Loading Data for index: %d from %s", idx, self.image_path)
+
+            if self.packed is not None:
+                img_res, box = self._load_packed(idx)
+            else:
+                # Loading the images
+                image_path = os.path.join(self.image_path, str(self.img_name[idx]))
+                image = cv2.imread(image_path)
+                img_rgb = cv2.cvtColor(image,cv2.COLOR_BGR2RGB).astype(np.float32)
+                img_res = img_rgb/255
+                img_res = torch.as_tensor(img_res).permute(2,0,1)
+
+                # Loading the labels
+                label_name = self.img_name[idx].rsplit('.',1)[0] + ".txt"
+                label_path = os.path.join(self.labels_path, str(label_name))
+
+                if not os.path.exists(label_path):
+                    raise FileNotFoundError(f"Label file {label_path} does not exist.")
+
+                box = read_label_file(label_path)
 
             target = {
                 "boxes": torch.tensor([]),
@@ -44,10 +80,6 @@ class GunDataset(Dataset):
                 "labels": torch.tensor([], dtype=torch.int64)
             }
 
-            with open(label_path,"r") as label_file:
-                l_count = int(label_file.readline())
-                box = [list(map(int, label_file.readline().split())) for _ in range(l_count)]
-            
             if box:
                 area = [(b[2] - b[0]) * (b[3] - b[1]) for b in box]
                 labels = [1]*len(box)
@@ -56,26 +88,55 @@ class GunDataset(Dataset):
                 target["area"] = torch.tensor(area, dtype=torch.float32)
                 target["labels"] = torch.tensor(labels, dtype=torch.int64)
 
-            img_res = img_res.to(self.device)
-            
-            for key in target:
-                target[key] = target[key].to(self.device)
-            
             return img_res,target
         
         except Exception as e:
-            logger.error(f"Error processing image at index {idx}: {e}")
+            logger.error("Error processing image at index %d: %s", idx, e)
             raise CustomException(f"Error processing image at index {idx}: {e}")
 
     def __len__(self):
         return len(self.img_name)
+
+    def image_sizes(self):
+        """
+        (width, height) of every image without decoding any pixels: read from
+        the packed index when available, otherwise from the image headers.
+        """
+        if self._sizes is None:
+            if self.packed is not None:
+                self._sizes = [self.packed.image_size(i) for i in range(len(self.packed))]
+            else:
+                self._sizes = []
+                for name in self.img_name:
+                    with Image.open(os.path.join(self.image_path, name)) as image:
+                        self._sizes.append(image.size)
+        return self._sizes
     
+def to_float_images(images):
+    """
+    Convert uint8 images from the packed store to the float [0, 1] tensors the model expects.
+    """
+    return [img.float().div_(255) if img.dtype == torch.uint8 else img for img in images]
+
+def collate_batch(batch):
+    """
+    Collate detection samples into (images, targets) tuples; images keep their own sizes.
+    """
+    return tuple(zip(*batch))
+
+def train_val_split(dataset, val_fraction:float=0.2, seed:int=42):
+    """
+    Reproducible train/validation split, so evaluation and benchmarks score on
+    the same held-out images the model never trained on.
+    """
+    train_size = int((1 - val_fraction) * len(dataset))
+    val_size = len(dataset) - train_size
+    return random_split(dataset, [train_size, val_size], generator=torch.Generator().manual_seed(seed))
+
 if __name__ == "__main__":
     root_path = "artifacts/raw"
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device}")
 
-    dataset = GunDataset(root=root_path, device=device)
+    dataset = GunDataset(root=root_path)
     image, target = dataset[0]
     print(f"Image shape: {image.shape}")
     print(f"Target: {target}")
@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+SHARD_BYTES = 1 << 30  # images are never split across shards
+INDEX_DTYPE = np.dtype([
+    ("shard", np.int32),
+    ("offset", np.int64),
+    ("height", np.int32),
+    ("width", np.int32),
+    ("box_start", np.int64),
+    ("box_count", np.int64),
+])
+
+
+def read_label_file(label_path:str):
+    """
+    Parse a label file: a box count on the first line, then one `x_min y_min x_max y_max` line per box.
+    """
+    with open(label_path, "r") as label_file:
+        l_count = int(label_file.readline())
+        return [list(map(int, label_file.readline().split())) for _ in range(l_count)]
+
+
+def label_path_for(labels_dir:str, name:str):
+    return os.path.join(labels_dir, name.rsplit('.', 1)[0] + ".txt")
+
+
+def source_signature(image_dir:str, labels_dir:str, names):
+    """
+    Cheap fingerprint of the source images and their label files (name, size, mtime) used to detect a stale store.
+
+    Boxes are packed into the store too, so an edited label makes it stale just like an edited image.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name in names:
+        stat = os.stat(os.path.join(image_dir, name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        try:
+            stat = os.stat(label_path_for(labels_dir, name))
+            digest.update(f"label:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except FileNotFoundError:
+            digest.update(b"label:missing;")
+    return digest.hexdigest()
+
+
+class ShardWriter:
+    """
+    Appends decoded images to `images_XXX.bin` shards, starting a new shard past `shard_bytes`.
+    """
+
+    def __init__(self, out_dir:str, first_shard:int=0, shard_bytes:int=SHARD_BYTES):
+        self.out_dir = out_dir
+        self.shard_bytes = shard_bytes
+        self.shard = first_shard
+        self.shard_size = 0
+        self.file = None
+
+    def write(self, image):
+        """
+        Write an HxWx3 uint8 image, returning its (shard, offset).
+        """
+        if self.file is None or (self.shard_size and self.shard_size + image.nbytes > self.shard_bytes):
+            if self.file is not None:
+                self.file.close()
+                self.shard, self.shard_size = self.shard + 1, 0
+            self.file = open(os.path.join(self.out_dir, f"images_{self.shard:03d}.bin"), "wb")
+        position = (self.shard, self.shard_size)
+        self.file.write(image.tobytes())
+        self.shard_size += image.nbytes
+        return position
+
+    @property
+    def shards(self):
+        """
+        Number of shard files in use, counting from shard 0.
+        """
+        return self.shard + 1 if self.file is not None else self.shard
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def decode_rgb(path:str):
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not decode image {path}")
+    return np.ascontiguousarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def write_store(out_dir:str, image_dir:str, labels_dir:str, names, index, boxes, shards:int):
+    np.save(os.path.join(out_dir, "index.npy"), index)
+    np.save(os.path.join(out_dir, "boxes.npy"), np.asarray(boxes, dtype=np.float32).reshape(-1, 4))
+    # The manifest is written last and atomically, so readers never see a half-updated store
+    tmp_path = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "names": names,
+            "shards": shards,
+            "signature": source_signature(image_dir, labels_dir, names),
+        }, f)
+    os.replace(tmp_path, os.path.join(out_dir, "manifest.json"))
+
+
+def build_packed_dataset(root:str, out_dir:str, shard_bytes:int=SHARD_BYTES):
+    """
+    Decode every image of a GunDataset root once into packed uint8 RGB shards.
+
+    Writes `images_XXX.bin` shards, an `index.npy` offsets table (INDEX_DTYPE),
+    `boxes.npy` with every box packed back to back, and a `manifest.json`
+    recording image names and the source signature.
+    """
+    try:
+        image_dir = os.path.join(root, "Images")
+        labels_dir = os.path.join(root, "Labels")
+        names = sorted(os.listdir(image_dir))
+        os.makedirs(out_dir, exist_ok=True)
+
+        index = np.zeros(len(names), dtype=INDEX_DTYPE)
+        all_boxes = []
+        box_start = 0
+        writer = ShardWriter(out_dir, shard_bytes=shard_bytes)
+
+        try:
+            for i, name in enumerate(names):
+                image = decode_rgb(os.path.join(image_dir, name))
+                shard, offset = writer.write(image)
+
+                label_path = label_path_for(labels_dir, name)
+                boxes = read_label_file(label_path)
+                all_boxes.extend(boxes)
+
+                index[i] = (shard, offset, image.shape[0], image.shape[1], box_start, len(boxes))
+                box_start += len(boxes)
+        finally:
+            writer.close()
+
+        write_store(out_dir, image_dir, labels_dir, names, index, all_boxes, writer.shards)
+        logger.info(f"Packed {len(names)} images and {box_start} boxes into {writer.shards} shard(s) at {out_dir}")
+        return out_dir
+
+    except Exception as e:
+        logger.error(f"Error building packed dataset: {e}")
+        raise CustomException(f"Failed to build packed dataset: {e}", sys)
+
+
+def update_packed_dataset(root:str, out_dir:str, changed=(), workers:int=8, shard_bytes:int=SHARD_BYTES):
+    """
+    Bring a packed store up to date with `root`, touching only the delta.
+
+    Images already in the store and not named in `changed` keep their shard
+    bytes and boxes; new and changed images are decoded in parallel and
+    appended to new shards after the existing ones. Space of removed or
+    replaced images is only reclaimed by a full `build_packed_dataset`, which
+    is also used when there is no store yet.
+    """
+    if not os.path.exists(os.path.join(out_dir, "manifest.json")):
+        return build_packed_dataset(root, out_dir, shard_bytes)
+
+    try:
+        image_dir = os.path.join(root, "Images")
+        labels_dir = os.path.join(root, "Labels")
+        names = sorted(os.listdir(image_dir))
+        old = PackedImageStore(out_dir)
+        old_positions = {name: i for i, name in enumerate(old.names)}
+        changed = set(changed)
+        todo = [i for i, name in enumerate(names) if name in changed or name not in old_positions]
+
+        index = np.zeros(len(names), dtype=INDEX_DTYPE)
+        decoded = {}
+        writer = ShardWriter(out_dir, first_shard=old.manifest["shards"], shard_bytes=shard_bytes)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Decoded in bounded chunks, so a large delta never sits in memory all at once
+                for start in range(0, len(todo), workers * 4):
+                    chunk = todo[start:start + workers * 4]
+                    paths = [os.path.join(image_dir, names[i]) for i in chunk]
+                    for i, image in zip(chunk, pool.map(decode_rgb, paths)):
+                        shard, offset = writer.write(image)
+                        decoded[i] = (shard, offset, image.shape[0], image.shape[1])
+        finally:
+            writer.close()
+
+        all_boxes = []
+        for i, name in enumerate(names):
+            if i in decoded:
+                shard, offset, height, width = decoded[i]
+                boxes = read_label_file(label_path_for(labels_dir, name))
+            else:
+                entry = old.index[old_positions[name]]
+                shard, offset, height, width = entry["shard"], entry["offset"], entry["height"], entry["width"]
+                boxes = old.target_boxes(old_positions[name]).tolist()
+            index[i] = (shard, offset, height, width, len(all_boxes), len(boxes))
+            all_boxes.extend(boxes)
+
+        shards = max(writer.shards, old.manifest["shards"])
+        write_store(out_dir, image_dir, labels_dir, names, index, all_boxes, shards)
+        logger.info(f"Packed store at {out_dir} updated: {len(todo)} image(s) appended, "
+                    f"{len(names) - len(todo)} reused, {shards} shard(s)")
+        return out_dir
+
+    except Exception as e:
+        logger.error(f"Error updating packed dataset: {e}")
+        raise CustomException(f"Failed to update packed dataset: {e}", sys)
+
+
+class PackedImageStore:
+    """
+    Read side of `build_packed_dataset`.
+
+    Shards are memory-mapped copy-on-write, so `image` returns an HxWx3 uint8
+    view straight onto the page cache without a decode or a copy. Maps are
+    opened lazily and dropped on pickling, so every DataLoader worker maps the
+    shards itself instead of receiving a copy of the data.
+    """
+
+    def __init__(self, out_dir:str):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.names = self.manifest["names"]
+        self.index = np.load(os.path.join(out_dir, "index.npy"))
+        self.boxes = np.load(os.path.join(out_dir, "boxes.npy"))
+        self.shards = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["shards"] = None
+        return state
+
+    def __len__(self):
+        return len(self.index)
+
+    def is_current(self, image_dir:str, labels_dir:str):
+        return self.names == sorted(os.listdir(image_dir)) and \
+            self.manifest["signature"] == source_signature(image_dir, labels_dir, self.names)
+
+    def _open(self):
+        self.shards = [
+            np.memmap(os.path.join(self.out_dir, f"images_{shard:03d}.bin"), dtype=np.uint8, mode="c")
+            for shard in range(self.manifest["shards"])
+        ]
+
+    def image(self, idx:int):
+        if self.shards is None:
+            self._open()
+        entry = self.index[idx]
+        size = int(entry["height"]) * int(entry["width"]) * 3
+        start = int(entry["offset"])
+        return self.shards[entry["shard"]][start:start + size].reshape(int(entry["height"]), int(entry["width"]), 3)
+
+    def image_size(self, idx:int):
+        entry = self.index[idx]
+        return int(entry["width"]), int(entry["height"])
+
+    def target_boxes(self, idx:int):
+        entry = self.index[idx]
+        start = int(entry["box_start"])
+        return self.boxes[start:start + int(entry["box_count"])]
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else "artifacts/raw"
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else "artifacts/packed"
+    build_packed_dataset(root, out_dir)
@@ -0,0 +1,92 @@
+import io
+import numpy as np
+from PIL import Image, ImageDraw
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, only needed for format=msgpack
+    msgpack = None
+
+## Output encodings accepted by the legacy image endpoint
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+## Each packed detection is x_min, y_min, x_max, y_max, score, label as little-endian float32
+PACKED_DTYPE = np.dtype("<f4")
+PACKED_FIELDS = 6
+
+
+def filter_detections(detections, threshold:float):
+    """
+    Keep only the detections whose score is strictly above `threshold`.
+    """
+    keep = detections["scores"] > threshold
+    return {key: value[keep] for key, value in detections.items()}
+
+
+def to_json(detections, width:int, height:int):
+    """
+    Compact JSON-serializable view of detections for the /detect endpoint.
+    """
+    return {
+        "width": width,
+        "height": height,
+        "count": int(len(detections["scores"])),
+        "boxes": np.round(detections["boxes"], 1).tolist(),
+        "scores": np.round(detections["scores"], 4).tolist(),
+        "labels": detections["labels"].astype(int).tolist(),
+    }
+
+
+def pack_detections(detections):
+    """
+    Pack detections into an N x 6 float32 buffer (see PACKED_FIELDS).
+    """
+    packed = np.empty((len(detections["scores"]), PACKED_FIELDS), dtype=PACKED_DTYPE)
+    packed[:, :4] = detections["boxes"]
+    packed[:, 4] = detections["scores"]
+    packed[:, 5] = detections["labels"]
+    return packed.tobytes()
+
+
+def to_msgpack(detections, width:int, height:int):
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb({
+        "width": width,
+        "height": height,
+        "count": int(len(detections["scores"])),
+        "detections": pack_detections(detections),
+    })
+
+
+def draw_detections(image: Image.Image, detections, threshold:float):
+    img_rgb = image.convert("RGB")
+    draw = ImageDraw.Draw(img_rgb)
+
+    for box,score in zip(detections["boxes"], detections["scores"]):
+        if score >threshold:
+            x_min, y_min, x_max, y_max = box
+            draw.rectangle([x_min, y_min, x_max, y_max], outline="red", width=3)
+
+    return img_rgb
+
+
+def render_image(image: Image.Image, detections, threshold:float, image_format:str="png", quality:int=85):
+    """
+    Draw detections on the image and encode it, returning (buffer, media_type).
+    """
+    pil_format, media_type = IMAGE_FORMATS[image_format]
+    output_image = draw_detections(image, detections, threshold)
+
+    img_byte_arr = io.BytesIO()
+    if pil_format == "PNG":
+        output_image.save(img_byte_arr, format=pil_format)
+    else:
+        output_image.save(img_byte_arr, format=pil_format, quality=quality)
+    img_byte_arr.seek(0)
+    return img_byte_arr, media_type
@@ -0,0 +1,477 @@
+import os
+import sys
+import json
+import time
+import threading
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import nn
+from PIL import Image
+from torchvision.models import mobilenet_v3_small
+from torchvision.models.detection.transform import GeneralizedRCNNTransform
+from src.image_decode import draft_size, image_to_tensor
+from src.model_architecture import load_weights
+from src.telemetry import registry, timed
+from src.logger import get_logger
+from src.custom_exception import CustomException
+from config.inference_config import GATE_MAX_DROPPED
+
+logger = get_logger(__name__)
+
+## Gate classifier backbones, small ImageNet models with their last layer replaced by a single logit
+GATE_BACKBONES = {
+    "mobilenet_v3_small": mobilenet_v3_small,
+}
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# Background crops shorter than this, or covering less of the image, are not used as negatives
+MIN_BACKGROUND_SIDE = 32
+MIN_BACKGROUND_FRACTION = 0.15
+
+## Images per gate and decision; "pass" goes on to the full detector
+gate_images_total = registry.counter("gate_images_total", "Images seen by the gating cascade, by decision",
+                                     ("gate", "decision"))
+
+
+def gate_filename(backbone:str="mobilenet_v3_small"):
+    return f"gate_{backbone}.pth"
+
+
+def background_crop(image, boxes):
+    """
+    Largest strip of `image` (CHW) left, right, above or below every box, or None if too small.
+
+    The gun dataset has few frames without a weapon, so these crops are the gate's negatives.
+    """
+    _, height, width = image.shape
+    if len(boxes) == 0:
+        return None
+    x_min, y_min = int(boxes[:, 0].min()), int(boxes[:, 1].min())
+    x_max, y_max = int(boxes[:, 2].max()), int(boxes[:, 3].max())
+    strips = [(0, 0, x_min, height), (x_max, 0, width, height), (0, 0, width, y_min), (0, y_max, width, height)]
+    x0, y0, x1, y1 = max(strips, key=lambda s: max(0, s[2] - s[0]) * max(0, s[3] - s[1]))
+    if min(x1 - x0, y1 - y0) < MIN_BACKGROUND_SIDE or (x1 - x0) * (y1 - y0) < MIN_BACKGROUND_FRACTION * width * height:
+        return None
+    return image[:, y0:y1, x0:x1]
+
+
+class GateClassifier(nn.Module):
+    """
+    Image-level "is there a weapon" classifier with the detector's training interface.
+
+    In training mode `forward(images, targets)` returns `{"loss_gate": ...}`, a
+    binary cross-entropy over the images (positive when they have boxes) and
+    a background crop of each, so it trains in `ModelTraining` like the
+    detector. In eval mode it returns one `{"scores": tensor([p])}` per image.
+    """
+
+    def __init__(self, backbone:str="mobilenet_v3_small", input_size:int=224, pretrained:bool=True):
+        super().__init__()
+        self.net = GATE_BACKBONES[backbone](weights="DEFAULT" if pretrained else None)
+        self.net.classifier[-1] = nn.Linear(self.net.classifier[-1].in_features, 1)
+        self.input_size = input_size
+        self.register_buffer("mean", torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1), persistent=False)
+        self.register_buffer("std", torch.tensor(IMAGENET_STD).view(1, 3, 1, 1), persistent=False)
+
+    def prepare(self, images):
+        size = (self.input_size, self.input_size)
+        batch = torch.cat([F.interpolate(image[None], size=size, mode="bilinear", align_corners=False, antialias=True)
+                           for image in images])
+        return (batch - self.mean) / self.std
+
+    def forward(self, images, targets=None):
+        if self.training:
+            inputs, labels = [], []
+            for image, target in zip(images, targets):
+                inputs.append(image)
+                labels.append(float(len(target["boxes"]) > 0))
+                crop = background_crop(image, target["boxes"])
+                if crop is not None:
+                    inputs.append(crop)
+                    labels.append(0.0)
+            logits = self.net(self.prepare(inputs)).squeeze(1)
+            labels = torch.tensor(labels, device=logits.device, dtype=logits.dtype)
+            return {"loss_gate": F.binary_cross_entropy_with_logits(logits, labels)}
+
+        probabilities = torch.sigmoid(self.net(self.prepare(images)).squeeze(1).float())
+        return [{"scores": p.reshape(1)} for p in probabilities]
+
+
+def calibrate_threshold(scores, weights, max_dropped:float):
+    """
+    Highest threshold whose skipped images (score below it) hold at most `max_dropped` of the total weight.
+
+    `weights` are the ground-truth boxes per image, so the budget is a fraction of weapons, not of frames.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(scores) == 0 or weights.sum() == 0:
+        return 0.0
+    order = np.argsort(scores, kind="stable")
+    sorted_scores = scores[order]
+    # dropped[k]: weight of the k lowest-scoring images; a threshold at sorted_scores[k] skips at most those
+    dropped = np.concatenate([[0.0], np.cumsum(weights[order])])
+    k = int(np.nonzero(dropped <= max_dropped * weights.sum())[0].max())
+    if k >= len(sorted_scores):
+        return float(np.nextafter(sorted_scores[-1], np.inf))
+    return float(sorted_scores[k])
+
+
+class GateEvaluator:
+    """
+    Validation metrics of a gate: the threshold meeting the drop budget and what it skips.
+
+    Accepts the same per-image prediction / target dicts as DetectionEvaluator,
+    so `ModelTraining.evaluate` scores the gate classifier like the detector.
+    """
+
+    headline = ("recall", "skip_rate", "negative_skip_rate", "threshold", "AUC")
+
+    def __init__(self, max_dropped:float=0.02):
+        self.max_dropped = max_dropped
+        self.scores = []
+        self.weights = []
+
+    def add(self, prediction, target):
+        scores = np.asarray(prediction["scores"], dtype=np.float32).reshape(-1)
+        self.scores.append(float(scores.max()) if len(scores) else 0.0)
+        self.weights.append(int(np.asarray(target["boxes"]).reshape(-1, 4).shape[0]))
+
+    def add_batch(self, predictions, targets):
+        for prediction, target in zip(predictions, targets):
+            self.add(prediction, target)
+
+    def state(self):
+        return {"scores": list(self.scores), "weights": list(self.weights)}
+
+    def merge(self, state):
+        self.scores.extend(state["scores"])
+        self.weights.extend(state["weights"])
+
+    def summary(self, threshold:float=None):
+        """
+        Metrics at `threshold`, or at the threshold calibrated for the `max_dropped` budget.
+        """
+        scores = np.asarray(self.scores, dtype=np.float64)
+        weights = np.asarray(self.weights, dtype=np.float64)
+        if threshold is None:
+            threshold = calibrate_threshold(scores, weights, self.max_dropped)
+        skipped = scores < threshold
+        positive = weights > 0
+        num_pos, num_neg = int(positive.sum()), int((~positive).sum())
+
+        # Rank-based AUC of telling frames with a weapon from frames without one
+        auc = float("nan")
+        if num_pos and num_neg:
+            ranks = np.empty(len(scores))
+            ranks[np.argsort(scores, kind="stable")] = np.arange(1, len(scores) + 1)
+            auc = float((ranks[positive].sum() - num_pos * (num_pos + 1) / 2) / (num_pos * num_neg))
+
+        return {
+            "threshold": float(threshold),
+            "max_dropped": self.max_dropped,
+            "recall": float(1.0 - weights[skipped].sum() / weights.sum()) if weights.sum() else float("nan"),
+            "skip_rate": float(skipped.mean()) if len(scores) else float("nan"),
+            "negative_skip_rate": float(skipped[~positive].mean()) if num_neg else float("nan"),
+            "AUC": auc,
+            "images": len(scores),
+            "positive_images": num_pos,
+        }
+
+
+class GateClassifierModel:
+    """
+    ModelTraining-compatible wrapper of GateClassifier, as FasterRCNNModel is for the detector.
+
+    `min_size` sets the classifier's square input size; `num_classes` and
+    `max_size` are accepted for the shared constructor signature and unused.
+    """
+
+    model_filename = staticmethod(gate_filename)
+
+    @staticmethod
+    def evaluator():
+        return GateEvaluator(GATE_MAX_DROPPED)
+
+    def __init__(self, num_classes, device, backbone="mobilenet_v3_small", min_size=None, max_size=None, pretrained=True):
+        if backbone not in GATE_BACKBONES:
+            raise ValueError(f"Unknown gate backbone: {backbone}, expected one of {list(GATE_BACKBONES)}")
+        self.device = device
+        self.backbone = backbone
+        self.model = GateClassifier(backbone, input_size=min_size or 224, pretrained=pretrained).to(device)
+        logger.info(f"Gate classifier created ({backbone}, {self.model.input_size}px input)")
+
+
+class RPNObjectnessGate:
+    """
+    Gate scored by the detector's own RPN: the highest objectness over all anchors, at reduced resolution.
+
+    Runs only the backbone and the RPN head (no proposal NMS, no ROI heads)
+    on an image shrunk to `min_size`, reusing the trained detector weights,
+    so it needs no training of its own.
+    """
+
+    kind = "rpn"
+
+    def __init__(self, detector, min_size:int=320, max_size:int=533):
+        stages = ("transform", "backbone", "rpn")
+        if isinstance(detector, torch.jit.ScriptModule) or \
+                not all(isinstance(getattr(detector, stage, None), nn.Module) for stage in stages):
+            raise ValueError("The RPN gate needs the eager Faster R-CNN engine")
+        self.detector = detector
+        self.transform = GeneralizedRCNNTransform(min_size, max_size, detector.transform.image_mean,
+                                                  detector.transform.image_std).eval()
+        self.input_size = (min_size, max_size)
+        self.device = next(detector.parameters()).device
+
+    @torch.no_grad()
+    def score(self, tensors):
+        images, _ = self.transform([tensor.to(self.device) for tensor in tensors])
+        features = list(self.detector.backbone(images.tensors).values())
+        objectness, _ = self.detector.rpn.head(features)
+        best = torch.stack([level.flatten(1).amax(1) for level in objectness]).amax(0)
+        return best.sigmoid().float().cpu().numpy()
+
+
+class ClassifierGate:
+    """
+    Gate scored by a trained GateClassifier.
+    """
+
+    kind = "classifier"
+
+    def __init__(self, model_path:str, device="cpu", backbone:str="mobilenet_v3_small", input_size:int=224):
+        self.device = torch.device(device)
+        self.model = GateClassifier(backbone, input_size=input_size, pretrained=False)
+        self.model.load_state_dict(load_weights(model_path, map_location=self.device))
+        self.model.to(self.device).eval().requires_grad_(False)
+        self.input_size = (input_size, input_size)
+
+    @torch.no_grad()
+    def score(self, tensors):
+        outputs = self.model([tensor.to(self.device) for tensor in tensors])
+        return torch.cat([output["scores"] for output in outputs]).cpu().numpy()
+
+
+def create_gate(kind:str, detector=None, device="cpu", rpn_min_size:int=320, rpn_max_size:int=533,
+                classifier_path:str=None, classifier_size:int=224):
+    if kind == "rpn":
+        return RPNObjectnessGate(detector, rpn_min_size, rpn_max_size)
+    if kind == "classifier":
+        return ClassifierGate(classifier_path, device, input_size=classifier_size)
+    raise ValueError(f"Unknown gate kind {kind!r}, expected 'rpn' or 'classifier'")
+
+
+def load_threshold(kind:str, threshold:float=None, calibration_path:str=None):
+    """
+    The configured threshold, else the calibrated one, else 0 (every image passes).
+    """
+    if threshold is not None:
+        return threshold
+    if calibration_path and os.path.exists(calibration_path):
+        with open(calibration_path) as f:
+            calibration = json.load(f)
+        if kind in calibration:
+            return calibration[kind]["threshold"]
+    logger.warning(f"No calibrated threshold for the {kind} gate, every image goes to the detector")
+    return 0.0
+
+
+def gate_input(image: Image.Image, input_size):
+    """
+    Shrink a PIL image to the gate's input size before tensor conversion, so large frames stay cheap.
+    """
+    size = draft_size(image.width, image.height, *input_size)
+    if size is not None:
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return image_to_tensor(image)
+
+
+class CascadePredictor:
+    """
+    Two-stage cascade: a cheap gate decides which images reach the full detector.
+
+    Images scoring below `threshold` get empty detections without running the
+    detector (`detector` is a Predictor or TiledPredictor). Pass/skip counts
+    are exported per gate, and `stats` estimates the fraction of detector
+    compute saved from the measured gate and detector times.
+    """
+
+    def __init__(self, detector, gate, threshold:float):
+        self.detector = detector
+        self.gate = gate
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.counts = {"images": 0, "passed": 0, "skipped": 0}
+        self.seconds = {"gate": 0.0, "detector": 0.0}
+
+    def warmup(self, sizes=((640, 480),)):
+        start = time.perf_counter()
+        self.gate.score([gate_input(Image.new("RGB", size), self.gate.input_size) for size in sizes])
+        return self.detector.warmup(sizes) + time.perf_counter() - start
+
+    @staticmethod
+    def empty_detections():
+        return {"boxes": np.zeros((0, 4), dtype=np.float32), "labels": np.zeros(0, dtype=np.int64),
+                "scores": np.zeros(0, dtype=np.float32)}
+
+    def predict_batch(self, images):
+        return self.gated(images, self.detector.predict_batch)
+
+    def predict(self, image, cache=None):
+        """
+        Gate one image for a TiledPredictor's `predict`, which reuses unchanged tiles from `cache`.
+        """
+        return self.gated([image], lambda passed: [self.detector.predict(passed[0], cache)])[0]
+
+    def gated(self, images, detect):
+        """
+        Score `images` with the gate and run `detect` on the list of those that pass.
+        """
+        start = time.perf_counter()
+        with timed("gate"):
+            scores = self.gate.score([gate_input(image, self.gate.input_size) for image in images])
+        passed = [i for i, score in enumerate(scores) if score >= self.threshold]
+        gate_seconds = time.perf_counter() - start
+
+        results = [self.empty_detections() for _ in images]
+        start = time.perf_counter()
+        if passed:
+            for i, detections in zip(passed, detect([images[i] for i in passed])):
+                results[i] = detections
+        detector_seconds = time.perf_counter() - start
+
+        gate_images_total.inc(self.gate.kind, "pass", amount=len(passed))
+        gate_images_total.inc(self.gate.kind, "skip", amount=len(images) - len(passed))
+        with self.lock:
+            self.counts["images"] += len(images)
+            self.counts["passed"] += len(passed)
+            self.counts["skipped"] += len(images) - len(passed)
+            self.seconds["gate"] += gate_seconds
+            self.seconds["detector"] += detector_seconds
+        return results
+
+    def stats(self):
+        with self.lock:
+            counts, seconds = dict(self.counts), dict(self.seconds)
+        stats = {
+            "gate_kind": self.gate.kind,
+            "gate_threshold": self.threshold,
+            "gate_passed": counts["passed"],
+            "gate_skipped": counts["skipped"],
+            "gate_skip_ratio": counts["skipped"] / max(1, counts["images"]),
+        }
+        if counts["passed"]:
+            # Compared with running the detector on every image at its measured per-image cost
+            ungated = seconds["detector"] / counts["passed"] * counts["images"]
+            stats["gate_compute_saved_ratio"] = 1.0 - (seconds["gate"] + seconds["detector"]) / ungated
+        return stats
+
+
+def tensor_to_image(tensor):
+    """
+    RGB PIL image from a CHW dataset tensor, uint8 or float in [0, 1].
+    """
+    if tensor.dtype != torch.uint8:
+        tensor = tensor.mul(255).round_().clamp_(0, 255).to(torch.uint8)
+    return Image.fromarray(tensor.permute(1, 2, 0).contiguous().numpy())
+
+
+def gate_scores(gate, dataset, batch_size:int=8):
+    """
+    Gate scores and ground-truth box counts over a GunDataset (or a Subset of one).
+
+    Each sample goes through `gate_input` exactly as CascadePredictor does at
+    serving time, so the calibrated threshold applies to the same score distribution.
+    """
+    from torch.utils.data import DataLoader
+    from src.data_processing import collate_batch
+
+    scores, weights = [], []
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, collate_fn=collate_batch)
+    for images, targets in loader:
+        scores.extend(gate.score([gate_input(tensor_to_image(image), gate.input_size) for image in images]))
+        weights.extend(len(target["boxes"]) for target in targets)
+    return np.asarray(scores), np.asarray(weights)
+
+
+def calibrate(kind:str, max_dropped:float, calibration_path:str):
+    """
+    Tune a gate's threshold on the GunDataset validation split and record it in `calibration_path`.
+    """
+    from src.data_processing import GunDataset, train_val_split
+    from src.predictor import Predictor
+    from config.inference_config import (MODEL_PATH, NUM_CLASSES, BACKBONE, GATE_RPN_MIN_SIZE, GATE_RPN_MAX_SIZE,
+                                         GATE_CLASSIFIER_PATH, GATE_CLASSIFIER_SIZE)
+    from config.training_config import DATASET_PATH
+
+    try:
+        detector = Predictor(MODEL_PATH, NUM_CLASSES, backbone=BACKBONE).model if kind == "rpn" else None
+        gate = create_gate(kind, detector, rpn_min_size=GATE_RPN_MIN_SIZE, rpn_max_size=GATE_RPN_MAX_SIZE,
+                           classifier_path=GATE_CLASSIFIER_PATH, classifier_size=GATE_CLASSIFIER_SIZE)
+        _, val_dataset = train_val_split(GunDataset(DATASET_PATH))
+
+        evaluator = GateEvaluator(max_dropped)
+        scores, weights = gate_scores(gate, val_dataset)
+        evaluator.merge({"scores": scores.tolist(), "weights": weights.tolist()})
+        summary = evaluator.summary()
+
+        calibration = {}
+        if os.path.exists(calibration_path):
+            with open(calibration_path) as f:
+                calibration = json.load(f)
+        calibration[kind] = summary
+        os.makedirs(os.path.dirname(calibration_path) or ".", exist_ok=True)
+        with open(calibration_path, "w") as f:
+            json.dump(calibration, f, indent=2)
+
+        logger.info(f"Calibrated {kind} gate: threshold={summary['threshold']:.4f} recall={summary['recall']:.4f} "
+                    f"skip_rate={summary['skip_rate']:.3f} on {summary['images']} validation images")
+        return summary
+
+    except Exception as e:
+        logger.error(f"Error calibrating the {kind} gate: {e}")
+        raise CustomException(f"Gate calibration failed: {e}", sys)
+
+
+def train_gate_classifier():
+    """
+    Train the gate classifier through ModelTraining, with its own checkpoints and evaluation reports.
+    """
+    from src.model_training import ModelTraining
+    from config.training_config import (DATASET_PATH, PACKED_DIR, NUM_WORKERS, CHECKPOINT_DIR, EVAL_DIR,
+                                        GATE_BACKBONE, GATE_EPOCHS, GATE_LEARNING_RATE, GATE_BATCH_SIZE)
+    from config.inference_config import GATE_CLASSIFIER_SIZE
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    training = ModelTraining(
+        model_class=GateClassifierModel,
+        num_classes=1,
+        learning_rate=GATE_LEARNING_RATE,
+        epochs=GATE_EPOCHS,
+        dataset_path=DATASET_PATH,
+        device=device,
+        backbone=GATE_BACKBONE,
+        min_size=GATE_CLASSIFIER_SIZE,
+        packed_dir=PACKED_DIR,
+        batch_size=GATE_BATCH_SIZE,
+        num_workers=NUM_WORKERS,
+        checkpoint_dir=os.path.join(CHECKPOINT_DIR, "gate"),
+        eval_dir=os.path.join(EVAL_DIR, "gate"),
+    )
+    training.train()
+
+
+if __name__ == "__main__":
+    # `python -m src.gating train` trains the classifier gate; `python -m src.gating calibrate [rpn|classifier]`
+    # tunes a gate's threshold on the validation split for GATE_MAX_DROPPED
+    from config.inference_config import GATE_KIND, GATE_CALIBRATION_PATH
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "calibrate"
+    if command == "train":
+        train_gate_classifier()
+        calibrate("classifier", GATE_MAX_DROPPED, GATE_CALIBRATION_PATH)
+    else:
+        calibrate(sys.argv[2] if len(sys.argv) > 2 else GATE_KIND, GATE_MAX_DROPPED, GATE_CALIBRATION_PATH)
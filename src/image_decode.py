@@ -0,0 +1,212 @@
+import io
+import math
+import logging
+import json
+import numpy as np
+import torch
+from PIL import Image, ImageOps, UnidentifiedImageError
+from src.logger import get_logger, log_every_seconds
+from config.logging_config import LOG_THROTTLE_SECONDS
+
+logger = get_logger(__name__)
+
+EXIF_ORIENTATION = 0x0112
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+TRANSPOSING_ORIENTATIONS = {5, 6, 7, 8}
+SIXTEEN_BIT_MODES = {"I;16", "I;16B", "I;16L", "I;16N", "I"}
+
+
+class ImageRejectedError(Exception):
+    """
+    Raised when an upload is refused before or during decoding.
+
+    Attributes:
+        status_code (int): HTTP status to answer with, 413 for limits and 400 for undecodable data.
+    """
+
+    def __init__(self, message, status_code:int=413):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def draft_size(width:int, height:int, min_size:int, max_size:int):
+    """
+    Smallest decode size that still covers the model's resize target, or None if the model upscales.
+    """
+    scale = min(min_size / min(width, height), max_size / max(width, height))
+    if scale >= 1.0:
+        return None
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def to_rgb(image: Image.Image):
+    """
+    Convert any PIL mode to 8-bit RGB: transparency is flattened onto white and
+    16-bit images are scaled down instead of clipped.
+    """
+    if image.mode == "RGB":
+        return image
+    if image.mode in SIXTEEN_BIT_MODES:
+        values = np.asarray(image, dtype=np.uint32)
+        return Image.fromarray((values >> 8).clip(0, 255).astype(np.uint8), "L").convert("RGB")
+    if image.mode == "P" and "transparency" in image.info:
+        image = image.convert("RGBA")
+    if image.mode in ("RGBA", "LA", "PA"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def decode_image(data: bytes, max_pixels:int, reduce_to=None):
+    """
+    Decode an upload to RGB with its EXIF orientation applied.
+
+    The pixel limit is checked from the header before any pixel is decoded.
+    With `reduce_to=(min_size, max_size)`, JPEGs are decoded in draft mode at
+    the smallest libjpeg scale (1/2, 1/4, 1/8) that still covers the model's
+    resize target. Returns (image, (width, height)) where the size is that of
+    the full-resolution, orientation-corrected image, so detections on a
+    reduced decode can be mapped back to it.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise ImageRejectedError("Upload is not a supported image", status_code=400)
+    except Image.DecompressionBombError as e:
+        # PIL refuses headers over twice Image.MAX_IMAGE_PIXELS before our own limit is checked
+        log_every_seconds(logger, logging.WARNING, LOG_THROTTLE_SECONDS, "Rejected a decompression bomb: %s", e)
+        raise ImageRejectedError(f"Image exceeds the {max_pixels} pixel limit: {e}")
+
+    width, height = image.size
+    if width * height > max_pixels:
+        # Throttled: a client retrying oversized uploads should not flood the log
+        log_every_seconds(logger, logging.WARNING, LOG_THROTTLE_SECONDS,
+                          "Rejected a %dx%d image over the %d pixel limit", width, height, max_pixels)
+        raise ImageRejectedError(f"Image of {width}x{height} pixels exceeds the {max_pixels} pixel limit")
+
+    if reduce_to is not None and image.format == "JPEG":
+        size = draft_size(width, height, *reduce_to)
+        if size is not None:
+            image.draft(image.mode, size)
+
+    try:
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+            if orientation in TRANSPOSING_ORIENTATIONS:
+                width, height = height, width
+        return to_rgb(image), (width, height)
+    except Image.DecompressionBombError as e:
+        raise ImageRejectedError(f"Image exceeds the {max_pixels} pixel limit: {e}")
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ImageRejectedError(f"Image could not be decoded: {e}", status_code=400)
+
+
+def rescale_detections(detections, from_size, to_size):
+    """
+    Map detection boxes from an image of `from_size` to the same image at `to_size`.
+    """
+    if tuple(from_size) == tuple(to_size):
+        return detections
+    scale = np.array([to_size[0] / from_size[0], to_size[1] / from_size[1]] * 2, dtype=np.float32)
+    return {**detections, "boxes": detections["boxes"] * scale}
+
+
+def image_to_tensor(image: Image.Image, device=None):
+    """
+    CHW float tensor in [0, 1] from an RGB image.
+
+    The pixels stay uint8 until they are on `device`, then are converted to
+    float in a single allocation, without the intermediate copies of ToTensor.
+    """
+    tensor = torch.from_numpy(np.array(image, dtype=np.uint8)).permute(2, 0, 1)
+    if device is not None:
+        tensor = tensor.to(device, non_blocking=True)
+    return tensor.to(torch.float32).div_(255.0)
+
+
+async def read_upload(file, max_bytes:int, chunk_size:int=1 << 20):
+    """
+    Read an UploadFile in chunks, refusing it as soon as it exceeds `max_bytes`.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise ImageRejectedError(f"Upload of {file.size} bytes exceeds the {max_bytes} byte limit")
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return bytes(buffer)
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise ImageRejectedError(f"Upload exceeds the {max_bytes} byte limit")
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware that caps request bodies while they stream in.
+
+    Requests declaring a larger Content-Length are refused with 413 before the
+    body is read; chunked bodies are counted as they arrive and cut off at the
+    limit, so an oversized upload is never spooled in full. `route_limits`
+    maps path prefixes to their own limit, e.g. for archive uploads.
+    """
+
+    def __init__(self, app, max_bytes:int, route_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.route_limits = route_limits or {}
+
+    def limit_for(self, path:str):
+        for prefix, limit in self.route_limits.items():
+            if path.startswith(prefix):
+                return limit
+        return self.max_bytes
+
+    @staticmethod
+    async def reject(send, limit):
+        body = json.dumps({"detail": f"Request body exceeds the {limit} byte limit"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.limit_for(scope["path"])
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await self.reject(send, limit)
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise ImageRejectedError(f"Request body exceeds the {limit} byte limit")
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Once the limit is hit, whatever error the app produces is replaced by the 413 below
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self.reject(send, limit)
@@ -0,0 +1,109 @@
+import os
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import torch
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+class ServerBusyError(Exception):
+    """
+    Raised when the inference executor cannot admit another request.
+
+    Attributes:
+        retry_after (int): Suggested number of seconds before the client retries.
+    """
+
+    def __init__(self, message, retry_after:int=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Worker pool for CPU-bound inference with bounded admission.
+
+    `kind="thread"` runs inference on a thread pool sharing the server's model,
+    with `torch.set_num_threads` tuned so the workers do not oversubscribe the
+    cores. `kind="process"` starts a process pool where every worker loads its
+    own model copy through `initializer`. At most `max_pending` requests are
+    admitted at once; beyond that `admit` raises `ServerBusyError`.
+    """
+
+    def __init__(self, kind:str="thread", max_workers:int=1, torch_threads:int=0,
+                 max_pending:int=32, retry_after:int=1, initializer=None, initargs=()):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max(1, int(max_workers))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.max_workers)
+        self.max_pending = max(1, int(max_pending))
+        self.retry_after = retry_after
+        self.initializer = initializer
+        self.initargs = initargs
+        self.pending = 0
+        self.rejected = 0
+        self.pool = None
+
+    def start(self):
+        if self.pool is not None:
+            return self.pool
+
+        if self.kind == "thread":
+            torch.set_num_threads(self.torch_threads)
+            self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        else:
+            # spawn keeps workers clear of the parent's torch thread pools
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+                initargs=(*self.initargs, self.torch_threads),
+            )
+        logger.info(f"Inference executor started: {self.kind} x{self.max_workers}, "
+                    f"{self.torch_threads} torch threads per worker, max_pending={self.max_pending}")
+        return self.pool
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+            logger.info("Inference executor shut down")
+
+    def acquire(self):
+        """
+        Reserve an admission slot, raising ServerBusyError when none is free.
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServerBusyError(
+                f"Inference queue is full ({self.pending}/{self.max_pending} requests pending)",
+                retry_after=self.retry_after,
+            )
+        self.pending += 1
+
+    def release(self):
+        self.pending -= 1
+
+    @contextmanager
+    def admit(self):
+        """
+        Reserve an admission slot for one request for the duration of the block.
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "executor": self.kind,
+            "workers": self.max_workers,
+            "torch_threads": self.torch_threads,
+            "pending_requests": self.pending,
+            "max_pending_requests": self.max_pending,
+            "rejected_requests": self.rejected,
+        }
@@ -1,41 +1,254 @@
-
-import logging
 import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing.util
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from config.logging_config import *
 
-# Directory to store log files
-LOGS_DIR = "logs"
 os.makedirs(LOGS_DIR, exist_ok=True)
 
-# Create log file with current date in filename
-LOG_FILE = os.path.join(LOGS_DIR, f"log_{datetime.now().strftime('%Y-%m-%d')}.log")
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Per-process logging state: the queue feeding the writer thread, and the listener running it
+_state = {"pid": None, "queue": None, "listener": None, "handler": None, "dropped": 0}
+_setup_lock = threading.Lock()
+
+
+def log_file_path(timestamp:float=None):
+    """
+    Daily log file for `timestamp` (now by default).
+    """
+    day = datetime.fromtimestamp(timestamp if timestamp is not None else time.time()).strftime('%Y-%m-%d')
+    return os.path.join(LOGS_DIR, f"log_{day}.log")
+
+
+# Today's log file, kept for callers that read it
+LOG_FILE = log_file_path()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, with the exception traceback as a field.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DailyFileHandler(logging.Handler):
+    """
+    Appends records to the daily log file, switching files at midnight.
+
+    The file is opened with O_APPEND and every record, traceback included, is
+    written with a single os.write, so any number of processes can share the
+    file without interleaving partial lines and without rotation races.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.path = None
+        self.fd = None
+
+    def _open(self, path):
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.path = path
+
+    def emit(self, record):
+        try:
+            path = log_file_path(record.created)
+            if path != self.path:
+                self._open(path)
+            os.write(self.fd, (self.format(record) + "\n").encode("utf-8", "replace"))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        super().close()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller and defers formatting to the writer thread.
+
+    The stock handler formats every message while enqueuing; here the record is
+    queued as is, so `logger.info("... %s", value)` costs the caller a level
+    check and a queue put. When the queue is full the record is dropped and
+    counted instead of stalling a request or training step.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _state["dropped"] += 1
+
+
+def _make_formatter():
+    if os.environ.get("LOG_FORMAT", LOG_FORMAT).lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _start_listener():
+    """
+    Route the root logger through a fresh queue and writer thread owned by this process.
+    """
+    file_handler = DailyFileHandler()
+    file_handler.setFormatter(_make_formatter())
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    if _state["handler"] is not None:
+        root.removeHandler(_state["handler"])
+    handler = NonBlockingQueueHandler(records)
+    root.addHandler(handler)
+
+    _state.update(pid=os.getpid(), queue=records, listener=listener, handler=handler, dropped=0)
+    # multiprocessing children (DataLoader workers, pool workers) skip atexit, but run Finalize callbacks
+    atexit.register(stop_logging)
+    multiprocessing.util.Finalize(None, stop_logging, exitpriority=0)
+
+
+def _after_fork_in_child():
+    # The parent's writer thread does not exist in a forked child; start this process's own
+    if _state["pid"] is not None:
+        _start_listener()
+
+
+def stop_logging():
+    """
+    Flush the queued records and stop this process's writer thread.
+    """
+    listener = _state["listener"]
+    if listener is not None and _state["pid"] == os.getpid():
+        _state["listener"] = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def module_level(name:str):
+    """
+    Level configured for a logger name: the longest matching LOG_MODULE_LEVELS prefix, or NOTSET to inherit.
+    """
+    best = ""
+    for prefix in LOG_MODULE_LEVELS:
+        if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > len(best):
+            best = prefix
+    return logging.getLevelName(LOG_MODULE_LEVELS[best]) if best else logging.NOTSET
+
+
+def setup_logging():
+    """
+    Configure logging for this process once: root level, per-module levels and the background writer.
+    """
+    with _setup_lock:
+        if _state["pid"] == os.getpid():
+            return
+        logging.getLogger().setLevel(os.environ.get("LOG_LEVEL", LOG_LEVEL).upper())
+        for name in LOG_MODULE_LEVELS:
+            logging.getLogger(name).setLevel(module_level(name))
+        _start_listener()
 
-# Configure basic logging settings for the application
-logging.basicConfig(
-    filename=LOG_FILE,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    level = logging.INFO
-)
 
 def get_logger(name):
     """
     Creates and returns a logger instance with the specified name.
-    
+
     This function provides a consistent way to obtain logger instances
-    throughout the application, ensuring that all loggers inherit the basic
-    configuration (level, file handler, format) defined in this module.
-    
+    throughout the application. Records go through a queue to a background
+    writer thread, so logging never does file I/O on the calling thread; the
+    level comes from LOG_MODULE_LEVELS (longest prefix) or LOG_LEVEL in
+    `config/logging_config.py`. Pass arguments separately from the message
+    (`logger.info("Loaded %s", path)`) so they are only formatted when the
+    record is written.
+
     Args:
         name (str): The name for the logger, typically `__name__` from the calling module
                    to include the module path in the log records.
-    
+
     Returns:
         logging.Logger: A configured logger instance.
-    
+
     Example:
         >>> logger = get_logger(__name__)
         >>> logger.info("Processing started")
     """
+    setup_logging()
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    return logger
\ No newline at end of file
+    logger.setLevel(module_level(name))
+    return logger
+
+
+_sample_counts = {}
+_throttle_state = {}
+_sample_lock = threading.Lock()
+
+
+def log_every_n(logger, level:int, n:int, msg:str, *args):
+    """
+    Log the 1st, (n+1)th, (2n+1)th... call of this message template, for per-item hot paths.
+
+    Calls are counted per (logger, template); the record notes how many calls it stands for.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    key = (logger.name, msg)
+    with _sample_lock:
+        count = _sample_counts.get(key, 0)
+        _sample_counts[key] = count + 1
+    if count % max(1, n) == 0:
+        logger.log(level, msg + " [sampled 1/%d, call %d]", *args, n, count + 1)
+
+
+def log_every_seconds(logger, level:int, seconds:float, msg:str, *args):
+    """
+    Log this message template at most once every `seconds`, reporting how many calls were suppressed.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    key = (logger.name, msg)
+    now = time.monotonic()
+    with _sample_lock:
+        last, suppressed = _throttle_state.get(key, (None, 0))
+        if last is not None and now - last < seconds:
+            _throttle_state[key] = (last, suppressed + 1)
+            return
+        _throttle_state[key] = (now, 0)
+    if suppressed:
+        logger.log(level, msg + " [%d similar messages suppressed]", *args, suppressed)
+    else:
+        logger.log(level, msg, *args)
+
+
+def logging_stats():
+    return {"log_queue_depth": _state["queue"].qsize() if _state["queue"] is not None else 0,
+            "log_records_dropped": _state["dropped"]}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
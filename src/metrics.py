@@ -0,0 +1,234 @@
+import numpy as np
+from src.box_ops import box_iou
+
+## COCO evaluation grid: IoU thresholds 0.50:0.05:0.95 and 101 recall points
+COCO_IOU_THRESHOLDS = np.round(np.arange(0.5, 0.96, 0.05), 2)
+RECALL_POINTS = np.linspace(0.0, 1.0, 101)
+
+
+def match_detections(pred_boxes, gt_boxes, iou_thresholds, pred_labels=None, gt_labels=None):
+    """
+    Greedy COCO matching of one image's detections, for every IoU threshold at once.
+
+    Detections must already be sorted by descending score. Each detection is
+    matched to the unmatched ground-truth box of the same label it overlaps
+    most, if that IoU reaches the threshold. Returns a (detections, thresholds)
+    boolean true-positive matrix.
+    """
+    num_det, num_thr = len(pred_boxes), len(iou_thresholds)
+    is_tp = np.zeros((num_det, num_thr), dtype=bool)
+    if num_det == 0 or len(gt_boxes) == 0:
+        return is_tp
+
+    iou = box_iou(pred_boxes, gt_boxes)
+    if pred_labels is not None and gt_labels is not None:
+        iou = np.where(pred_labels[:, None] == gt_labels[None, :], iou, -1.0)
+
+    thresholds = np.asarray(iou_thresholds, dtype=np.float32)
+    rows = np.arange(num_thr)
+    matched = np.zeros((num_thr, len(gt_boxes)), dtype=bool)
+    for d in range(num_det):
+        candidates = np.where(matched, -1.0, iou[d])
+        best = candidates.argmax(axis=1)
+        hit = candidates[rows, best] >= thresholds
+        is_tp[d] = hit
+        matched[rows[hit], best[hit]] = True
+    return is_tp
+
+
+class DetectionEvaluator:
+    """
+    COCO-style detection metrics accumulated over a validation set.
+
+    `add` matches each image's detections against its ground truth for all
+    IoU thresholds at once and appends scores, labels and true-positive flags
+    to preallocated arrays that grow geometrically, so large validation sets
+    never build per-image Python lists. `summary` computes AP per class and
+    IoU threshold with 101-point interpolated precision, plus TP/FP/FN,
+    precision, recall and F1 at the `score_threshold` operating point.
+    """
+
+    # Metrics tracked per epoch by ModelTraining.evaluate
+    headline = ("mAP", "AP50", "AP75", "precision", "recall", "f1")
+
+    def __init__(self, iou_thresholds=COCO_IOU_THRESHOLDS, score_threshold:float=0.5, capacity:int=4096):
+        self.iou_thresholds = np.asarray(iou_thresholds, dtype=np.float32)
+        self.score_threshold = score_threshold
+        self.scores = np.empty(capacity, dtype=np.float32)
+        self.labels = np.empty(capacity, dtype=np.int64)
+        self.is_tp = np.empty((capacity, len(self.iou_thresholds)), dtype=bool)
+        self.size = 0
+        self.gt_counts = {}
+        self.images = 0
+
+    def _reserve(self, count:int):
+        needed = self.size + count
+        if needed <= len(self.scores):
+            return
+        capacity = max(needed, 2 * len(self.scores))
+        self.scores = np.resize(self.scores, capacity)
+        self.labels = np.resize(self.labels, capacity)
+        is_tp = np.empty((capacity, self.is_tp.shape[1]), dtype=bool)
+        is_tp[:self.size] = self.is_tp[:self.size]
+        self.is_tp = is_tp
+
+    def _append(self, scores, labels, is_tp):
+        self._reserve(len(scores))
+        end = self.size + len(scores)
+        self.scores[self.size:end] = scores
+        self.labels[self.size:end] = labels
+        self.is_tp[self.size:end] = is_tp
+        self.size = end
+
+    def add(self, prediction, target):
+        """
+        Add one image: `prediction` has `boxes`, `scores` and optionally `labels`,
+        `target` has `boxes` and optionally `labels` (NumPy arrays or tensors).
+        Missing labels are treated as the single object class 1.
+        """
+        scores = np.asarray(prediction["scores"], dtype=np.float32).reshape(-1)
+        pred_boxes = np.asarray(prediction["boxes"], dtype=np.float32).reshape(-1, 4)
+        gt_boxes = np.asarray(target["boxes"], dtype=np.float32).reshape(-1, 4)
+        pred_labels = np.asarray(prediction.get("labels", np.ones(len(scores))), dtype=np.int64).reshape(-1)
+        gt_labels = np.asarray(target.get("labels", np.ones(len(gt_boxes))), dtype=np.int64).reshape(-1)
+
+        order = np.argsort(-scores, kind="stable")
+        scores, pred_boxes, pred_labels = scores[order], pred_boxes[order], pred_labels[order]
+        is_tp = match_detections(pred_boxes, gt_boxes, self.iou_thresholds, pred_labels, gt_labels)
+        self._append(scores, pred_labels, is_tp)
+
+        for label, count in zip(*np.unique(gt_labels, return_counts=True)):
+            self.gt_counts[int(label)] = self.gt_counts.get(int(label), 0) + int(count)
+        self.images += 1
+
+    def add_batch(self, predictions, targets):
+        for prediction, target in zip(predictions, targets):
+            self.add(prediction, target)
+
+    def state(self):
+        """
+        Picklable accumulated state, e.g. for gathering evaluators across ranks.
+        """
+        return {
+            "scores": self.scores[:self.size],
+            "labels": self.labels[:self.size],
+            "is_tp": self.is_tp[:self.size],
+            "gt_counts": dict(self.gt_counts),
+            "images": self.images,
+        }
+
+    def merge(self, state):
+        self._append(state["scores"], state["labels"], state["is_tp"])
+        for label, count in state["gt_counts"].items():
+            self.gt_counts[label] = self.gt_counts.get(label, 0) + count
+        self.images += state["images"]
+
+    def average_precision(self, label:int):
+        """
+        101-point interpolated AP of one class, for every IoU threshold.
+        """
+        num_gt = self.gt_counts.get(label, 0)
+        if num_gt == 0:
+            return np.full(len(self.iou_thresholds), np.nan)
+
+        keep = self.labels[:self.size] == label
+        order = np.argsort(-self.scores[:self.size][keep], kind="stable")
+        is_tp = self.is_tp[:self.size][keep][order]
+        if len(is_tp) == 0:
+            return np.zeros(len(self.iou_thresholds))
+
+        tp = np.cumsum(is_tp, axis=0)
+        fp = np.cumsum(~is_tp, axis=0)
+        recall = tp / num_gt
+        precision = tp / (tp + fp)
+        # Precision envelope: best precision at any higher recall
+        precision = np.maximum.accumulate(precision[::-1], axis=0)[::-1]
+
+        ap = np.zeros(len(self.iou_thresholds))
+        for t in range(len(self.iou_thresholds)):
+            idx = np.searchsorted(recall[:, t], RECALL_POINTS, side="left")
+            sampled = np.where(idx < len(recall), precision[np.minimum(idx, len(recall) - 1), t], 0.0)
+            ap[t] = sampled.mean()
+        return ap
+
+    def operating_point(self, score_threshold:float):
+        """
+        TP/FP/FN, precision, recall and F1 per IoU threshold for detections above `score_threshold`.
+
+        Detections scoring exactly `score_threshold` are dropped, as `filter_detections` does when serving.
+        """
+        num_gt = sum(self.gt_counts.values())
+        keep = self.scores[:self.size] > score_threshold
+        tp = self.is_tp[:self.size][keep].sum(axis=0)
+        fp = int(keep.sum()) - tp
+        fn = num_gt - tp
+        precision = tp / np.maximum(tp + fp, 1)
+        recall = tp / num_gt if num_gt else np.full(len(tp), np.nan)
+        f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+        return tp, fp, fn, precision, recall, f1
+
+    def summary(self):
+        """
+        Metrics dict: mAP@[.5:.95], AP50, AP75, per-class AP, the per-IoU-threshold
+        breakdown, and operating-point precision/recall at the loosest IoU threshold.
+        """
+        thresholds = [float(t) for t in self.iou_thresholds]
+        per_class = {label: self.average_precision(label) for label in sorted(self.gt_counts)}
+        ap = np.nanmean(np.stack(list(per_class.values())), axis=0) if per_class \
+            else np.full(len(thresholds), np.nan)
+        tp, fp, fn, precision, recall, f1 = self.operating_point(self.score_threshold)
+
+        def at(iou):
+            return float(ap[thresholds.index(iou)]) if iou in thresholds else float("nan")
+
+        return {
+            "mAP": float(np.nanmean(ap)) if per_class else float("nan"),
+            "AP50": at(0.5),
+            "AP75": at(0.75),
+            "precision": float(precision[0]),
+            "recall": float(recall[0]),
+            "f1": float(f1[0]),
+            "score_threshold": self.score_threshold,
+            "images": self.images,
+            "detections": self.size,
+            "ground_truth": sum(self.gt_counts.values()),
+            "per_class_AP": {str(label): float(np.nanmean(values)) for label, values in per_class.items()},
+            "per_iou": [
+                {"iou": iou, "AP": float(ap[t]), "tp": int(tp[t]), "fp": int(fp[t]), "fn": int(fn[t]),
+                 "precision": float(precision[t]), "recall": float(recall[t]), "f1": float(f1[t])}
+                for t, iou in enumerate(thresholds)
+            ],
+        }
+
+
+def evaluate(predictions, targets, iou_thresholds=COCO_IOU_THRESHOLDS, score_threshold:float=0.5):
+    evaluator = DetectionEvaluator(iou_thresholds, score_threshold)
+    evaluator.add_batch(predictions, targets)
+    return evaluator
+
+
+def average_precision(predictions, targets, iou_threshold:float=0.5):
+    """
+    Single-threshold, 101-point interpolated average precision.
+
+    Args:
+        predictions (list): Per-image dicts with NumPy `boxes` and `scores`.
+        targets (list): Per-image dicts with NumPy ground-truth `boxes`.
+        iou_threshold (float): Minimum IoU for a detection to count as a match.
+    """
+    return evaluate(predictions, targets, [iou_threshold]).summary()["mAP"]
+
+
+def mean_average_precision(predictions, targets, iou_thresholds=COCO_IOU_THRESHOLDS):
+    """
+    COCO-style AP averaged over IoU thresholds, plus AP@0.5.
+    """
+    summary = evaluate(predictions, targets, iou_thresholds).summary()
+    return {"mAP": summary["mAP"], "AP50": summary["AP50"]}
+
+
+def recall_at(predictions, targets, score_threshold:float, iou_threshold:float=0.5):
+    """
+    Fraction of ground-truth boxes matched by a detection scoring above `score_threshold`.
+    """
+    return evaluate(predictions, targets, [iou_threshold], score_threshold).summary()["recall"]
@@ -1,6 +1,11 @@
 import torch
 from torch.optim import Adam
-from torchvision.models.detection import fasterrcnn_resnet50_fpn
+from torchvision.models.detection import (
+    fasterrcnn_resnet50_fpn,
+    fasterrcnn_resnet50_fpn_v2,
+    fasterrcnn_mobilenet_v3_large_fpn,
+    fasterrcnn_mobilenet_v3_large_320_fpn,
+)
 from torchvision.models.detection.faster_rcnn import FastRCNNPredictor
 from tqdm import tqdm
 from src.logger import get_logger
@@ -9,21 +14,65 @@ from src.data_processing import GunDataset
 
 logger = get_logger(__name__)
 
+## Selectable Faster R-CNN backbones, from most accurate to fastest on CPU
+BACKBONES = {
+    "resnet50_fpn": fasterrcnn_resnet50_fpn,
+    "resnet50_fpn_v2": fasterrcnn_resnet50_fpn_v2,
+    "mobilenet_v3_large_fpn": fasterrcnn_mobilenet_v3_large_fpn,
+    "mobilenet_v3_large_320_fpn": fasterrcnn_mobilenet_v3_large_320_fpn,
+}
+DEFAULT_BACKBONE = "resnet50_fpn"
+
+def load_weights(path:str, map_location="cpu"):
+    """
+    Load a state_dict, memory-mapping the file so tensors are paged in on use rather than copied up front.
+
+    Falls back to a regular load for files in the legacy (non-zip) serialization format.
+    """
+    try:
+        return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+    except (RuntimeError, TypeError) as e:
+        # Re-saving the state_dict with a current torch.save makes the file mappable
+        logger.info(f"Memory-mapped load of {path} unavailable ({e}), loading a private copy")
+        return torch.load(path, map_location=map_location, weights_only=True)
+
+def model_filename(backbone:str=DEFAULT_BACKBONE):
+    """
+    Weights file name for a backbone, so variants can be trained and saved side by side.
+    """
+    if backbone == DEFAULT_BACKBONE:
+        return "fasterrcnn.pth"
+    return f"fasterrcnn_{backbone}.pth"
+
 class FasterRCNNModel:
 
-    def __init__(self, num_classes, device):
+    def __init__(self, num_classes, device, backbone=DEFAULT_BACKBONE, min_size=None, max_size=None, pretrained=True):
+        # min_size/max_size bound the model's internal resize; None keeps the backbone default.
+        # pretrained=False builds the bare architecture for inference, where trained weights are loaded over it
+        # anyway, so no COCO weights are downloaded or read.
+        if backbone not in BACKBONES:
+            raise ValueError(f"Unknown backbone: {backbone}, expected one of {list(BACKBONES)}")
         self.num_classes = num_classes
         self.device = device
+        self.backbone = backbone
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pretrained = pretrained
         self.optimizer = None
         self.model = self.create_model().to(self.device)
         logger.info("Initializing Faster R-CNN Model Architecture")
 
     def create_model(self):
         try:
-            model = fasterrcnn_resnet50_fpn(pretrained=True)
-            in_features = model.roi_heads.box_predictor.cls_score.in_features
-            model.roi_heads.box_predictor = FastRCNNPredictor(in_features, self.num_classes)    
-            logger.info("Model architecture created successfully")
+            size_kwargs = {key: value for key, value in (("min_size", self.min_size), ("max_size", self.max_size)) if value}
+            if self.pretrained:
+                model = BACKBONES[self.backbone](pretrained=True, **size_kwargs)
+                in_features = model.roi_heads.box_predictor.cls_score.in_features
+                model.roi_heads.box_predictor = FastRCNNPredictor(in_features, self.num_classes)    
+            else:
+                model = BACKBONES[self.backbone](weights=None, weights_backbone=None, num_classes=self.num_classes,
+                                                 **size_kwargs)
+            logger.info(f"Model architecture created successfully ({self.backbone}, min_size={model.transform.min_size}, max_size={model.transform.max_size})")
             return model
         
         except Exception as e:
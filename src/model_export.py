@@ -0,0 +1,272 @@
+import os
+import sys
+import copy
+import torch
+from torch import nn
+from torchvision.ops.misc import FrozenBatchNorm2d
+from src.model_architecture import FasterRCNNModel, load_weights
+from src.data_processing import GunDataset, train_val_split
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+## Exported artifact for each non-eager inference engine, relative to the export directory
+ENGINE_FILES = {
+    "torchscript": "fasterrcnn_scripted.pt",
+    "onnx": "fasterrcnn.onnx",
+    "dynamic_int8": "fasterrcnn_dynamic_int8.pt",
+    "static_int8": "fasterrcnn_static_int8.pt",
+}
+ENGINES = ("eager", *ENGINE_FILES)
+
+
+def fold_batchnorm(module: nn.Module):
+    """
+    Fold every frozen or eval-mode batch norm into the convolution feeding it, in place.
+
+    Detectors built from pretrained weights use FrozenBatchNorm2d; the bare
+    architecture the exporter loads trained weights into (pretrained=False)
+    uses BatchNorm2d, which is folded once the model is in eval mode.
+    Handles the conv{i}/bn{i} pairs of ResNet stems and bottlenecks and the
+    (conv, bn) downsample branches; folded norms become nn.Identity.
+    """
+    @torch.no_grad()
+    def fold(conv: nn.Conv2d, bn):
+        weight = bn.weight if bn.weight is not None else torch.ones_like(bn.running_var)
+        bias = bn.bias if bn.bias is not None else torch.zeros_like(bn.running_mean)
+        scale = weight * torch.rsqrt(bn.running_var + bn.eps)
+        conv.weight.data.mul_(scale.reshape(-1, 1, 1, 1))
+        conv_bias = conv.bias.data if conv.bias is not None else torch.zeros_like(bias)
+        conv.bias = nn.Parameter((conv_bias - bn.running_mean) * scale + bias)
+
+    def foldable(bn):
+        # A BatchNorm2d in training mode, or without running statistics, normalizes with batch statistics
+        return isinstance(bn, FrozenBatchNorm2d) or \
+            (isinstance(bn, nn.BatchNorm2d) and not bn.training and bn.running_mean is not None)
+
+    for parent in list(module.modules()):
+        for name, child in list(parent.named_children()):
+            if name.startswith("bn") and foldable(child):
+                conv = getattr(parent, "conv" + name[2:], None)
+                if isinstance(conv, nn.Conv2d):
+                    fold(conv, child)
+                    setattr(parent, name, nn.Identity())
+        if isinstance(parent, nn.Sequential) and len(parent) == 2 \
+                and isinstance(parent[0], nn.Conv2d) and foldable(parent[1]):
+            fold(parent[0], parent[1])
+            parent[1] = nn.Identity()
+    return module
+
+
+def strip_identities(graph_module):
+    """
+    Remove nn.Identity calls from an FX graph so conv + relu pairs can be fused.
+    """
+    for node in list(graph_module.graph.nodes):
+        if node.op == "call_module" and isinstance(graph_module.get_submodule(node.target), nn.Identity):
+            node.replace_all_uses_with(node.args[0])
+            graph_module.graph.erase_node(node)
+    graph_module.graph.lint()
+    graph_module.recompile()
+    return graph_module
+
+
+class ModelExporter:
+    """
+    Produces optimized CPU inference variants of a trained FasterRCNNModel.
+
+    - torchscript: `torch.jit.script` of the full detector.
+    - onnx: ONNX export (opset 11) for onnxruntime.
+    - dynamic_int8: int8 dynamic quantization of the Linear box head.
+    - static_int8: int8 static (FX graph mode) quantization of the ResNet body,
+      calibrated on GunDataset training images, plus the dynamic int8 head.
+    """
+
+    def __init__(self, model_path:str, num_classes:int, export_dir:str, dataset_path:str="artifacts/raw", **model_kwargs):
+        self.model_path = model_path
+        self.num_classes = num_classes
+        self.export_dir = export_dir
+        self.dataset_path = dataset_path
+        self.model_kwargs = model_kwargs
+        os.makedirs(self.export_dir, exist_ok=True)
+
+    def load_model(self):
+        model = FasterRCNNModel(num_classes=self.num_classes, device="cpu", pretrained=False, **self.model_kwargs).model
+        model.load_state_dict(load_weights(self.model_path))
+        model.eval()
+        return model
+
+    def path_for(self, engine:str):
+        return os.path.join(self.export_dir, ENGINE_FILES[engine])
+
+    def export_torchscript(self):
+        try:
+            scripted = torch.jit.script(self.load_model())
+            scripted.save(self.path_for("torchscript"))
+            logger.info(f"TorchScript model saved at {self.path_for('torchscript')}")
+        except Exception as e:
+            logger.error(f"Error exporting TorchScript model: {e}")
+            raise CustomException(f"TorchScript export failed: {e}", sys)
+
+    def export_onnx(self, sample_size=(480, 640)):
+        try:
+            model = self.load_model()
+            sample = [torch.rand(3, *sample_size)]
+            torch.onnx.export(
+                model, (sample,), self.path_for("onnx"),
+                opset_version=11,
+                input_names=["images"],
+                output_names=["boxes", "labels", "scores"],
+                dynamic_axes={"images": {1: "height", 2: "width"}, "boxes": {0: "detections"},
+                              "labels": {0: "detections"}, "scores": {0: "detections"}},
+            )
+            logger.info(f"ONNX model saved at {self.path_for('onnx')}")
+        except Exception as e:
+            logger.error(f"Error exporting ONNX model: {e}")
+            raise CustomException(f"ONNX export failed: {e}", sys)
+
+    @staticmethod
+    def quantize_head(model):
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+    def export_dynamic_int8(self):
+        try:
+            model = self.quantize_head(self.load_model())
+            torch.save(model, self.path_for("dynamic_int8"))
+            logger.info(f"Dynamic int8 model saved at {self.path_for('dynamic_int8')}")
+        except Exception as e:
+            logger.error(f"Error exporting dynamic int8 model: {e}")
+            raise CustomException(f"Dynamic quantization failed: {e}", sys)
+
+    def calibration_images(self, num_images:int):
+        dataset = GunDataset(self.dataset_path)
+        train_dataset, _ = train_val_split(dataset)
+        for i in range(min(num_images, len(train_dataset))):
+            yield train_dataset[i][0]
+
+    def export_static_int8(self, num_calibration_images:int=32):
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+        try:
+            torch.backends.quantized.engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+            model = self.load_model()
+
+            body = fold_batchnorm(copy.deepcopy(model.backbone.body))
+            body = strip_identities(torch.fx.symbolic_trace(body))
+            qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+            model.backbone.body = prepare_fx(body.eval(), qconfig_mapping, example_inputs=(torch.rand(1, 3, 224, 224),))
+
+            # Observers record activation ranges while the whole detector runs on real images
+            with torch.no_grad():
+                for image in self.calibration_images(num_calibration_images):
+                    model([image])
+            logger.info(f"Calibrated static quantization on {num_calibration_images} images")
+
+            model.backbone.body = convert_fx(model.backbone.body)
+            model = self.quantize_head(model)
+            torch.save(model, self.path_for("static_int8"))
+            logger.info(f"Static int8 model saved at {self.path_for('static_int8')}")
+        except Exception as e:
+            logger.error(f"Error exporting static int8 model: {e}")
+            raise CustomException(f"Static quantization failed: {e}", sys)
+
+    def run(self, engines=tuple(ENGINE_FILES)):
+        exporters = {
+            "torchscript": self.export_torchscript,
+            "onnx": self.export_onnx,
+            "dynamic_int8": self.export_dynamic_int8,
+            "static_int8": self.export_static_int8,
+        }
+        for engine in engines:
+            exporters[engine]()
+        logger.info("Model export completed successfully.")
+
+
+class OnnxDetector:
+    """
+    onnxruntime session with the call signature of the torchvision detector.
+    """
+
+    def __init__(self, path:str, num_threads:int=0):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, images):
+        outputs = []
+        # The exported graph takes one image per run
+        for image in images:
+            boxes, labels, scores = self.session.run(None, {"images": image.cpu().numpy()})
+            outputs.append({
+                "boxes": torch.from_numpy(boxes),
+                "labels": torch.from_numpy(labels),
+                "scores": torch.from_numpy(scores),
+            })
+        return outputs
+
+
+class ScriptedDetector:
+    """
+    Unwraps the (losses, detections) tuple scripted detection models return.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    @property
+    def transform(self):
+        return self.module.transform
+
+    def __call__(self, images):
+        return self.module(images)[1]
+
+
+def load_inference_model(engine:str, model_path:str, num_classes:int, device, export_dir:str, shared_weights:bool=False,
+                         **model_kwargs):
+    """
+    Load the detector for `engine`; all engines are called as `model(list_of_image_tensors)`.
+
+    `model_kwargs` (backbone, min_size, max_size) only apply to the eager engine;
+    exported engines keep the architecture they were exported with. With
+    `shared_weights` the eager model's parameters stay views of the
+    memory-mapped weights file instead of private copies, so every process
+    serving the same file shares one copy of the weights in the page cache.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {engine}")
+
+    if engine == "eager":
+        model = FasterRCNNModel(num_classes=num_classes, device=device, pretrained=False, **model_kwargs).model
+        # Assigning only shares memory on CPU; on an accelerator the weights are copied to the device anyway
+        assign = shared_weights and torch.device(device).type == "cpu"
+        model.load_state_dict(load_weights(model_path, map_location=device), assign=assign)
+        model.requires_grad_(False)
+        model.eval()
+        return model.to(device)
+
+    path = os.path.join(export_dir, ENGINE_FILES[engine])
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No exported {engine} model at {path}, run `python -m src.model_export` first")
+
+    if engine == "torchscript":
+        return ScriptedDetector(torch.jit.load(path, map_location=device).eval())
+    if engine == "onnx":
+        return OnnxDetector(path, num_threads=torch.get_num_threads())
+
+    # Quantized kernels only run on CPU
+    torch.backends.quantized.engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    return torch.load(path, map_location="cpu", weights_only=False).eval()
+
+
+if __name__ == "__main__":
+    from config.inference_config import MODEL_PATH, NUM_CLASSES, EXPORT_DIR, BACKBONE, MODEL_MIN_SIZE, MODEL_MAX_SIZE
+
+    engines = sys.argv[1:] or tuple(ENGINE_FILES)
+    exporter = ModelExporter(MODEL_PATH, NUM_CLASSES, EXPORT_DIR,
+                             backbone=BACKBONE, min_size=MODEL_MIN_SIZE, max_size=MODEL_MAX_SIZE)
+    exporter.run(engines)
@@ -1,13 +1,22 @@
 import os
 import sys
+import random
+import contextlib
+import numpy as np
 import torch
-from torch.utils.data import DataLoader, random_split
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader
 from torch import optim 
-from src.model_architecture import FasterRCNNModel
-from src.data_processing import GunDataset
+from src.model_architecture import FasterRCNNModel, DEFAULT_BACKBONE, model_filename
+from src.data_processing import GunDataset, train_val_split, to_float_images, collate_batch
+from src.samplers import AspectRatioBatchSampler, dataset_image_sizes
+from src.metrics import DetectionEvaluator
 from src.logger import get_logger
 from src.custom_exception import CustomException
 from torch.utils.tensorboard import SummaryWriter
+from config.training_config import *
+import json
 import time
 
 logger = get_logger(__name__)
@@ -18,66 +27,279 @@ os.makedirs(model_save_path, exist_ok=True)
 
 class ModelTraining:
     
-    def __init__(self, model_class, num_classes, learning_rate, epochs, dataset_path, device):
+    def __init__(self, model_class, num_classes, learning_rate, epochs, dataset_path, device,
+                 backbone=DEFAULT_BACKBONE, min_size=None, max_size=None, packed_dir=None,
+                 batch_size=3, num_workers=0, pin_memory=True, persistent_workers=True, prefetch_factor=2,
+                 group_by_aspect_ratio=True, amp=False, amp_dtype="bfloat16", grad_accum_steps=1,
+                 compile_model=False, checkpoint_dir="artifacts/checkpoints", checkpoint_every=0, resume=True,
+                 distributed=False, dist_backend="gloo", threads_per_process=0,
+                 eval_dir="artifacts/evaluation", eval_score_threshold=0.7):
         self.model_class = model_class
         self.num_classes = num_classes
         self.learning_rate = learning_rate
         self.epochs = epochs
         self.dataset_path = dataset_path
-        self.device = device
+        self.device = torch.device(device)
+        self.backbone = backbone
+        self.packed_dir = packed_dir
 
-        ## Tracking with TensorBoard
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        self.log_directory = f"tensorboard_logs/{timestamp}"
-        os.makedirs(self.log_directory, exist_ok=True)
+        ## DataLoader pipeline
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.pin_memory = pin_memory and self.device.type == "cuda"
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
+        self.group_by_aspect_ratio = group_by_aspect_ratio
 
-        self.writer = SummaryWriter(log_dir=self.log_directory)
+        ## Mixed precision, gradient accumulation and checkpointing
+        self.amp = amp
+        self.amp_dtype = getattr(torch, amp_dtype)
+        self.grad_accum_steps = max(1, grad_accum_steps)
+        self.checkpoint_dir = checkpoint_dir
+        # Checkpoints are only taken on optimizer-step boundaries, so no accumulated gradient is lost
+        self.checkpoint_every = -(-checkpoint_every // self.grad_accum_steps) * self.grad_accum_steps
+        self.resume = resume
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        ## Validation metrics
+        self.eval_dir = eval_dir
+        self.eval_score_threshold = eval_score_threshold
+
+        ## Distributed data parallel, one process per rank as launched by torchrun
+        self.distributed = distributed
+        self.rank, self.world_size = 0, 1
+        if self.distributed:
+            self.setup_distributed(dist_backend, threads_per_process)
+        self.is_main = self.rank == 0
+
+        ## Tracking with TensorBoard, from rank 0 only
+        self.writer = None
+        if self.is_main:
+            timestamp = time.strftime("%Y%m%d-%H%M%S")
+            self.log_directory = f"tensorboard_logs/{timestamp}"
+            os.makedirs(self.log_directory, exist_ok=True)
+
+            self.writer = SummaryWriter(log_dir=self.log_directory)
 
         try:
-            self.model = self.model_class(self.num_classes,self.device).model
+            self.model = self.model_class(self.num_classes,self.device, backbone=backbone, min_size=min_size, max_size=max_size).model
             self.model.to(self.device)
-            logger.info(f"Model initialized: {self.model_class.__name__} with {self.num_classes} classes.")
+            logger.info(f"Model initialized: {self.model_class.__name__} ({backbone}) with {self.num_classes} classes.")
 
             self.optimizer = optim.Adam(self.model.parameters(), lr=self.learning_rate)
             logger.info(f"Optimizer initialized with learning rate: {self.learning_rate}")
+
+            # float16 needs loss scaling; bfloat16 (the CPU autocast type) does not
+            self.scaler = torch.cuda.amp.GradScaler(
+                enabled=self.amp and self.device.type == "cuda" and self.amp_dtype == torch.float16
+            )
+
+            # The DDP and compiled wrappers share parameters with self.model, which stays the one saved
+            self.ddp_model = None
+            self.train_model = self.model
+            if self.distributed:
+                device_ids = [self.device.index] if self.device.type == "cuda" else None
+                self.ddp_model = self.train_model = DistributedDataParallel(self.model, device_ids=device_ids)
+            if compile_model:
+                self.train_model = torch.compile(self.train_model)
+                logger.info("Model compiled with torch.compile for training")
         
         except Exception as e:
             logger.error(f"Error initializing model training: {str(e)}")
             raise CustomException(f"Model initialization failed: {str(e)}", sys)
         
-    def collate_fn(self,batch):
-        return tuple(zip(*batch))
+    def setup_distributed(self, backend, threads_per_process):
+        """
+        Join the process group described by the torchrun environment
+        (MASTER_ADDR, MASTER_PORT, RANK, WORLD_SIZE, LOCAL_RANK).
+        """
+        if not dist.is_initialized():
+            dist.init_process_group(backend=backend)
+        self.rank = dist.get_rank()
+        self.world_size = dist.get_world_size()
+
+        if self.device.type == "cuda":
+            self.device = torch.device("cuda", int(os.environ.get("LOCAL_RANK", 0)))
+            torch.cuda.set_device(self.device)
+        else:
+            # torchrun pins every rank to one thread; share the host's cores between the local ranks instead
+            local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+            torch.set_num_threads(threads_per_process or max(1, (os.cpu_count() or 1) // local_world_size))
+
+        logger.info(f"Joined {backend} process group as rank {self.rank} of {self.world_size} "
+                    f"on {self.device} with {torch.get_num_threads()} threads")
+
+    # A plain function, so worker processes never have to pickle the trainer
+    collate_fn = staticmethod(collate_batch)
+
+    def make_loader(self, dataset, shuffle, pad=True):
+        """
+        DataLoader over `dataset`, batching images of similar shape together when
+        `group_by_aspect_ratio` so little compute is spent on padding. `pad=False`
+        keeps ranks from repeating batches, so each image is evaluated once.
+        """
+        options = dict(num_workers=self.num_workers, pin_memory=self.pin_memory, collate_fn=self.collate_fn)
+        if self.num_workers > 0:
+            options.update(persistent_workers=self.persistent_workers, prefetch_factor=self.prefetch_factor)
+
+        sizes = dataset_image_sizes(dataset) if self.group_by_aspect_ratio else [(1, 1)] * len(dataset)
+        grouping = {} if self.group_by_aspect_ratio else dict(aspect_bins=(), size_bins=1)
+        # Always a resumable batch sampler, so a checkpoint can record the position within the epoch
+        sampler = AspectRatioBatchSampler(sizes, self.batch_size, shuffle=shuffle,
+                                          num_replicas=self.world_size, rank=self.rank, pad=pad, **grouping)
+        return DataLoader(dataset, batch_sampler=sampler, **options)
+
+    def to_device(self, images, targets):
+        """
+        Move a batch to the training device with non-blocking copies, converting
+        packed uint8 images to float only after the (4x smaller) transfer.
+        """
+        images = to_float_images([img.to(self.device, non_blocking=True) for img in images])
+        targets = [{key: val.to(self.device, non_blocking=True) for key, val in target.items()} for target in targets]
+        return images, targets
     
     def split_dataset(self):
         try:
-            dataset = GunDataset(self.dataset_path, self.device)
-            dataset = torch.utils.data.Subset(dataset, range(300)) # For Local Testing Purposes
+            dataset = GunDataset(self.dataset_path, packed_dir=self.packed_dir)
 
-            train_size = int(0.8 * len(dataset))
-            val_size = len(dataset) - train_size
-            train_dataset, val_dataset = random_split(dataset, [train_size, val_size])
+            train_dataset, val_dataset = train_val_split(dataset, val_fraction=0.2)
 
-            train_loader = DataLoader(train_dataset, batch_size = 3, shuffle=True, num_workers=0, collate_fn = self.collate_fn)
-            val_loader = DataLoader(val_dataset, batch_size = 3, shuffle=False, num_workers=0, collate_fn = self.collate_fn)
+            train_loader = self.make_loader(train_dataset, shuffle=True)
+            val_loader = self.make_loader(val_dataset, shuffle=False, pad=False)
 
-            logger.info(f"Dataset split into {len(train_dataset)} training and {len(val_dataset)} validation samples.")
+            logger.info(f"Dataset split into {len(train_dataset)} training and {len(val_dataset)} validation samples, "
+                        f"{len(train_loader)} training batches per rank.")
+            logger.info(f"DataLoader: batch_size={self.batch_size}, num_workers={self.num_workers}, "
+                        f"pin_memory={self.pin_memory}, group_by_aspect_ratio={self.group_by_aspect_ratio}")
             return train_loader, val_loader
         
         except Exception as e:
             logger.error(f"Error splitting dataset: {str(e)}")
             raise CustomException(f"Dataset splitting failed: {str(e)}", sys)
     
+    def autocast(self):
+        return torch.autocast(device_type=self.device.type, dtype=self.amp_dtype, enabled=self.amp)
+
+    def save_checkpoint(self, epoch, step, global_step):
+        """
+        Save everything needed to resume exactly: weights, optimizer, scaler,
+        position in the epoch and every RNG state. Written atomically to
+        `latest.pt` so a preemption mid-write never corrupts the last checkpoint.
+        Only rank 0 writes; every rank holds the same weights.
+        """
+        if not self.is_main:
+            return
+
+        checkpoint = {
+            "model": self.model.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scaler": self.scaler.state_dict(),
+            "epoch": epoch,
+            "step": step,
+            "global_step": global_step,
+            "backbone": self.backbone,
+            "rng": {
+                "torch": torch.get_rng_state(),
+                "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else [],
+                "numpy": np.random.get_state(),
+                "python": random.getstate(),
+            },
+        }
+        path = os.path.join(self.checkpoint_dir, "latest.pt")
+        torch.save(checkpoint, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        logger.info(f"Checkpoint saved at epoch {epoch}, step {step}")
+
+    def load_checkpoint(self):
+        """
+        Restore the latest checkpoint if there is one; returns (epoch, step, global_step).
+        """
+        path = os.path.join(self.checkpoint_dir, "latest.pt")
+        if not os.path.exists(path):
+            return 0, 0, 0
+
+        checkpoint = torch.load(path, map_location=self.device, weights_only=False)
+        if checkpoint.get("backbone", self.backbone) != self.backbone:
+            raise ValueError(f"Checkpoint at {path} is for backbone {checkpoint['backbone']}, not {self.backbone}")
+
+        self.model.load_state_dict(checkpoint["model"])
+        self.optimizer.load_state_dict(checkpoint["optimizer"])
+        self.scaler.load_state_dict(checkpoint["scaler"])
+        rng = checkpoint["rng"]
+        torch.set_rng_state(rng["torch"].cpu())
+        if rng["cuda"] and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all([state.cpu() for state in rng["cuda"]])
+        np.random.set_state(rng["numpy"])
+        random.setstate(rng["python"])
+
+        logger.info(f"Resumed from {path} at epoch {checkpoint['epoch']}, step {checkpoint['step']}")
+        return checkpoint["epoch"], checkpoint["step"], checkpoint["global_step"]
+
+    def evaluate(self, val_loader, epoch):
+        """
+        COCO-style mAP, precision and recall of the model on the validation split.
+
+        Every rank scores its own shard; the accumulated matches are gathered on
+        rank 0, which logs the metrics to TensorBoard and writes a JSON report.
+        """
+        # Models other than the detector (e.g. the gate classifier in src.gating) bring their own evaluator
+        make_evaluator = getattr(self.model_class, "evaluator", None)
+        evaluator = make_evaluator() if make_evaluator else DetectionEvaluator(score_threshold=self.eval_score_threshold)
+        self.model.eval()
+        with torch.no_grad():
+            for images, targets in val_loader:
+                images = to_float_images([img.to(self.device, non_blocking=True) for img in images])
+                with self.autocast():
+                    outputs = self.model(images)
+                evaluator.add_batch(
+                    [{key: value.float().cpu().numpy() for key, value in output.items()} for output in outputs],
+                    [{key: value.numpy() for key, value in target.items()} for target in targets],
+                )
+
+        if self.distributed:
+            states = [None] * self.world_size
+            dist.all_gather_object(states, evaluator.state())
+            for rank, state in enumerate(states):
+                if rank != self.rank:
+                    evaluator.merge(state)
+        if not self.is_main:
+            return None
+
+        summary = evaluator.summary()
+        for key in evaluator.headline:
+            self.writer.add_scalar(f"Val/{key}", summary[key], epoch)
+        self.writer.flush()
+
+        os.makedirs(self.eval_dir, exist_ok=True)
+        report_path = os.path.join(self.eval_dir, f"epoch_{epoch}.json")
+        with open(report_path, "w") as f:
+            json.dump({"epoch": epoch, "backbone": self.backbone, **summary}, f, indent=2)
+
+        metrics = " ".join(f"{key}={summary[key]:.4f}" for key in evaluator.headline)
+        logger.info(f"Epoch {epoch} validation: {metrics} on {summary['images']} images, report at {report_path}")
+        return summary
+
     def train(self):
         try:
             train_loader, val_loader = self.split_dataset()
+            start_epoch, start_step, global_step = self.load_checkpoint() if self.resume else (0, 0, 0)
 
-            for epoch in range(self.epochs):
+            for epoch in range(start_epoch, self.epochs):
                 logger.info(f"Starting epoch {epoch}")
                 self.model.train()
+                first_batch = start_step if epoch == start_epoch else 0
+                train_loader.batch_sampler.set_epoch(epoch, start_batch=first_batch)
+                self.optimizer.zero_grad()
+
+                for i, (images,targets) in enumerate(train_loader, start=first_batch):
+                    images, targets = self.to_device(images, targets)
+                    step_now = (i + 1) % self.grad_accum_steps == 0 or i + 1 == len(train_loader)
 
-                for i, (images,targets) in enumerate(train_loader):
-                    self.optimizer.zero_grad()
-                    losses = self.model(images, targets)
+                    # Gradients are only all-reduced on the batch that steps the optimizer
+                    skip_sync = self.ddp_model is not None and not step_now
+                    with self.ddp_model.no_sync() if skip_sync else contextlib.nullcontext():
+                        with self.autocast():
+                            losses = self.train_model(images, targets)
 
                     if isinstance(losses, dict):
                         total_loss = 0
@@ -88,40 +310,75 @@ class ModelTraining:
                             logger.error("There was error in losses capturing")
                             raise ValueError("Total value is zero........")
 
-                        self.writer.add_scalar('Loss/train', total_loss.item(), epoch * len(train_loader) + i)
+                        if self.writer is not None:
+                            self.writer.add_scalar('Loss/train', total_loss.item(), global_step)
                     
                     else:
                         total_loss=losses[0]
                     
-                    total_loss.backward()
-                    self.optimizer.step()
+                    self.scaler.scale(total_loss / self.grad_accum_steps).backward()
+                    global_step += 1
+
+                    if step_now:
+                        self.scaler.step(self.optimizer)
+                        self.scaler.update()
+                        self.optimizer.zero_grad()
+
+                        if self.checkpoint_every and (i + 1) % self.checkpoint_every == 0:
+                            self.save_checkpoint(epoch, i + 1, global_step)
                 
-                self.writer.flush()
+                if self.writer is not None:
+                    self.writer.flush()
 
-                self.model.eval()
-                with torch.no_grad():
-                    for images,targets in val_loader:
-                        val_losses = self.model(images, targets)
-                        logger.info(type(val_losses))
-                        logger.info(f"VAL Losses: {val_losses}")
+                self.evaluate(val_loader, epoch)
 
-                    model_path = os.path.join(model_save_path, "fasterrcnn.pth")
+                if self.is_main:
+                    filename = getattr(self.model_class, "model_filename", model_filename)
+                    model_path = os.path.join(model_save_path, filename(self.backbone))
                     torch.save(self.model.state_dict(), model_path)
                     logger.info(f"Model saved successfully at {model_path}")
+
+                self.save_checkpoint(epoch + 1, 0, global_step)
         
         except Exception as e:
             logger.error(f"Error during training: {str(e)}")
             raise CustomException(f"Training failed: {str(e)}", sys)
         
 if __name__ == "__main__":
+    # Single process: `python -m src.model_training [backbone]`
+    # Distributed:    `torchrun --nnodes 1 --nproc_per_node 4 -m src.model_training [backbone]`
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     training = ModelTraining(
         model_class=FasterRCNNModel,
-        num_classes=2,  # Adjust based on your dataset
-        learning_rate=0.001,
-        epochs=1,  # Adjust based on your needs
-        dataset_path="artifacts/raw/",  # Adjust to your dataset path
-        device=device
+        num_classes=NUM_CLASSES,
+        learning_rate=LEARNING_RATE,
+        epochs=EPOCHS,
+        dataset_path=DATASET_PATH,
+        device=device,
+        backbone=sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BACKBONE,  # e.g. mobilenet_v3_large_fpn
+        packed_dir=PACKED_DIR,
+        batch_size=BATCH_SIZE,
+        num_workers=NUM_WORKERS,
+        pin_memory=PIN_MEMORY,
+        persistent_workers=PERSISTENT_WORKERS,
+        prefetch_factor=PREFETCH_FACTOR,
+        group_by_aspect_ratio=GROUP_BY_ASPECT_RATIO,
+        amp=AMP,
+        amp_dtype=AMP_DTYPE,
+        grad_accum_steps=GRAD_ACCUM_STEPS,
+        compile_model=COMPILE_MODEL,
+        checkpoint_dir=CHECKPOINT_DIR,
+        checkpoint_every=CHECKPOINT_EVERY,
+        resume=RESUME,
+        distributed=int(os.environ.get("WORLD_SIZE", 1)) > 1,
+        dist_backend=DIST_BACKEND,
+        threads_per_process=THREADS_PER_PROCESS,
+        eval_dir=EVAL_DIR,
+        eval_score_threshold=EVAL_SCORE_THRESHOLD,
     )
-    training.train()
-    logger.info("Model training completed successfully.")
\ No newline at end of file
+    try:
+        training.train()
+        logger.info("Model training completed successfully.")
+    finally:
+        if dist.is_initialized():
+            dist.destroy_process_group()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import sys
+import copy
+import time
+import torch
+from PIL import Image
+from src.model_export import load_inference_model
+from src.image_decode import image_to_tensor
+from src.tiling import TiledPredictor
+from src.gating import CascadePredictor, create_gate, load_threshold
+from src.telemetry import timed, instrument_detector
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+class Predictor:
+    """
+    Inference wrapper around a trained FasterRCNNModel.
+
+    Loads the trained weights once and runs batches of PIL images through the
+    detector, returning plain NumPy detections so results can cross thread and
+    process boundaries cheaply. `engine` selects the eager model or one of the
+    optimized variants written by `src.model_export`.
+
+    With `predownscale`, images larger than the model's internal resize target
+    are shrunk with PIL before tensor conversion and the boxes are mapped back
+    to the original resolution, so huge uploads never become huge tensors.
+
+    `shared_weights` keeps the eager model's weights memory-mapped from the
+    weights file, so uvicorn or pool workers share them instead of each
+    holding a private copy.
+
+    Every batch records preprocess / forward / postprocess stage timings, and
+    with `instrument` the eager model's internal stages are timed by hooks.
+    Passing an already built detector as `model` wraps it instead of loading
+    `model_path`, e.g. to benchmark untrained weights through the same path.
+    """
+
+    def __init__(self, model_path:str, num_classes:int, device="cpu", engine:str="eager", export_dir:str=None,
+                 backbone:str="resnet50_fpn", min_size:int=None, max_size:int=None, predownscale:bool=True,
+                 instrument:bool=False, shared_weights:bool=False, model=None):
+        self.model_path = model_path
+        self.num_classes = num_classes
+        self.engine = engine
+        self.predownscale = predownscale
+        # Only the eager and TorchScript engines can run off the CPU
+        self.device = torch.device(device) if engine in ("eager", "torchscript") else torch.device("cpu")
+
+        try:
+            start = time.perf_counter()
+            self.model = model.to(self.device).eval() if model is not None else \
+                load_inference_model(engine, model_path, num_classes, self.device, export_dir,
+                                     shared_weights=shared_weights,
+                                     backbone=backbone, min_size=min_size, max_size=max_size)
+            self.load_seconds = time.perf_counter() - start
+            logger.info(f"Loaded {engine} inference model on {self.device} in {self.load_seconds:.2f}s")
+
+            if instrument:
+                stages = instrument_detector(self.model)
+                logger.info(f"Instrumented {stages} model stages with timing hooks")
+
+        except Exception as e:
+            logger.error(f"Error loading inference model: {e}")
+            raise CustomException(f"Failed to load inference model: {e}", sys)
+
+        # Resize target of the model's own transform, falling back to the torchvision defaults
+        model_transform = getattr(self.model, "transform", None)
+        self.min_size = min_size or (model_transform.min_size[-1] if model_transform is not None else 800)
+        self.max_size = max_size or (model_transform.max_size if model_transform is not None else 1333)
+
+        # uint8 pixels are moved to the device before the float conversion
+        self.transform = image_to_tensor
+
+    def input_size(self, image: Image.Image):
+        """
+        Size the model would resize `image` to, if that is a downscale; otherwise its own size.
+        """
+        width, height = image.size
+        scale = min(self.min_size / min(width, height), self.max_size / max(width, height))
+        if not self.predownscale or scale >= 1.0:
+            return width, height
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def at_input_size(self, min_size:int, max_size:int):
+        """
+        A Predictor sharing this one's model weights, with its own resize target of (min_size, max_size).
+
+        Engines whose resize is compiled into the exported graph (TorchScript,
+        ONNX) cannot change it, so this Predictor is returned unchanged. Those
+        models are wrappers rather than nn.Modules, or expose a scripted transform.
+        """
+        model_transform = getattr(self.model, "transform", None)
+        if not isinstance(self.model, torch.nn.Module) or isinstance(self.model, torch.jit.ScriptModule) \
+                or not isinstance(model_transform, torch.nn.Module) or isinstance(model_transform, torch.jit.ScriptModule):
+            logger.warning(f"The {self.engine} engine has a fixed resize; keeping min_size={self.min_size}, "
+                           f"max_size={self.max_size}")
+            return self
+        # Shallow copies share every submodule, parameter and timing hook; only the resize target differs
+        model_transform = copy.copy(model_transform)
+        model_transform.min_size, model_transform.max_size = (min_size,), max_size
+        model = copy.copy(self.model)
+        model._modules = copy.copy(self.model._modules)
+        model.transform = model_transform
+        view = copy.copy(self)
+        view.model, view.min_size, view.max_size = model, min_size, max_size
+        return view
+
+    def warmup(self, sizes=((640, 480),)):
+        """
+        Run one forward pass per (width, height) so the first real requests do not pay
+        for lazy initialization and allocator growth. Returns the time taken.
+        """
+        start = time.perf_counter()
+        for width, height in sizes:
+            self.predict_batch([Image.new("RGB", (width, height))])
+        seconds = time.perf_counter() - start
+        logger.info(f"Warmed up on {len(sizes)} input size(s) in {seconds:.2f}s")
+        return seconds
+
+    def predict_batch(self, images):
+        """
+        Run the detector on a list of PIL images in a single forward pass.
+        """
+        with timed("preprocess"):
+            inputs, scales = [], []
+            for image in images:
+                size = self.input_size(image)
+                if size != image.size:
+                    image_small = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+                    scales.append(torch.tensor([image.width / size[0], image.height / size[1]] * 2))
+                    image = image_small
+                else:
+                    scales.append(None)
+                inputs.append(image)
+
+            image_tensors = [self.transform(image, self.device) for image in inputs]
+
+        with timed("forward"), torch.no_grad():
+            predictions = self.model(image_tensors)
+
+        with timed("postprocess"):
+            results = []
+            for prediction, scale in zip(predictions, scales):
+                boxes = prediction['boxes'].cpu()
+                if scale is not None:
+                    boxes = boxes * scale
+                results.append({
+                    "boxes": boxes.numpy(),
+                    "labels": prediction['labels'].cpu().numpy(),
+                    "scores": prediction['scores'].cpu().numpy(),
+                })
+        return results
+
+
+## Process-pool workers hold their own model copy, created and warmed up by the pool initializer
+_worker_predictor = None
+_worker_warmup_seconds = 0.0
+_worker_ready_barrier = None
+
+def build_cascade(predictor, detector, gating_options):
+    """
+    Gate `detector` (a Predictor or TiledPredictor) with the gate described by `gating_options`.
+    """
+    options = dict(gating_options)
+    kind, threshold, calibration_path = options.pop("kind"), options.pop("threshold"), options.pop("calibration_path")
+    gate = create_gate(kind, predictor.model, predictor.device, **options)
+    return CascadePredictor(detector, gate, load_threshold(kind, threshold, calibration_path))
+
+def init_worker(model_path:str, num_classes:int, engine:str="eager", export_dir:str=None, model_options=None,
+                tiling_options=None, gating_options=None, warmup_sizes=None, ready_barrier=None, torch_threads:int=0):
+    global _worker_predictor, _worker_warmup_seconds, _worker_ready_barrier
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    predictor = Predictor(model_path, num_classes, device="cpu", engine=engine, export_dir=export_dir,
+                          **(model_options or {}))
+    _worker_predictor = predictor
+    if tiling_options is not None:
+        _worker_predictor = TiledPredictor(_worker_predictor, **tiling_options)
+    if gating_options is not None:
+        _worker_predictor = build_cascade(predictor, _worker_predictor, gating_options)
+    # The initializer runs once per process, before the worker takes any task
+    if warmup_sizes:
+        _worker_warmup_seconds = _worker_predictor.warmup(warmup_sizes)
+    _worker_ready_barrier = ready_barrier
+
+def worker_ready():
+    """
+    Wait until every worker of the pool has loaded and warmed up its model; returns this worker's warmup time.
+
+    A call holds its worker at `ready_barrier` (one party per worker), so one
+    call per worker lands on every process exactly once.
+    """
+    if _worker_predictor is None:
+        raise RuntimeError("Inference worker was not initialized")
+    if _worker_ready_barrier is not None:
+        _worker_ready_barrier.wait()
+    return _worker_warmup_seconds
+
+def predict_in_worker(images):
+    if _worker_predictor is None:
+        raise RuntimeError("Inference worker was not initialized")
+    return _worker_predictor.predict_batch(images)
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def perceptual_hash(image: Image.Image, hash_size:int=8):
+    """
+    Difference hash (dHash) of an image, robust to re-encoding and resizing.
+    """
+    small = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes().hex()
+
+
+def thumbnail(image: Image.Image, size:int=16):
+    """
+    size x size grayscale thumbnail, stored with perceptual entries to confirm a hash match.
+    """
+    return np.asarray(image.convert("L").resize((size, size), Image.BILINEAR), dtype=np.uint8)
+
+
+class MemoryBackend:
+    """
+    In-process LRU store with per-entry expiry.
+    """
+
+    def __init__(self, max_entries:int, ttl:float):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+
+class SQLiteBackend:
+    """
+    LRU store in a SQLite file shared by every worker process on the host.
+
+    Point `path` at a tmpfs such as /dev/shm for a RAM-backed shared cache.
+    """
+
+    def __init__(self, path:str, max_entries:int, ttl:float):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self.connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return self.decode(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, self.encode(value), now + self.ttl, now),
+            )
+            count = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @staticmethod
+    def encode(value):
+        detections, size, *thumb = value
+        data = {
+            "size": list(size),
+            "boxes": detections["boxes"].tolist(),
+            "scores": detections["scores"].tolist(),
+            "labels": detections["labels"].tolist(),
+        }
+        if thumb:
+            data["thumbnail"] = thumb[0].tobytes().hex()
+        return json.dumps(data)
+
+    @staticmethod
+    def decode(text):
+        data = json.loads(text)
+        detections = {
+            "boxes": np.asarray(data["boxes"], dtype=np.float32).reshape(-1, 4),
+            "scores": np.asarray(data["scores"], dtype=np.float32),
+            "labels": np.asarray(data["labels"], dtype=np.int64),
+        }
+        if "thumbnail" in data:
+            thumb = np.frombuffer(bytes.fromhex(data["thumbnail"]), dtype=np.uint8)
+            side = int(round(len(thumb) ** 0.5))
+            return detections, tuple(data["size"]), thumb.reshape(side, side)
+        return detections, tuple(data["size"])
+
+
+class ResultCache:
+    """
+    Caches raw (unthresholded) detections of uploaded images.
+
+    Entries are keyed by a hash of the uploaded bytes and, when `perceptual`
+    is enabled, also by a dHash of the decoded image so re-encoded or resized
+    copies of a frame hit too; perceptual hits are rescaled to the new image
+    size. `namespace` identifies the model so a new model never serves stale
+    results.
+
+    Perceptual matching trades recall for hit rate: an 8x8 dHash ignores
+    small changes, so a frame where a weapon has just appeared can hash like
+    the empty frame before it. The key therefore also holds the aspect ratio,
+    and a hit is only served when no cell of a 16x16 grayscale thumbnail
+    differs from the cached image's by more than `perceptual_tolerance` gray
+    levels. Objects much smaller than a thumbnail cell can still be missed.
+    """
+
+    def __init__(self, backend, namespace:str="", perceptual:bool=False, perceptual_tolerance:float=8.0):
+        self.backend = backend
+        self.namespace = namespace.encode()
+        self.perceptual = perceptual
+        self.perceptual_tolerance = perceptual_tolerance
+        # Lookups run both on the event loop and in threadpool workers; the backends lock their own stores
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.perceptual_hits = 0
+        self.perceptual_rejects = 0
+        self.misses = 0
+
+    def content_key(self, image_data: bytes):
+        return "b:" + hashlib.blake2b(self.namespace + image_data, digest_size=20).hexdigest()
+
+    def image_key(self, image: Image.Image):
+        content = f"{perceptual_hash(image)}:{image.width / image.height:.2f}".encode()
+        return "p:" + hashlib.blake2b(self.namespace + content, digest_size=20).hexdigest()
+
+    def get(self, key):
+        """
+        Look up (detections, (width, height)) by content key.
+        """
+        value = self.backend.get(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get_similar(self, image: Image.Image):
+        """
+        Look up detections by perceptual hash, scaled to the size of `image`.
+        """
+        if not self.perceptual:
+            return None
+        value = self.backend.get(self.image_key(image))
+        if value is None:
+            return None
+        detections, (width, height), *thumb = value
+        if not thumb or np.abs(thumb[0].astype(np.int16) - thumbnail(image)).max() > self.perceptual_tolerance:
+            # Same hash, but some region of the image differs: run the detector
+            with self.lock:
+                self.perceptual_rejects += 1
+            return None
+
+        # The miss was already counted by the content lookup
+        with self.lock:
+            self.misses -= 1
+            self.perceptual_hits += 1
+        if (width, height) != image.size:
+            scale = np.array([image.width / width, image.height / height] * 2, dtype=np.float32)
+            detections = {**detections, "boxes": detections["boxes"] * scale}
+        return detections
+
+    def put(self, key, image: Image.Image, detections, size=None):
+        """
+        Store detections in the coordinates of `size`, the full image size (defaults to `image.size`).
+        """
+        value = (detections, tuple(size or image.size))
+        self.backend.set(key, value)
+        if self.perceptual:
+            self.backend.set(self.image_key(image), (*value, thumbnail(image)))
+
+    def stats(self):
+        with self.lock:
+            hits, perceptual_hits, rejects, misses = self.hits, self.perceptual_hits, self.perceptual_rejects, self.misses
+        lookups = hits + perceptual_hits + misses
+        return {
+            "cache_entries": len(self.backend),
+            "cache_hits": hits,
+            "cache_perceptual_hits": perceptual_hits,
+            "cache_perceptual_rejects": rejects,
+            "cache_misses": misses,
+            "cache_evictions": self.backend.evictions,
+            "cache_hit_ratio": (hits + perceptual_hits) / lookups if lookups else 0.0,
+        }
+
+
+def create_result_cache(backend:str, max_entries:int, ttl:float, path:str=None, namespace:str="", perceptual:bool=False,
+                        perceptual_tolerance:float=8.0):
+    if backend == "memory":
+        store = MemoryBackend(max_entries, ttl)
+    elif backend == "sqlite":
+        store = SQLiteBackend(path, max_entries, ttl)
+    else:
+        raise ValueError(f"Unknown result cache backend: {backend}")
+    logger.info(f"Result cache enabled: {backend} backend, {max_entries} entries, ttl={ttl}s, perceptual={perceptual}")
+    return ResultCache(store, namespace=namespace, perceptual=perceptual, perceptual_tolerance=perceptual_tolerance)
@@ -0,0 +1,104 @@
+import math
+import numpy as np
+from torch.utils.data import Sampler, Subset
+
+## Aspect ratio (width / height) bin edges: tall portrait, portrait, square-ish, landscape, panorama
+ASPECT_RATIO_BINS = (0.6, 0.85, 1.2, 1.6)
+
+
+def aspect_ratio_bucket(width:int, height:int, bins=ASPECT_RATIO_BINS):
+    return int(np.searchsorted(bins, width / max(height, 1)))
+
+
+def size_bucket(width:int, height:int, num_bins:int=2, max_area:float=1333 * 800):
+    """
+    Coarse log-area bin, so tiny and huge images with the same shape are not batched together.
+    """
+    if num_bins <= 1:
+        return 0
+    fraction = math.log1p(width * height) / math.log1p(max_area)
+    return min(num_bins - 1, int(fraction * num_bins))
+
+
+def dataset_image_sizes(dataset):
+    """
+    (width, height) per item of a dataset, unwrapping any chain of Subsets down to a GunDataset.
+    """
+    if isinstance(dataset, Subset):
+        sizes = dataset_image_sizes(dataset.dataset)
+        return [sizes[i] for i in dataset.indices]
+    return dataset.image_sizes()
+
+
+class AspectRatioBatchSampler(Sampler):
+    """
+    Batch sampler that only batches images of similar aspect ratio and size.
+
+    GeneralizedRCNNTransform pads every batch to its largest image, so mixing
+    portrait and landscape images wastes a large share of the compute on
+    padding. Indices are grouped by (aspect ratio bin, size bin), shuffled and
+    chunked within each group, and the batches are shuffled across groups.
+    Leftovers that cannot fill a batch are batched together at the end unless
+    `drop_last`. Call `set_epoch` every epoch for a new, reproducible order;
+    `start_batch` resumes mid-epoch by skipping batches without loading them.
+    Empty `aspect_bins` with `size_bins=1` gives plain shuffled batching.
+
+    With `num_replicas > 1` it shards batches like DistributedSampler: every
+    rank builds the same epoch order and takes every `num_replicas`-th batch,
+    wrapping around so all ranks run the same number of steps; `pad=False`
+    skips the wrap-around, e.g. for evaluation where duplicates would skew metrics.
+    """
+
+    def __init__(self, sizes, batch_size:int, shuffle:bool=True, drop_last:bool=False, seed:int=0,
+                 aspect_bins=ASPECT_RATIO_BINS, size_bins:int=2, num_replicas:int=1, rank:int=0, pad:bool=True):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+        self.start_batch = 0
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.pad = pad
+
+        self.groups = {}
+        for idx, (width, height) in enumerate(sizes):
+            key = (aspect_ratio_bucket(width, height, aspect_bins), size_bucket(width, height, size_bins))
+            self.groups.setdefault(key, []).append(idx)
+
+    def set_epoch(self, epoch:int, start_batch:int=0):
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    def batches(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        batches, leftovers = [], []
+        for key in sorted(self.groups):
+            indices = list(self.groups[key])
+            if self.shuffle:
+                rng.shuffle(indices)
+            full = len(indices) - len(indices) % self.batch_size
+            batches.extend(indices[i:i + self.batch_size] for i in range(0, full, self.batch_size))
+            leftovers.extend(indices[full:])
+
+        if not self.drop_last:
+            batches.extend(leftovers[i:i + self.batch_size] for i in range(0, len(leftovers), self.batch_size))
+        if self.shuffle:
+            order = rng.permutation(len(batches))
+            batches = [batches[i] for i in order]
+
+        if self.num_replicas > 1 and batches:
+            padding = -len(batches) % self.num_replicas if self.pad else 0
+            batches = (batches + (batches * self.num_replicas)[:padding])[self.rank::self.num_replicas]
+        return batches
+
+    def __iter__(self):
+        return iter(self.batches()[self.start_batch:])
+
+    def __len__(self):
+        full = sum(len(indices) // self.batch_size for indices in self.groups.values())
+        leftover = sum(len(indices) % self.batch_size for indices in self.groups.values())
+        total = full if self.drop_last else full + math.ceil(leftover / self.batch_size)
+        if self.pad:
+            return math.ceil(total / self.num_replicas)
+        return len(range(self.rank, total, self.num_replicas))
@@ -0,0 +1,269 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+## Latency histogram buckets in seconds, from sub-millisecond stages to slow CPU forwards
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings of the request being handled, for the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name:str, help:str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount:float=1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in items]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels, in the Prometheus layout.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name:str, help:str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value:float, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+
+        samples = []
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                label_text = _format_labels((*self.labelnames, "le"), (*labels, bound))
+                samples.append((f"{self.name}_bucket", label_text, cumulative))
+            label_text = _format_labels(self.labelnames, labels)
+            samples.append((f"{self.name}_sum", label_text, total))
+            samples.append((f"{self.name}_count", label_text, count))
+        return samples
+
+
+class Gauge:
+    """
+    Gauge read from a callback at scrape time.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name:str, help:str, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        try:
+            return [(self.name, "", float(self.read()))]
+        except Exception as e:
+            logger.warning(f"Could not read gauge {self.name}: {e}")
+            return []
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry rendered in the Prometheus text format.
+    """
+
+    def __init__(self, prefix:str=""):
+        self.prefix = prefix
+        self.metrics = {}
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name:str, help:str, labelnames=()):
+        return self._register(Counter(self.prefix + name, help, labelnames))
+
+    def histogram(self, name:str, help:str, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help, labelnames, buckets))
+
+    def gauge(self, name:str, help:str, read):
+        return self._register(Gauge(self.prefix + name, help, read))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {float(value)!r}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def process_rss_bytes():
+    """
+    Resident set size of this process (Linux /proc, peak RSS elsewhere).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+## Default registry and stage histogram shared by the server modules
+registry = MetricsRegistry(prefix="gun_detection_")
+stage_seconds = registry.histogram("stage_seconds", "Time spent per inference pipeline stage", ("stage",))
+
+
+def observe_stage(stage:str, seconds:float):
+    """
+    Record a stage duration in the histogram and, inside a request, for its Server-Timing header.
+    """
+    stage_seconds.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage:str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def begin_request():
+    """
+    Start collecting stage timings for the current request context.
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings):
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+def instrument_detector(model, observe=observe_stage):
+    """
+    Time the transform, backbone, RPN and ROI heads of a torchvision detector with forward hooks.
+
+    Models without those submodules (TorchScript, ONNX) are left untouched.
+    Returns the number of instrumented stages.
+    """
+    import torch
+
+    instrumented = 0
+    for stage in ("transform", "backbone", "rpn", "roi_heads"):
+        module = getattr(model, stage, None)
+        if not isinstance(module, torch.nn.Module) or isinstance(module, torch.jit.ScriptModule):
+            continue
+        starts = threading.local()
+
+        def pre_hook(module, inputs, starts=starts):
+            starts.value = time.perf_counter()
+
+        def post_hook(module, inputs, outputs, stage=stage, starts=starts):
+            observe(stage, time.perf_counter() - starts.value)
+
+        module.register_forward_pre_hook(pre_hook)
+        module.register_forward_hook(post_hook)
+        instrumented += 1
+    return instrumented
+
+
+class BatchProfiler:
+    """
+    Runs torch.profiler around inference batches and dumps Chrome traces.
+
+    `arm(n)` profiles the next `n` batches on demand; with `sample_every`, one
+    batch in every `sample_every` is also profiled. Traces are written to
+    `trace_dir` and can be opened in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self, trace_dir:str, sample_every:int=0):
+        self.trace_dir = trace_dir
+        self.sample_every = sample_every
+        self.armed = 0
+        self.batches = 0
+        self.traces = 0
+        self.lock = threading.Lock()
+
+    def arm(self, batches:int=1):
+        with self.lock:
+            self.armed += batches
+
+    def _should_profile(self):
+        with self.lock:
+            self.batches += 1
+            if self.armed > 0:
+                self.armed -= 1
+                return True
+            return bool(self.sample_every) and self.batches % self.sample_every == 0
+
+    def wrap(self, batch_fn):
+        import torch
+
+        def profiled(items):
+            if not self._should_profile():
+                return batch_fn(items)
+            os.makedirs(self.trace_dir, exist_ok=True)
+            with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as prof:
+                results = batch_fn(items)
+            path = os.path.join(self.trace_dir, f"trace_{os.getpid()}_{int(time.time() * 1000)}.json")
+            prof.export_chrome_trace(path)
+            with self.lock:
+                self.traces += 1
+            logger.info(f"Profiled a batch of {len(items)} items, trace at {path}")
+            return results
+
+        return profiled
+
+    def stats(self):
+        return {"profiler_armed_batches": self.armed, "profiler_traces": self.traces}
@@ -0,0 +1,239 @@
+import threading
+import numpy as np
+import torch
+from PIL import Image
+from torchvision.ops import batched_nms
+from src.box_ops import box_iou
+from src.telemetry import registry, timed
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+## Tiles per outcome: inferred, or skipped because they were uniform or unchanged since the previous frame
+tiles_total = registry.counter("tiles_total", "Image tiles seen by tiled inference", ("outcome",))
+
+# Pixel step of the grayscale samples used for the uniform / unchanged tile checks
+SAMPLE_STEP = 4
+
+
+def tile_starts(length:int, tile:int, stride:int):
+    """
+    Start offsets of tiles of size `tile` covering `length`; the last tile is shifted back to end at the edge.
+    """
+    if length <= tile:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, length - tile, stride, dtype=np.int64)
+    return np.append(starts, length - tile)
+
+
+def tile_grid(width:int, height:int, tile_size:int, overlap:float):
+    """
+    (N, 4) x_min, y_min, x_max, y_max tiles of at most `tile_size` pixels covering the image,
+    with neighbours overlapping by the `overlap` fraction of a tile.
+    """
+    tile_w, tile_h = min(tile_size, width), min(tile_size, height)
+    stride = max(1, int(round(tile_size * (1.0 - overlap))))
+    xs = tile_starts(width, tile_w, stride)
+    ys = tile_starts(height, tile_h, stride)
+    x0, y0 = np.meshgrid(xs, ys)
+    x0, y0 = x0.ravel(), y0.ravel()
+    return np.stack([x0, y0, x0 + tile_w, y0 + tile_h], axis=1)
+
+
+def merge_detections(detections, iou_threshold:float=0.5, method:str="nms"):
+    """
+    Merge duplicate boxes of the same label, e.g. from overlapping tiles.
+
+    "nms" keeps the best-scoring box of every cluster (torchvision batched_nms).
+    "wbf" keeps the clusters found by NMS but replaces each kept box by the
+    score-weighted mean of all boxes it suppressed, which straightens boxes of
+    objects cut at tile borders. Both are vectorized over all boxes.
+    """
+    boxes = np.asarray(detections["boxes"], dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(detections["scores"], dtype=np.float32).reshape(-1)
+    labels = np.asarray(detections["labels"], dtype=np.int64).reshape(-1)
+    if len(scores) == 0:
+        return {"boxes": boxes, "labels": labels, "scores": scores}
+
+    keep = batched_nms(torch.from_numpy(boxes), torch.from_numpy(scores), torch.from_numpy(labels),
+                       iou_threshold).numpy()
+    if method == "nms":
+        return {"boxes": boxes[keep], "labels": labels[keep], "scores": scores[keep]}
+    if method != "wbf":
+        raise ValueError(f"Unknown merge method {method!r}, expected 'nms' or 'wbf'")
+
+    # Every box joins the kept box of its label it overlaps most; NMS guarantees one exists above the threshold
+    iou = box_iou(boxes[keep], boxes)
+    iou = np.where(labels[keep][:, None] == labels[None, :], iou, -1.0)
+    cluster = iou.argmax(axis=0)
+    weights = np.bincount(cluster, weights=scores, minlength=len(keep))
+    fused = np.zeros((len(keep), 4), dtype=np.float64)
+    np.add.at(fused, cluster, boxes * scores[:, None])
+    fused /= np.maximum(weights, 1e-9)[:, None]
+    return {"boxes": fused.astype(np.float32), "labels": labels[keep], "scores": scores[keep]}
+
+
+class TileCache:
+    """
+    Per-stream memory of the last frame's tiles, for skipping tiles that did not change.
+
+    Holds a grayscale sample and the detections (in image coordinates) of every
+    tile the detector ran on; `threshold` is the mean absolute gray-level
+    difference under which a tile counts as unchanged.
+    """
+
+    def __init__(self, threshold:float=2.0):
+        self.threshold = threshold
+        self.tiles = {}
+
+    def lookup(self, key, sample):
+        entry = self.tiles.get(key)
+        if entry is None or entry[0].shape != sample.shape:
+            return None
+        difference = np.abs(entry[0].astype(np.int16) - sample.astype(np.int16)).mean()
+        return entry[1] if difference <= self.threshold else None
+
+    def store(self, key, sample, detections):
+        self.tiles[key] = (sample, detections)
+
+
+class TiledPredictor:
+    """
+    Sliding-window inference for very high resolution images on top of a Predictor.
+
+    Images larger than `tile_size` are cut into overlapping tiles, which are
+    run through a view of the Predictor whose resize target is the tile size
+    (see `Predictor.at_input_size`). Every tile's long side is `tile_size`, so
+    tiles are detected at their native resolution and small objects are not
+    shrunk away by the model's resize; engines with a resize compiled into
+    the exported graph still apply their own. All tiles of a batch go through
+    one batched forward pass (or chunks of `max_tiles_per_forward`), and with
+    `include_full_image` a second pass at the Predictor's usual size covers
+    objects larger than a tile. Tile boxes are shifted back to image
+    coordinates and merged with vectorized NMS or weighted box fusion.
+
+    With `skip_uniform`, tiles whose gray-level standard deviation is under
+    `uniform_std` (sky, walls, padding) are not inferred. A `TileCache` passed
+    for a stream also skips tiles unchanged since the previous frame and
+    reuses their detections.
+    """
+
+    def __init__(self, predictor, tile_size:int=1024, overlap:float=0.2, merge:str="nms", iou_threshold:float=0.5,
+                 include_full_image:bool=True, skip_uniform:bool=True, uniform_std:float=4.0,
+                 max_tiles_per_forward:int=None):
+        if not 0.0 <= overlap < 1.0:
+            raise ValueError(f"Tile overlap must be in [0, 1), got {overlap}")
+        self.predictor = predictor
+        self.tile_predictor = predictor.at_input_size(tile_size, tile_size)
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.merge = merge
+        self.iou_threshold = iou_threshold
+        self.include_full_image = include_full_image
+        self.skip_uniform = skip_uniform
+        self.uniform_std = uniform_std
+        self.max_tiles_per_forward = max_tiles_per_forward
+        self.lock = threading.Lock()
+        self.counts = {"images": 0, "tiled_images": 0}
+
+    def needs_tiling(self, image: Image.Image):
+        return image.width > self.tile_size or image.height > self.tile_size
+
+    def warmup(self, sizes=((640, 480),)):
+        return self.predictor.warmup(sizes) + self.tile_predictor.warmup([(self.tile_size, self.tile_size)])
+
+    def plan(self, image: Image.Image, cache:TileCache=None):
+        """
+        Tiles of one image to run, and the cached detections of the tiles that can be skipped.
+        """
+        tiles = tile_grid(image.width, image.height, self.tile_size, self.overlap)
+        gray = None
+        if self.skip_uniform or cache is not None:
+            gray = np.asarray(image.convert("L"))
+
+        to_run, reused = [], []
+        for box in tiles:
+            x0, y0, x1, y1 = (int(v) for v in box)
+            sample = gray[y0:y1:SAMPLE_STEP, x0:x1:SAMPLE_STEP] if gray is not None else None
+            if self.skip_uniform and float(sample.std()) < self.uniform_std:
+                tiles_total.inc("uniform")
+                continue
+            if cache is not None:
+                cached = cache.lookup((x0, y0, x1, y1), sample)
+                if cached is not None:
+                    tiles_total.inc("unchanged")
+                    reused.append(cached)
+                    continue
+            tiles_total.inc("inferred")
+            to_run.append(((x0, y0, x1, y1), sample))
+        return to_run, reused
+
+    def _forward(self, crops, owners):
+        """
+        Detections for every crop: tiles at native resolution, whole images at the Predictor's size.
+        """
+        results = [None] * len(crops)
+        for predictor, tiles in ((self.tile_predictor, True), (self.predictor, False)):
+            indices = [k for k, (_, box, _) in enumerate(owners) if (box is not None) == tiles]
+            chunk = self.max_tiles_per_forward or len(indices) or 1
+            for start in range(0, len(indices), chunk):
+                part = indices[start:start + chunk]
+                for k, detections in zip(part, predictor.predict_batch([crops[k] for k in part])):
+                    results[k] = detections
+        return results
+
+    def predict_batch(self, images, caches=None):
+        """
+        Run the detector on a list of PIL images, tiling the ones larger than a tile.
+
+        `caches` optionally gives one TileCache (or None) per image.
+        """
+        caches = caches or [None] * len(images)
+        crops, owners, plans = [], [], []
+        with timed("tiling"):
+            for i, (image, cache) in enumerate(zip(images, caches)):
+                if not self.needs_tiling(image):
+                    crops.append(image)
+                    owners.append((i, None, None))
+                    plans.append([])
+                    continue
+                to_run, reused = self.plan(image, cache)
+                for box, sample in to_run:
+                    crops.append(image.crop(box))
+                    owners.append((i, box, sample))
+                if self.include_full_image:
+                    crops.append(image)
+                    owners.append((i, None, None))
+                plans.append(reused)
+
+        per_image = [list(reused) for reused in plans]
+        if crops:
+            for (i, box, sample), detections in zip(owners, self._forward(crops, owners)):
+                if box is not None:
+                    offset = np.array([box[0], box[1], box[0], box[1]], dtype=np.float32)
+                    detections = {**detections, "boxes": detections["boxes"] + offset}
+                    if caches[i] is not None:
+                        caches[i].store(box, sample, detections)
+                per_image[i].append(detections)
+
+        results = []
+        with timed("merge"):
+            for image, parts in zip(images, per_image):
+                if not self.needs_tiling(image):
+                    results.append(parts[0])
+                    continue
+                merged = {key: np.concatenate([part[key] for part in parts]) if parts else np.empty(0)
+                          for key in ("boxes", "labels", "scores")}
+                results.append(merge_detections(merged, self.iou_threshold, self.merge))
+
+        with self.lock:
+            self.counts["images"] += len(images)
+            self.counts["tiled_images"] += sum(self.needs_tiling(image) for image in images)
+        return results
+
+    def predict(self, image: Image.Image, cache:TileCache=None):
+        return self.predict_batch([image], [cache])[0]
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
@@ -0,0 +1,105 @@
+import numpy as np
+from src.box_ops import box_iou, box_centers
+
+
+class Track:
+    """
+    A single tracked box carried forward between detector runs.
+    """
+
+    def __init__(self, track_id:int, box, score:float, label:int, frame_index:int):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.score = float(score)
+        self.label = int(label)
+        self.frame_index = frame_index
+        self.velocity = np.zeros(2, dtype=np.float32)
+        self.hits = 1
+        self.misses = 0
+
+    def predict(self, frame_index:int):
+        """
+        Box extrapolated to `frame_index` with the last measured centroid velocity.
+        """
+        shift = self.velocity * (frame_index - self.frame_index)
+        return self.box + np.concatenate([shift, shift])
+
+    def update(self, box, score:float, label:int, frame_index:int):
+        box = np.asarray(box, dtype=np.float32)
+        elapsed = frame_index - self.frame_index
+        if elapsed > 0:
+            self.velocity = (box_centers(box)[0] - box_centers(self.box)[0]) / elapsed
+        self.box = box
+        self.score = float(score)
+        self.label = int(label)
+        self.frame_index = frame_index
+        self.hits += 1
+        self.misses = 0
+
+
+class IoUTracker:
+    """
+    Lightweight IoU tracker for carrying detections across skipped frames.
+
+    Detections are greedily matched to the predicted position of existing
+    tracks by descending IoU. Tracks that go unmatched for more than
+    `max_misses` detector runs are dropped; between runs every track moves
+    with its constant centroid velocity.
+    """
+
+    def __init__(self, iou_threshold:float=0.3, max_misses:int=2):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self.next_id = 1
+
+    def update(self, detections, frame_index:int):
+        """
+        Associate a fresh set of detections with the current tracks.
+        """
+        boxes = detections["boxes"]
+        predicted = np.array([track.predict(frame_index) for track in self.tracks], dtype=np.float32).reshape(-1, 4)
+        iou = box_iou(predicted, boxes)
+
+        matched_tracks, matched_dets = set(), set()
+        if iou.size:
+            # Greedy assignment over the IoU matrix, best pairs first
+            order = np.argsort(-iou, axis=None)
+            for track_idx, det_idx in zip(*np.unravel_index(order, iou.shape)):
+                if iou[track_idx, det_idx] < self.iou_threshold:
+                    break
+                if track_idx in matched_tracks or det_idx in matched_dets:
+                    continue
+                self.tracks[track_idx].update(boxes[det_idx], detections["scores"][det_idx],
+                                              detections["labels"][det_idx], frame_index)
+                matched_tracks.add(track_idx)
+                matched_dets.add(det_idx)
+
+        for track_idx, track in enumerate(self.tracks):
+            if track_idx not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for det_idx in range(len(boxes)):
+            if det_idx not in matched_dets:
+                self.tracks.append(Track(self.next_id, boxes[det_idx], detections["scores"][det_idx],
+                                         detections["labels"][det_idx], frame_index))
+                self.next_id += 1
+
+        return self.current(frame_index)
+
+    def current(self, frame_index:int):
+        """
+        Tracks visible at `frame_index`, as JSON-serializable dicts.
+        """
+        return [
+            {
+                "track_id": track.track_id,
+                "box": np.round(track.predict(frame_index), 1).tolist(),
+                "score": round(track.score, 4),
+                "label": track.label,
+                "age": frame_index - track.frame_index,
+            }
+            for track in self.tracks
+            if track.misses == 0
+        ]
@@ -0,0 +1,63 @@
+import os
+import tarfile
+import zipfile
+from itertools import islice
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def is_image_name(name:str):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def iter_image_entries(fileobj, filename:str, max_entry_bytes:int=None):
+    """
+    Lazily yield (name, bytes) for every image in an upload.
+
+    Zip and tar archives (optionally compressed) are walked member by member so
+    only one image is held in memory at a time; any other upload is treated as
+    a single image. Members larger than `max_entry_bytes`, judged from the
+    archive headers, are yielded as (name, None) without being extracted.
+    """
+    def too_large(size):
+        return max_entry_bytes is not None and size > max_entry_bytes
+
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_image_name(info.filename):
+                    continue
+                yield info.filename, None if too_large(info.file_size) else archive.read(info)
+        return
+
+    fileobj.seek(0)
+    if filename.lower().endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+        # Stream mode never seeks backwards, so compressed tarballs are read once
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile() or not is_image_name(member.name):
+                    continue
+                yield member.name, None if too_large(member.size) else archive.extractfile(member).read()
+        return
+
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(0)
+    yield filename, None if too_large(size) else fileobj.read()
+
+
+def iter_uploads(uploads, max_entry_bytes:int=None):
+    """
+    Chain the image entries of several (fileobj, filename) uploads.
+    """
+    for fileobj, filename in uploads:
+        logger.info(f"Reading batch upload {filename}")
+        yield from iter_image_entries(fileobj, filename, max_entry_bytes)
+
+
+def next_chunk(iterator, size:int):
+    return list(islice(iterator, size))
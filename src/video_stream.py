@@ -0,0 +1,165 @@
+import sys
+import queue
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from src.tracker import IoUTracker
+from src.logger import get_logger
+from src.custom_exception import CustomException
+
+logger = get_logger(__name__)
+
+class FrameReader(threading.Thread):
+    """
+    Decodes frames from an OpenCV `VideoCapture` source on a background thread.
+
+    Frames are handed over through a bounded queue as (index, timestamp_ms, frame)
+    tuples, followed by `None` at the end of the stream. With `drop_frames=True`
+    (live cameras) the oldest queued frame is discarded when the consumer falls
+    behind, so latency stays bounded instead of growing without limit.
+    """
+
+    def __init__(self, source, max_queue:int=8, drop_frames:bool=False):
+        super().__init__(daemon=True, name="frame-reader")
+        self.source = source
+        self.frames = queue.Queue(maxsize=max(1, max_queue))
+        self.drop_frames = drop_frames
+        self.stopped = threading.Event()
+        self.dropped = 0
+        self.fps = 0.0
+
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise CustomException(f"Could not open video source {source}", sys)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.drop_frames and item is not None:
+                    try:
+                        self.frames.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def run(self):
+        index = 0
+        try:
+            while not self.stopped.is_set():
+                ok, frame = self.capture.read()
+                if not ok:
+                    break
+                self._put((index, self.capture.get(cv2.CAP_PROP_POS_MSEC), frame))
+                index += 1
+        except Exception as e:
+            logger.error(f"Error reading frames from {self.source}: {e}")
+        finally:
+            self.capture.release()
+            self._put(None)
+            logger.info(f"Frame reader finished after {index} frames ({self.dropped} dropped)")
+
+    def get(self, timeout:float=None):
+        return self.frames.get(timeout=timeout)
+
+    def stop(self):
+        """
+        Stop decoding and wake any consumer blocked in `get` with the end-of-stream `None`.
+        """
+        self.stopped.set()
+        # _put gives up once stopped, so the sentinel is queued here, discarding frames to make room
+        while True:
+            try:
+                self.frames.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class SceneChangeDetector:
+    """
+    Cheap motion check on a small grayscale thumbnail of each frame.
+
+    `changed` reports whether the mean absolute difference against the frame the
+    detector last ran on exceeds `threshold` (in 0-255 gray levels).
+    """
+
+    def __init__(self, threshold:float=12.0, size=(64, 36)):
+        self.threshold = threshold
+        self.size = size
+        self.reference = None
+
+    def thumbnail(self, frame):
+        return cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.size, interpolation=cv2.INTER_AREA)
+
+    def changed(self, frame):
+        if self.reference is None:
+            return True
+        diff = cv2.absdiff(self.thumbnail(frame), self.reference)
+        return float(np.mean(diff)) > self.threshold
+
+    def set_reference(self, frame):
+        self.reference = self.thumbnail(frame)
+
+
+class StreamDetector:
+    """
+    Decides which frames of a stream go through the detector.
+
+    The model runs on the first frame, then every `detect_every` frames or
+    sooner when the scene changes, but never more often than every
+    `min_interval` frames; in between, the tracker carries the last detections
+    forward.
+    """
+
+    def __init__(self, detect_every:int=15, min_interval:int=3, scene_threshold:float=12.0,
+                 iou_threshold:float=0.3, max_misses:int=2):
+        self.detect_every = max(1, int(detect_every))
+        self.min_interval = max(1, min(int(min_interval), self.detect_every))
+        self.scene = SceneChangeDetector(threshold=scene_threshold)
+        self.tracker = IoUTracker(iou_threshold=iou_threshold, max_misses=max_misses)
+        self.last_detection = None
+        self.frames_seen = 0
+        self.frames_detected = 0
+
+    def needs_detection(self, index:int, frame):
+        self.frames_seen += 1
+        if self.last_detection is None:
+            return True
+        elapsed = index - self.last_detection
+        if elapsed >= self.detect_every:
+            return True
+        return elapsed >= self.min_interval and self.scene.changed(frame)
+
+    def update(self, index:int, frame, detections=None):
+        """
+        Tracks for this frame, refreshed from `detections` when the detector ran.
+        """
+        if detections is None:
+            return self.tracker.current(index)
+
+        self.frames_detected += 1
+        self.last_detection = index
+        self.scene.set_reference(frame)
+        return self.tracker.update(detections, index)
+
+    def stats(self):
+        return {
+            "frames": self.frames_seen,
+            "frames_detected": self.frames_detected,
+            "skip_ratio": 1 - self.frames_detected / max(1, self.frames_seen),
+        }
+
+
+def frame_to_image(frame):
+    """
+    Convert an OpenCV BGR frame into the RGB PIL image the detector expects.
+    """
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
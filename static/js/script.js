@@ -7,11 +7,16 @@ document.addEventListener("DOMContentLoaded", () => {
   const previewImage = document.getElementById("previewImage");
   const changeImageBtn = document.getElementById("changeImageBtn");
   const originalImage = document.getElementById("originalImage");
-  const processedImage = document.getElementById("processedImage");
+  const processedCanvas = document.getElementById("processedCanvas");
+  const thresholdInput = document.getElementById("thresholdInput");
+  const thresholdLabel = document.getElementById("thresholdLabel");
+  const detectedCount = document.getElementById("detectedCount");
+  const detectionsList = document.getElementById("detectionsList");
   const statusMessage = document.getElementById("statusMessage");
   const resultsContainer = document.getElementById("resultsContainer");
 
   let currentFile = null;
+  let currentDetections = null;
 
   // Navigation smooth scrolling
   document.querySelectorAll(".nav-link").forEach((link) => {
@@ -118,6 +123,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
       // Hide previous results
       resultsContainer.style.display = "none";
+      currentDetections = null;
       clearStatusMessage();
     };
     reader.readAsDataURL(file);
@@ -141,14 +147,15 @@ document.addEventListener("DOMContentLoaded", () => {
     formData.append("file", currentFile);
 
     try {
-      const response = await fetch("/predict/", {
+      // Fetch every box above the slider minimum once, then filter locally
+      const response = await fetch(`/detect?threshold=${thresholdInput.min}`, {
         method: "POST",
         body: formData,
       });
 
       if (response.ok) {
-        const imageBlob = await response.blob();
-        processedImage.src = URL.createObjectURL(imageBlob);
+        currentDetections = await response.json();
+        renderDetections();
 
         // Show results
         showResults();
@@ -188,6 +195,58 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  // Threshold slider re-filters the cached detections without a new request
+  thresholdInput.addEventListener("input", () => {
+    thresholdLabel.textContent = parseFloat(thresholdInput.value).toFixed(2);
+    if (currentDetections) {
+      renderDetections();
+    }
+  });
+
+  function renderDetections() {
+    const threshold = parseFloat(thresholdInput.value);
+    const { width, height, boxes, scores } = currentDetections;
+    const visible = [];
+    scores.forEach((score, i) => {
+      if (score > threshold) {
+        visible.push({ box: boxes[i], score });
+      }
+    });
+
+    // Draw the uploaded image and overlay the boxes client-side
+    processedCanvas.width = width;
+    processedCanvas.height = height;
+    const ctx = processedCanvas.getContext("2d");
+    ctx.drawImage(originalImage, 0, 0, width, height);
+    ctx.strokeStyle = "red";
+    ctx.lineWidth = Math.max(3, Math.round(Math.max(width, height) / 400));
+    visible.forEach(({ box }) => {
+      const [xMin, yMin, xMax, yMax] = box;
+      ctx.strokeRect(xMin, yMin, xMax - xMin, yMax - yMin);
+    });
+
+    detectedCount.textContent = visible.length;
+    detectionsList.innerHTML = "";
+    if (visible.length === 0) {
+      const item = document.createElement("li");
+      item.className = "empty";
+      item.textContent = "No guns detected above the chosen threshold.";
+      detectionsList.appendChild(item);
+      return;
+    }
+    visible.forEach(({ box, score }, i) => {
+      const item = document.createElement("li");
+      const label = document.createElement("span");
+      label.textContent = `Gun #${i + 1} • ${(score * 100).toFixed(1)}%`;
+      const coords = document.createElement("span");
+      coords.className = "box";
+      coords.textContent = `[${box.map((v) => Math.round(v)).join(", ")}]`;
+      item.appendChild(label);
+      item.appendChild(coords);
+      detectionsList.appendChild(item);
+    });
+  }
+
   function showResults() {
     // Show results container
     resultsContainer.style.display = "block";